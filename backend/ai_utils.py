@@ -8,19 +8,34 @@ import aiohttp
 import json
 import os
 import logging
+import threading
+import uuid
 from datetime import datetime, timedelta
 from PIL import Image
 from io import BytesIO
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union
 from dataclasses import dataclass, field
 from enum import Enum
-from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2, preprocess_input, decode_predictions
+from bson import ObjectId
+from tensorflow.keras.applications.mobilenet_v2 import decode_predictions
 from tensorflow.keras.preprocessing import image as tf_image
-from tensorflow.keras import layers, models
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+from attribute_rules import attribute_rules
+from embedding_codec import EmbeddingCodec, codec_filter, get_active_codec
+from fashion_head import FashionHead
+from image_utils import DecodedImage, as_decoded
+from model_registry import ServingModel, model_registry
+from model_version import model_version_filter
+from weather_stations import DEFAULT_STATION, Station, StationIndex, cell_center, cell_key, grid_cell, station_index
+from metrics import span, timed
+from services.shared_cache import shared_cache
+from faiss_utils import USER_INDEX_TYPE, make_index, normalize as normalize_vectors
 
 # ========== CONFIGURATION ==========
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "your-api-key-here")  # ← Put in .env !
+WEATHER_CACHE_MINUTES = int(os.getenv("WEATHER_CACHE_MINUTES", "30"))
+# Climatology served because the API failed – retried soon instead of for WEATHER_CACHE_MINUTES
+WEATHER_FALLBACK_CACHE_SECONDS = int(os.getenv("WEATHER_FALLBACK_CACHE_SECONDS", "60"))
 IMAGE_STORAGE_DIR = "wardrobe_images"
 os.makedirs(IMAGE_STORAGE_DIR, exist_ok=True)
 
@@ -86,101 +101,49 @@ class OutfitRecommendation:
     weather_appropriate: bool = False
 
 # ========== GLOBAL STORAGE & MODELS ==========
-base_model = MobileNetV2(weights='imagenet', include_top=False)
-classification_model = MobileNetV2(weights='imagenet')  # For inference
-feature_model = tf.keras.Model(
-    inputs=classification_model.input,
-    outputs=classification_model.layers[-2].output
-)
+# Classification/embedding models live in model_registry (versioned, hot-swappable via /api/admin/models)
+
+def current_model_version() -> str:
+    """Version tag of the model serving new requests"""
+    return model_registry.current_version()
 
 dimension = 1280
-faiss_index = faiss.IndexIDMap(faiss.IndexFlatIP(dimension))  # Proper removable index
 
+# In-memory wardrobe for the FashionAIAssistant demo (the API keeps items in MongoDB)
 # user_id → {item_id → WardrobeItem}
 wardrobe_db: Dict[str, Dict[str, WardrobeItem]] = {}
+wardrobe_lock = threading.RLock()
 
 # ========== FINE-TUNING ON AFRICAN FASHION DATASET ==========
-def fine_tune_model(dataset_path: str, epochs: int = 10, batch_size: int = 32):
+def fine_tune_model(dataset_path: str, epochs: int = 10, batch_size: int = 32, **kwargs):
     """
     Fine-tune MobileNetV2 on AFRIFASHION1600 or similar African fashion dataset.
-    Assume dataset is organized in folders: dataset_path/train/class1, dataset_path/val/class1, etc.
+    Dataset is organized in class folders: dataset_path/class1/..., or dataset_path/train/class1 + dataset_path/val/class1.
     Download AFRIFASHION1600 from: https://github.com/DataScienceNigeria/Research-Papers-by-Data-Science-Nigeria (contact authors if needed) or use similar like inuwamobarak/african-atire from HF.
+    Training runs in fine_tuning.train (tf.data, staged unfreezing, resumable); kwargs are passed through.
+    Offline: `python -m jobs.fine_tune <dataset_path>` does the same without the API's models loaded.
     """
-    # Data generators
-    train_datagen = ImageDataGenerator(
-        rescale=1./255,
-        rotation_range=20,
-        width_shift_range=0.2,
-        height_shift_range=0.2,
-        shear_range=0.2,
-        zoom_range=0.2,
-        horizontal_flip=True,
-        validation_split=0.2
-    )
-
-    train_generator = train_datagen.flow_from_directory(
-        dataset_path,
-        target_size=(224, 224),
-        batch_size=batch_size,
-        class_mode='categorical',
-        subset='training'
-    )
-
-    val_generator = train_datagen.flow_from_directory(
-        dataset_path,
-        target_size=(224, 224),
-        batch_size=batch_size,
-        class_mode='categorical',
-        subset='validation'
-    )
+    from fine_tuning import train  # tf.data pipeline, only needed here
 
-    num_classes = len(train_generator.class_indices)
+    _, report = train(dataset_path, epochs=epochs, batch_size=batch_size, **kwargs)
 
-    # Build fine-tuned model
-    global base_model
-    base_model.trainable = True  # Unfreeze for fine-tuning
+    # Registered, not served yet: re-embed, then activate (POST /api/admin/models/<version>/activate)
+    model_registry.register(report["path"])
 
-    model = models.Sequential([
-        base_model,
-        layers.GlobalAveragePooling2D(),
-        layers.Dense(1024, activation='relu'),
-        layers.Dropout(0.5),
-        layers.Dense(num_classes, activation='softmax')
-    ])
-
-    model.compile(
-        optimizer=tf.keras.optimizers.Adam(learning_rate=1e-5),
-        loss='categorical_crossentropy',
-        metrics=['accuracy']
-    )
-
-    # Train
-    history = model.fit(
-        train_generator,
-        epochs=epochs,
-        validation_data=val_generator
-    )
-
-    # Save and update global models
-    model.save('fine_tuned_mobilenetv2.h5')
-    global classification_model, feature_model
-    classification_model = model
-    feature_model = tf.keras.Model(inputs=model.input, outputs=model.layers[-3].output)  # Update feature extractor
-
-    logger.info("Model fine-tuned successfully.")
-    return history
+    logger.info(f"Model fine-tuned successfully: {report['path']}. "
+                f"Run `python -m jobs.reembed run --model-path {report['path']}` to re-embed stored items.")
+    return report
 
 def safe_convert(obj: Any) -> Any:
     """
-    Recursively convert NumPy types to native Python types for JSON/Pydantic serialization.
+    Recursively convert NumPy types to native Python types (for MongoDB documents).
     Handles arrays, scalars, dicts, lists, etc.
+    HTTP responses don't need this – json_utils.NumpyJSONResponse encodes NumPy directly.
     """
     if isinstance(obj, np.ndarray):
-        return [safe_convert(x) for x in obj.tolist()]
-    if isinstance(obj, (np.float32, np.float64)):
-        return float(obj)
-    if isinstance(obj, (np.int32, np.int64)):
-        return int(obj)
+        return obj.tolist()  # already native floats/ints, nested lists for >1-D
+    if isinstance(obj, np.generic):
+        return obj.item()
     if isinstance(obj, dict):
         return {k: safe_convert(v) for k, v in obj.items()}
     if isinstance(obj, (list, tuple)):
@@ -192,20 +155,34 @@ def safe_convert(obj: Any) -> Any:
 # Example: fine_tune_model('/path/to/afrifashion1600')
 
 # ========== HELPER FUNCTIONS ==========
-def save_image(image_bytes: bytes, item_id: str) -> str:
-    path = os.path.join(IMAGE_STORAGE_DIR, f"{item_id}.jpg")
+def _write_file(path: str, data: bytes) -> None:
     with open(path, "wb") as f:
-        f.write(image_bytes)
+        f.write(data)
+
+async def save_image(image_bytes: bytes, item_id: str) -> str:
+    """Disk write runs in a thread so it doesn't stall the event loop."""
+    path = os.path.join(IMAGE_STORAGE_DIR, f"{item_id}.jpg")
+    await asyncio.to_thread(_write_file, path, image_bytes)
     return path
 
 
-async def build_user_faiss_index(user_id: str, db) -> Tuple[faiss.IndexFlatIP, List[str]]:
+@timed("faiss_build_user")
+async def build_user_faiss_index(
+    user_id: str,
+    db,
+    codec: Optional[EmbeddingCodec] = None,
+    model_version: Optional[str] = None
+) -> Tuple[Optional[faiss.Index], List[str]]:
     """
     Build FAISS index from user's wardrobe items on demand (MVP approach)
+    Always exact (USER_INDEX_TYPE = flat) – it's rebuilt on every search, so a trained or graph backend doesn't pay off.
+    Only items stored with the active embedding codec and model version are comparable, others are skipped.
     Returns: (index, list_of_item_ids_in_order)
     """
+    codec = codec or get_active_codec()
+    model_version = model_version or current_model_version()
     items = await db.wardrobe_items.find(
-        {"user_id": user_id},
+        {"user_id": user_id, **codec_filter(codec.codec_id), **model_version_filter(model_version)},
         {"_id": 1, "features": 1}
     ).to_list(1000)  # limit for safety
 
@@ -217,17 +194,14 @@ async def build_user_faiss_index(user_id: str, db) -> Tuple[faiss.IndexFlatIP, L
 
     for item in items:
         if "features" in item and len(item["features"]) > 0:
-            vec = np.array(item["features"], dtype=np.float32)
-            vectors.append(vec)
+            vectors.append(item["features"])
             item_ids.append(str(item["_id"]))
 
     if not vectors:
         return None, []
 
-    dimension = len(vectors[0])
-    index = faiss.IndexFlatIP(dimension)  # Inner Product = cosine after normalization
-    vectors_np = np.array(vectors).astype('float32')
-    faiss.normalize_L2(vectors_np)        # very important for cosine similarity
+    vectors_np = normalize_vectors(codec.to_search_space(vectors))  # very important for cosine similarity
+    index = make_index(USER_INDEX_TYPE, vectors_np.shape[1])  # Inner Product = cosine after normalization
     index.add(vectors_np)
 
     return index, item_ids
@@ -237,29 +211,33 @@ async def search_user_closet(
     query_features: np.ndarray,
     user_id: str,
     db,
-    top_k: int = 8
+    top_k: int = 8,
+    model_version: Optional[str] = None
 ) -> List[Dict]:
     """
-    Find most similar items in user's wardrobe
+    Find most similar items in user's wardrobe (exact search, see build_user_faiss_index)
+    model_version: the version query_features came from (default: the serving one).
     """
-    index, item_ids = await build_user_faiss_index(user_id, db)
+    codec = get_active_codec()
+    index, item_ids = await build_user_faiss_index(user_id, db, codec=codec, model_version=model_version)
     if index is None:
         return []
 
-    # Normalize query vector
-    query_vec = query_features.astype('float32').reshape(1, -1)
-    faiss.normalize_L2(query_vec)
+    query_vec = normalize_vectors(codec.query(query_features))
+    with span("faiss_search_user"):
+        distances, indices = index.search(query_vec, min(top_k, len(item_ids)))
 
-    distances, indices = index.search(query_vec, top_k)
+    hits = [(item_ids[idx], float(dist)) for dist, idx in zip(distances[0], indices[0]) if idx != -1]
+    # One round-trip for all hits instead of a find_one per result
+    docs = await db.wardrobe_items.find(
+        {"_id": {"$in": [ObjectId(item_id) for item_id, _ in hits]}},
+        {"image_url": 1, "category": 1, "color": 1, "style": 1}
+    ).to_list(len(hits))
+    docs_by_id = {str(doc["_id"]): doc for doc in docs}
 
     results = []
-    for rank, (dist, idx) in enumerate(zip(distances[0], indices[0])):
-        if idx == -1:
-            continue
-        item_id = item_ids[idx]
-        similarity = float(dist)  # cosine similarity (higher = better)
-
-        item = await db.wardrobe_items.find_one({"_id": ObjectId(item_id)})
+    for rank, (item_id, similarity) in enumerate(hits):
+        item = docs_by_id.get(item_id)
         if item:
             results.append({
                 "item_id": item_id,
@@ -267,71 +245,94 @@ async def search_user_closet(
                 "category": item["category"],
                 "color": item["color"],
                 "style": item["style"],
-                "similarity_score": round(similarity, 4),
+                "similarity_score": round(similarity, 4),  # cosine similarity (higher = better)
                 "rank": rank + 1
             })
 
     return sorted(results, key=lambda x: x["similarity_score"], reverse=True)
 
 # ========== WEATHER SERVICE (REAL API) ==========
-class WeatherService:
-    def __init__(self):
-        self.cache: Dict[str, Tuple[datetime, Dict]] = {}
-        self.cache_duration = timedelta(minutes=30)
-        self.kenyan_cities = {
-            "nairobi": {"lat": -1.286389, "lon": 36.817223},
-            "mombasa": {"lat": -4.0435, "lon": 39.6682},
-            "kisumu": {"lat": -0.1022, "lon": 34.7617},
-            "eldoret": {"lat": 0.5143, "lon": 35.2698}
-        }
-
-    async def get_weather(self, city: str) -> Dict[str, Any]:
-        city = city.lower()
-        now = datetime.now()
-
-        if city in self.cache:
-            cached_time, data = self.cache[city]
-            if now - cached_time < self.cache_duration:
-                return data
+# OpenWeather's "main" field → the conditions get_seasonality_recommendation understands
+OPENWEATHER_CONDITIONS = {
+    "clear": "sunny", "clouds": "cloudy", "rain": "rainy", "drizzle": "rainy",
+    "thunderstorm": "rainy", "mist": "humid", "haze": "humid", "fog": "humid"
+}
 
-        if city not in self.kenyan_cities:
-            return self._fallback_weather(city)
+class WeatherService:
+    """
+    Current weather for any of the 47 county HQs (by county or town name) or
+    for coordinates. Cached per grid cell (weather_stations) in the shared
+    cache, so users in the same cell – on any worker – share one fetch;
+    without an API key, or when the API fails, the nearest station's monthly
+    climatology is used instead (after a failure only cached briefly).
+    """
+    def __init__(self, stations: StationIndex = station_index):
+        self.stations = stations
+        self.cache = shared_cache.namespace("weather", ttl=WEATHER_CACHE_MINUTES * 60, local_ttl=300)
+
+    def locate(self, city: Optional[str] = None, lat: Optional[float] = None,
+               lon: Optional[float] = None) -> Tuple[Station, float, float]:
+        """(station reported to the user, lat, lon) – coordinates win over the city name."""
+        if lat is not None and lon is not None:
+            return self.stations.nearest(lat, lon), lat, lon
+        station = self.stations.resolve(city or DEFAULT_STATION)
+        if station is None:
+            logger.info(f"Unknown city '{city}', using {DEFAULT_STATION.title()} weather")
+            station = self.stations.resolve(DEFAULT_STATION)
+        return station, station.lat, station.lon
+
+    async def get_weather(self, city: Optional[str] = DEFAULT_STATION, lat: Optional[float] = None,
+                          lon: Optional[float] = None) -> Dict[str, Any]:
+        station, lat, lon = self.locate(city, lat, lon)
+        cell = grid_cell(lat, lon)
+        weather = await self._cell_weather(cell)
+        return {**weather, "city": station.hq, "county": station.county}
+
+    async def _cell_weather(self, cell: Tuple[int, int]) -> Dict[str, Any]:
+        # Concurrent requests for the same cell share one fetch (across workers too)
+        return await self.cache.get_or_compute(
+            cell_key(cell), lambda: self._fetch(cell, self.stations.cell_station(cell)), ttl_for=self._cache_ttl
+        )
+
+    @staticmethod
+    def _has_api_key() -> bool:
+        return OPENWEATHER_API_KEY not in ("", "your-api-key-here")
+
+    def _cache_ttl(self, weather: Dict[str, Any]) -> Optional[float]:
+        if weather.get("source") == "climatology" and self._has_api_key():
+            return WEATHER_FALLBACK_CACHE_SECONDS
+        return None
 
-        coords = self.kenyan_cities[city]
+    async def _fetch(self, cell: Tuple[int, int], station: Station) -> Dict[str, Any]:
+        if not self._has_api_key():
+            return self._fallback_weather(station)
 
+        lat, lon = cell_center(cell)
         try:
-            url = f"https://api.openweathermap.org/data/2.5/weather?lat={coords['lat']}&lon={coords['lon']}&appid={OPENWEATHER_API_KEY}&units=metric"
+            url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
             async with aiohttp.ClientSession() as session:
                 async with session.get(url) as resp:
                     if resp.status != 200:
-                        logger.warning(f"Weather API failed for {city}: {resp.status}")
-                        return self._fallback_weather(city)
+                        logger.warning(f"Weather API failed for {station.hq}: {resp.status}")
+                        return self._fallback_weather(station)
                     data = await resp.json()
 
-            weather = {
+            main = data["weather"][0]["main"].lower()
+            return {
                 "temperature": data["main"]["temp"],
-                "condition": data["weather"][0]["main"].lower(),
+                "condition": OPENWEATHER_CONDITIONS.get(main, main),
                 "humidity": data["main"]["humidity"],
                 "rain_probability": data.get("rain", {}).get("1h", 0) * 4,  # rough estimate
-                "city": city.title()
+                "source": "openweather"
             }
-            self.cache[city] = (now, weather)
-            return weather
 
         except Exception as e:
-            logger.error(f"Weather fetch error for {city}: {e}")
-            return self._fallback_weather(city)
-
-    def _fallback_weather(self, city: str) -> Dict:
-        ranges = {"nairobi": (18, 25), "mombasa": (26, 32), "kisumu": (22, 28), "eldoret": (15, 22)}
-        temp_range = ranges.get(city, (20, 25))
-        return {
-            "temperature": round(np.random.uniform(*temp_range), 1),
-            "condition": np.random.choice(["sunny", "rainy", "cloudy", "humid"]),
-            "humidity": np.random.randint(40, 90),
-            "rain_probability": np.random.randint(0, 100),
-            "city": city.title()
-        }
+            logger.error(f"Weather fetch error for {station.hq}: {e}")
+            return self._fallback_weather(station)
+
+    def _fallback_weather(self, station: Station) -> Dict:
+        """Monthly normals for the station's climate zone – deterministic, so safe to cache."""
+        return {**self.stations.climatology(station, datetime.now().month), "source": "climatology"}
 
     def get_seasonality_recommendation(self, weather: Dict) -> List[str]:
         temp = weather.get("temperature", 25)
@@ -361,22 +362,61 @@ FASHION_CATEGORIES = {
     'traditional': ['kitenge', 'kanga', 'shuka', 'ankara', 'maasai']  # added
 }
 
-async def classify_image(image_bytes: bytes) -> Dict[str, Any]:
-    img = Image.open(BytesIO(image_bytes)).convert('RGB')
-    img_resized = img.resize((224, 224))
-    img_array = tf_image.img_to_array(img_resized)
-    img_array = np.expand_dims(img_array, axis=0)
-    img_array = preprocess_input(img_array)
+@timed("classify_image")
+async def classify_image(image: Union[bytes, DecodedImage], model: Optional[ServingModel] = None) -> Dict[str, Any]:
+    """model: pinned by the caller (model_registry.use()), else whichever version is serving"""
+    decoded_img = as_decoded(image)
+    model = model or model_registry.current()
 
-    preds = classification_model.predict(img_array, verbose=0)
-    decoded = decode_predictions(preds, top=10)[0]
+    with span("mobilenet_predict"):
+        # One forward pass gives probabilities and embedding – extract_features reuses it
+        probs, embedding = await model.predict(decoded_img)
+    best_cat, best_sub, conf = categorize(probs, model.class_names, model.head, embedding)
+
+    # Color extraction (on the shared reduced-size decode, BGR like cv2.imdecode)
+    img_cv = decoded_img.bgr_small
+    if img_cv is not None:
+        pixels = img_cv.reshape(-1, 3).astype(np.float32)
+        with span("kmeans"):
+            _, _, centers = cv2.kmeans(pixels, 5, None,
+                                     (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0),
+                                     10, cv2.KMEANS_RANDOM_CENTERS)
+        colors_hex = ['#%02x%02x%02x' % (c[2], c[1], c[0]) for c in centers.astype(int)]
+        dominant = colors_hex[0]
+    else:
+        dominant = "#95a5a6"
+        colors_hex = [dominant]
+
+    result = classification_result(best_cat, best_sub, conf, dominant, colors_hex, pattern_fallback=model.head is None)
+    model.record_category(result["category"])
+    return result
+
+def top_labels(probs: np.ndarray, top: int = 10, labels: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+    """(label, probability), best first – ImageNet names, or a fine-tuned model's own classes"""
+    if labels is None:
+        return [(label, float(prob)) for _, label, prob in decode_predictions(probs[np.newaxis], top=top)[0]]
+    order = np.argsort(probs)[::-1][:top]
+    return [(labels[i], float(probs[i])) for i in order]
+
+def categorize(
+    probs: np.ndarray,
+    labels: Optional[List[str]] = None,
+    head: Optional[FashionHead] = None,
+    embedding: Optional[np.ndarray] = None
+) -> Tuple[str, str, float]:
+    """
+    Fashion category of one prediction → (category, subcategory, confidence).
+    With a trained head (fashion_head.py) it's the head's call on the embedding;
+    otherwise label names are matched against FASHION_CATEGORIES.
+    """
+    if head is not None and embedding is not None:
+        return head.categorize(embedding)
 
-    # Fashion classification
     best_cat = "other"
     best_sub = ""
     conf = 0.0
 
-    for _, label, prob in decoded:
+    for label, prob in top_labels(probs, labels=labels):
         label = label.lower()
         for cat, keys in FASHION_CATEGORIES.items():
             if any(k in label for k in keys):
@@ -384,87 +424,54 @@ async def classify_image(image_bytes: bytes) -> Dict[str, Any]:
                     conf = prob
                     best_cat = cat
                     best_sub = label
-
-    # Color extraction
-    img_cv = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
-    if img_cv is not None:
-        img_cv = cv2.resize(img_cv, (120, 120))
-        pixels = img_cv.reshape(-1, 3).astype(np.float32)
-        _, _, centers = cv2.kmeans(pixels, 5, None,
-                                 (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0),
-                                 10, cv2.KMEANS_RANDOM_CENTERS)
-        colors_hex = ['#%02x%02x%02x' % (c[2], c[1], c[0]) for c in centers.astype(int)]
-        dominant = colors_hex[0]
-    else:
-        dominant = "#95a5a6"
-        colors_hex = [dominant]
-
+    return best_cat, best_sub, conf
+
+def classification_result(
+    best_cat: str,
+    best_sub: str,
+    conf: float,
+    dominant: str,
+    colors_hex: List[str],
+    pattern_fallback: bool = True
+) -> Dict[str, Any]:
     # Improved Kenyan/African pattern detection (post-fine-tuning enhancement)
-    if best_cat == "other" and len(set(colors_hex)) > 3:  # Colorful patterns
+    # Only for label matching – a trained head has "traditional" as a class of its own
+    if pattern_fallback and best_cat == "other" and len(set(colors_hex)) > 3:  # Colorful patterns
         best_cat = "traditional"
         best_sub = "kitenge or similar"
 
-    material = _guess_material(best_cat)
-    style = _guess_style(best_cat, dominant)
-    seasonality = _guess_seasonality(best_cat, material, dominant)
+    # Material / style / seasonality: deterministic rules from data/attribute_rules.json
+    attributes = attribute_rules.infer(best_cat, best_sub, dominant)
 
     return {
         "category": best_cat,
         "subcategory": best_sub,
         "color": dominant,
         "colors_palette": colors_hex,
-        "style": style,
-        "material": material,
-        "seasonality": seasonality,
+        "style": attributes["style"],
+        "material": attributes["material"],
+        "seasonality": attributes["seasonality"],
         "confidence": round(float(conf), 3)
     }
 
-def _guess_material(cat: str) -> str:
-    opts = {
-        "shirt": "cotton", "trousers": "denim", "dress": "cotton",
-        "jacket": "polyester", "shoes": "leather", "traditional": "cotton",
-        "jewellery": "metal"
-    }
-    return opts.get(cat, "unknown")
-
-def _guess_style(cat: str, dominant_color: str) -> str:
-    if cat in ["jacket", "dress"] and dominant_color in ["#000000", "#1a1a1a", "#333333"]:
-        return "formal"
-    if cat == "traditional":
-        return "traditional"
-    return "casual"
-
-def _guess_seasonality(cat: str, material: str, color: str) -> str:
-    if cat in ["jacket"] or material in ["wool", "leather"]:
-        return "warm"
-    if "light" in color.lower() or material == "linen":
-        return "light"
-    if np.random.random() < 0.15:  # small chance of waterproof (raincoats etc)
-        return "waterproof"
-    return "cool"
-
-async def extract_features(image_bytes: bytes) -> np.ndarray:
-    img = Image.open(BytesIO(image_bytes)).convert('RGB')
-    img = img.resize((224, 224))
-    arr = tf_image.img_to_array(img)
-    arr = np.expand_dims(arr, 0)
-    arr = preprocess_input(arr)
-    return feature_model.predict(arr, verbose=0).flatten()
+@timed("extract_features")
+async def extract_features(image: Union[bytes, DecodedImage], model: Optional[ServingModel] = None) -> np.ndarray:
+    _, embedding = await (model or model_registry.current()).predict(as_decoded(image))
+    return embedding
 
 # ========== WARDROBE MANAGEMENT ==========
+def new_item_id(user_id: str) -> str:
+    # Timestamp alone collides on fast uploads → add a random suffix
+    return f"{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
 async def add_to_wardrobe(user_id: str, image_bytes: bytes) -> Dict:
-    item_id = f"{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    
-    classification = await classify_image(image_bytes)
-    features = await extract_features(image_bytes)
-    
-    faiss.normalize_L2(features.reshape(1, -1))
+    item_id = new_item_id(user_id)
     
-    # Add to FAISS with ID
-    faiss_id = len(wardrobe_db.get(user_id, {}))  # simple incremental
-    faiss_index.add_with_ids(features.reshape(1, -1), np.array([faiss_id], dtype=np.int64))
+    decoded = DecodedImage(image_bytes)
+    classification = await classify_image(decoded)
+    features = await extract_features(decoded)
     
-    image_path = save_image(image_bytes, item_id)
+    image_path = await save_image(image_bytes, item_id)
     
     item = WardrobeItem(
         id=item_id,
@@ -476,13 +483,11 @@ async def add_to_wardrobe(user_id: str, image_bytes: bytes) -> Dict:
         material=classification["material"],
         seasonality=classification["seasonality"],
         features=features,
-        image_path=image_path,
-        faiss_id=faiss_id
+        image_path=image_path
     )
     
-    if user_id not in wardrobe_db:
-        wardrobe_db[user_id] = {}
-    wardrobe_db[user_id][item_id] = item
+    with wardrobe_lock:
+        wardrobe_db.setdefault(user_id, {})[item_id] = item
     
     return {
         "success": True,
@@ -503,12 +508,14 @@ class FashionAIAssistant:
                                  user_id: str,
                                  occasion: str,
                                  city: str = "nairobi",
-                                 preferences: Optional[Dict] = None) -> List[Dict]:
+                                 preferences: Optional[Dict] = None,
+                                 lat: Optional[float] = None,
+                                 lon: Optional[float] = None) -> List[Dict]:
         if user_id not in wardrobe_db or not wardrobe_db[user_id]:
             return []
 
         items = list(wardrobe_db[user_id].values())
-        weather = await weather_service.get_weather(city)
+        weather = await weather_service.get_weather(city, lat, lon)
         seasonality_req = weather_service.get_seasonality_recommendation(weather)
 
         # Very simple outfit generator (expand in production)
@@ -0,0 +1,114 @@
+# backend/attribute_rules.py
+"""
+Material / style / seasonality of a classified item from a rules file
+(data/attribute_rules.json, or ATTRIBUTE_RULES_PATH).
+
+Each attribute is an ordered list of rules; the first rule whose
+conditions all hold gives the value, else the default. Conditions:
+
+    categories   the fashion category is one of these
+    keywords     one of these appears in the subcategory (ImageNet label
+                 or the fashion head's class, so embedding-derived)
+    materials    the material inferred above is one of these (seasonality)
+    color_tones  the dominant colour's tone ("dark" / "light", by luma range)
+
+No randomness: the same (category, subcategory, colour) always gives the
+same attributes, so cached classifications and deduplicated uploads agree
+with freshly computed ones. `version` changes with the rules file and is
+part of the inference-cache key.
+"""
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+# ========== CONFIGURATION ==========
+ATTRIBUTE_RULES_PATH = os.getenv(
+    "ATTRIBUTE_RULES_PATH", os.path.join(os.path.dirname(__file__), "data", "attribute_rules.json")
+)
+ATTRIBUTES = ("material", "style", "seasonality")     # evaluation order – seasonality may use material
+CONDITIONS = ("categories", "keywords", "materials", "color_tones")
+
+
+def luma(hex_color: str) -> Optional[float]:
+    """Rec. 601 luma (0–255) of '#rrggbb', None if it isn't one."""
+    value = hex_color.lstrip("#")
+    if len(value) != 6:
+        return None
+    try:
+        r, g, b = (int(value[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return None
+    return 0.299 * r + 0.587 * g + 0.114 * b
+
+
+class _Rule:
+    __slots__ = ("categories", "keywords", "materials", "color_tones", "value")
+
+    def __init__(self, spec: Dict[str, Any], attribute: str):
+        unknown = set(spec) - set(CONDITIONS) - {"value"}
+        if unknown or "value" not in spec:
+            raise ValueError(f"Invalid {attribute} rule {spec}: unknown keys {sorted(unknown)} or no value")
+        if "materials" in spec and attribute == "material":
+            raise ValueError("material rules can't depend on the material")
+        for name in CONDITIONS:
+            values = spec.get(name)
+            setattr(self, name, tuple(v.lower() for v in values) if values else None)
+        self.value = spec["value"]
+
+    def matches(self, category: str, subcategory: str, material: str, tone: Optional[str]) -> bool:
+        return (
+            (self.categories is None or category in self.categories)
+            and (self.keywords is None or any(k in subcategory for k in self.keywords))
+            and (self.materials is None or material in self.materials)
+            and (self.color_tones is None or tone in self.color_tones)
+        )
+
+
+class AttributeRules:
+    """Compiled rules file. infer() is memoized – the inputs repeat a lot (few categories × labels × tones)."""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.defaults: Dict[str, str] = config["defaults"]
+        missing = [a for a in ATTRIBUTES if a not in self.defaults]
+        if missing:
+            raise ValueError(f"Attribute rules need defaults for {missing}")
+        self.color_tones: List[Tuple[str, float, float]] = [
+            (tone, float(low), float(high)) for tone, (low, high) in config.get("color_tones", {}).items()
+        ]
+        self.rules: Dict[str, List[_Rule]] = {a: [_Rule(r, a) for r in config.get(a, [])] for a in ATTRIBUTES}
+        # Every category some rule names – the rest always get the defaults (jobs.fashion_head warns about those)
+        self.categories = frozenset(c for rules in self.rules.values() for r in rules for c in (r.categories or ()))
+        self.version = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:8]
+        self.infer = lru_cache(maxsize=4096)(self._infer)
+
+    @classmethod
+    def from_file(cls, path: str = ATTRIBUTE_RULES_PATH) -> "AttributeRules":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def tone(self, hex_color: str) -> Optional[str]:
+        value = luma(hex_color)
+        if value is None:
+            return None
+        return next((tone for tone, low, high in self.color_tones if low <= value <= high), None)
+
+    def _first(self, attribute: str, category: str, subcategory: str, material: str, tone: Optional[str]) -> str:
+        for rule in self.rules[attribute]:
+            if rule.matches(category, subcategory, material, tone):
+                return rule.value
+        return self.defaults[attribute]
+
+    def _infer(self, category: str, subcategory: str, dominant_color: str) -> Dict[str, str]:
+        category, subcategory = category.lower(), (subcategory or "").lower()
+        tone = self.tone(dominant_color)
+        material = self._first("material", category, subcategory, "", tone)
+        return {
+            "material": material,
+            "style": self._first("style", category, subcategory, material, tone),
+            "seasonality": self._first("seasonality", category, subcategory, material, tone),
+        }
+
+
+attribute_rules = AttributeRules.from_file()
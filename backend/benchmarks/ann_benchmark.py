@@ -0,0 +1,134 @@
+# backend/benchmarks/ann_benchmark.py
+"""
+Recall@k vs. latency for the FAISS backends in faiss_utils, on synthetic
+clustered 1280-d vectors (roughly the shape of MobileNetV2 embeddings).
+
+    cd backend
+    python -m benchmarks.ann_benchmark --n 200000 --queries 500 --k 10
+    python -m benchmarks.ann_benchmark --backends ivfpq --nprobe 4 16 64 --json ann.json
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from faiss_utils import make_index, normalize
+
+
+def synthetic_embeddings(n: int, dim: int, n_clusters: int, seed: int) -> np.ndarray:
+    """Gaussian blobs – uniform random vectors make every ANN index look bad."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    vecs = centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return normalize(vecs)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray, k: int) -> float:
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def run_config(
+    index_type: str,
+    base: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+    train_size: int,
+    knob_values: List[int],
+    **index_kwargs
+) -> List[Dict]:
+    dim = base.shape[1]
+    index = make_index(index_type, dim, **index_kwargs)
+
+    t0 = time.perf_counter()
+    if not index.is_trained:
+        index.train(base[:train_size])
+    train_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index.add(base)
+    add_s = time.perf_counter() - t0
+    size_mb = faiss.serialize_index(index).nbytes / 1e6
+
+    rows = []
+    for knob in knob_values or [None]:
+        if knob is not None and index_type == "ivfpq":
+            index.nprobe = knob
+        elif knob is not None and index_type == "hnsw":
+            index.hnsw.efSearch = knob
+
+        # One query at a time, like the API does per request
+        latencies = []
+        found = np.empty((len(queries), k), dtype=np.int64)
+        for i, q in enumerate(queries):
+            t0 = time.perf_counter()
+            _, labels = index.search(q.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found[i] = labels[0]
+
+        lat = np.array(latencies)
+        rows.append({
+            "backend": index_type,
+            "knob": knob,
+            "recall_at_k": round(recall_at_k(found, truth, k), 4),
+            "latency_ms_p50": round(float(np.percentile(lat, 50)), 3),
+            "latency_ms_p95": round(float(np.percentile(lat, 95)), 3),
+            "train_s": round(train_s, 2),
+            "add_s": round(add_s, 2),
+            "index_mb": round(size_mb, 1),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS backend recall/latency benchmark")
+    parser.add_argument("--n", type=int, default=100_000, help="database vectors")
+    parser.add_argument("--dim", type=int, default=1280)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--train-size", type=int, default=50_000)
+    parser.add_argument("--backends", nargs="+", default=["flat", "ivfpq", "hnsw"])
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--pq-m", type=int, default=64)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    data = synthetic_embeddings(args.n + args.queries, args.dim, args.clusters, args.seed)
+    base, queries = data[:args.n], data[args.n:]
+
+    exact = faiss.IndexFlatIP(args.dim)
+    exact.add(base)
+    _, truth = exact.search(queries, args.k)
+
+    rows = []
+    for backend in args.backends:
+        knobs = {"ivfpq": args.nprobe, "hnsw": args.ef_search}.get(backend, [])
+        rows += run_config(
+            backend, base, queries, truth, args.k,
+            train_size=min(args.train_size, args.n),
+            knob_values=knobs,
+            nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m
+        )
+
+    print(f"{'backend':8} {'knob':>6} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8} {'train s':>8} {'add s':>7} {'MB':>8}")
+    for r in rows:
+        print(f"{r['backend']:8} {str(r['knob'] or '-'):>6} {r['recall_at_k']:>10} {r['latency_ms_p50']:>8} "
+              f"{r['latency_ms_p95']:>8} {r['train_s']:>8} {r['add_s']:>7} {r['index_mb']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
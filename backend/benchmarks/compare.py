@@ -0,0 +1,62 @@
+# backend/benchmarks/compare.py
+"""
+Compare two benchmark result files (from benchmarks.suite) case by case.
+
+    cd backend
+    python -m benchmarks.compare benchmarks/results/<base>.json benchmarks/results/<head>.json
+    python -m benchmarks.compare base.json head.json --metric p95_ms --threshold 15
+
+Exits with status 1 if any case got slower than --threshold percent, so it
+can gate a CI job.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Optional
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def change_pct(base: Optional[float], head: Optional[float]) -> Optional[float]:
+    if not base or head is None:
+        return None
+    return (head - base) / base * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--metric", default="p50_ms", choices=["p50_ms", "p95_ms", "mean_ms", "min_ms"])
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    base, head = load(args.base), load(args.head)
+    print(f"base {base['meta']['commit']} ({base['meta']['database']})  →  "
+          f"head {head['meta']['commit']} ({head['meta']['database']})   metric: {args.metric}\n")
+    print(f"{'case':<28}{'base':>12}{'head':>12}{'change':>10}")
+
+    regressions = []
+    for case in sorted(set(base["results"]) | set(head["results"])):
+        b = base["results"].get(case, {}).get(args.metric)
+        h = head["results"].get(case, {}).get(args.metric)
+        pct = change_pct(b, h)
+        flag = ""
+        if pct is not None and pct > args.threshold:
+            flag = "  ← slower"
+            regressions.append(case)
+        elif pct is not None and pct < -args.threshold:
+            flag = "  faster"
+        pct_str = f"{pct:+.1f}%" if pct is not None else "n/a"
+        print(f"{case:<28}{b if b is not None else '-':>12}{h if h is not None else '-':>12}{pct_str:>10}{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# backend/benchmarks/fixtures.py
+"""
+Local stand-ins shared by the benchmark suite and the load generator:
+an in-process app wired to mongomock-motor (or a local mongod), LocalStorage
+in a temp dir, synthetic users/wardrobes and synthetic JPEGs.
+
+configure_env() must run before anything imports main / ai_utils, because
+those read their configuration at import time.
+"""
+import os
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+from io import BytesIO
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+BENCH_DATABASE = "wardrobe_ai_kenya_bench"
+BENCH_PASSWORD = "benchmark-password"
+BASE_URL = "http://bench"
+
+CATEGORIES = ["shirt", "trousers", "dress", "jacket", "shoes", "traditional", "jewellery"]
+COLORS = ["#a83232", "#1a1a1a", "#f2c94c", "#2d9cdb", "#27ae60", "#ffffff", "#95a5a6"]
+STYLES = ["casual", "formal", "traditional"]
+MATERIALS = ["cotton", "denim", "polyester", "leather", "kitenge"]
+
+
+def configure_env(storage_dir: Optional[str] = None) -> str:
+    """Offline defaults: local storage, inline enrichment, no background workers."""
+    storage_dir = storage_dir or tempfile.mkdtemp(prefix="wardrobe-bench-")
+    os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["LOCAL_STORAGE_DIR"] = storage_dir
+    os.environ["LOCAL_STORAGE_URL"] = f"{BASE_URL}/media"
+    os.environ.setdefault("ASYNC_ENRICHMENT", "0")
+    os.environ.setdefault("JOB_WORKERS", "0")
+    return storage_dir
+
+
+def make_db(mongo_uri: Optional[str] = None):
+    """mongomock-motor by default; a real (local) mongod when mongo_uri is given."""
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        return AsyncIOMotorClient(mongo_uri)[BENCH_DATABASE]
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError as e:
+        raise SystemExit("pip install -r benchmarks/requirements.txt (or pass --mongo-uri)") from e
+    return AsyncMongoMockClient()[BENCH_DATABASE]
+
+
+def make_app(db, storage_dir: str):
+    """The real FastAPI app, without its startup hooks (no Atlas, workers or snapshot loop)."""
+    from main import app
+    from storage_utils import LocalStorage, set_storage
+
+    app.state.db = db
+    set_storage(LocalStorage(storage_dir, f"{BASE_URL}/media"))
+    return app
+
+
+def make_client(app):
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=BASE_URL, timeout=120)
+
+
+def synthetic_jpeg(seed: int, size=(640, 480)) -> bytes:
+    """Distinct per seed, so every upload/search misses the inference cache."""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 255, size=(size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+    img = Image.fromarray(pixels).resize(size, Image.BILINEAR)
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        x0, y0 = rng.integers(0, size[0] // 2), rng.integers(0, size[1] // 2)
+        draw.rectangle(
+            [x0, y0, x0 + rng.integers(40, size[0] // 2), y0 + rng.integers(40, size[1] // 2)],
+            fill=tuple(int(c) for c in rng.integers(0, 255, 3))
+        )
+    buffer = BytesIO()
+    img.save(buffer, "JPEG", quality=88)
+    return buffer.getvalue()
+
+
+def auth_headers(user_id: str) -> Dict[str, str]:
+    from routes.auth import create_access_token
+    token = create_access_token({"sub": user_id}, expires_delta=timedelta(hours=12))
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def seed_user(db, email: str, n_items: int, seed: int = 0, password_hash: Optional[str] = None) -> str:
+    """A user with n_items enriched wardrobe items (embeddings in the active codec)."""
+    from routes.auth import get_password_hash
+
+    result = await db.users.insert_one({
+        "email": email,
+        "hashed_password": password_hash or get_password_hash(BENCH_PASSWORD),
+        "full_name": "Benchmark User",
+        "created_at": datetime.utcnow()
+    })
+    user_id = str(result.inserted_id)
+    if n_items:
+        await db.wardrobe_items.insert_many(synthetic_items(user_id, n_items, seed))
+    return user_id
+
+
+def synthetic_items(user_id: str, n_items: int, seed: int = 0, batch: int = 1000) -> List[Dict]:
+    from embedding_codec import get_active_codec
+    from model_registry import model_registry
+
+    codec = get_active_codec()
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+    items = []
+    for start in range(0, n_items, batch):
+        count = min(batch, n_items - start)
+        # Non-negative like MobileNetV2's pooled ReLU features
+        raw = np.abs(rng.standard_normal((count, codec.input_dim))).astype(np.float32)
+        encoded = codec.encode(raw)
+        for i in range(count):
+            wear_count = int(rng.integers(0, 40))
+            items.append({
+                "user_id": user_id,
+                "image_url": f"{BASE_URL}/media/wardrobe-items/{seed}-{start + i}.jpg",
+                "category": CATEGORIES[int(rng.integers(len(CATEGORIES)))],
+                "color": COLORS[int(rng.integers(len(COLORS)))],
+                "colors_palette": [str(c) for c in rng.choice(COLORS, 3)],
+                "style": STYLES[int(rng.integers(len(STYLES)))],
+                "material": MATERIALS[int(rng.integers(len(MATERIALS)))],
+                "seasonality": "all-season",
+                "features": encoded[i].tolist(),
+                "codec_id": codec.codec_id,
+                "model_version": model_registry.current_version(),
+                "wear_count": wear_count,
+                "last_worn": now - timedelta(days=int(rng.integers(1, 300))) if wear_count else None,
+                "is_mitumba": bool(rng.random() < 0.4),
+                "purchase_price_kes": float(rng.integers(200, 5000)) if rng.random() < 0.6 else None,
+                "status": "enriched",
+                "created_at": now - timedelta(days=int(rng.integers(0, 365))),
+                "updated_at": now,
+                "times_suggested": 0,
+            })
+    return items
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
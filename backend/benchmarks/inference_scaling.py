@@ -0,0 +1,142 @@
+# backend/benchmarks/inference_scaling.py
+"""
+Inference throughput vs. core count: the original in-process path (a
+classification and a feature predict per image, on the event loop) against
+the process pool at several worker counts, each worker pinned to
+cores/workers intra-op threads.
+
+The in-process baseline runs in a subprocess so TensorFlow's thread pools
+in this process don't compete with the pool workers.
+
+    cd backend
+    python -m benchmarks.inference_scaling
+    python -m benchmarks.inference_scaling --workers 1 2 4 8 --requests 400 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from inference_pool import InferencePool
+
+
+def synthetic_inputs(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(n, 224, 224, 3), dtype=np.uint8)
+
+
+def percentile_ms(latencies, q: float) -> float:
+    return round(float(np.percentile(latencies, q)) * 1000, 1)
+
+
+def run_inprocess(requests: int) -> None:
+    import tensorflow as tf
+    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2, preprocess_input
+    classification_model = MobileNetV2(weights="imagenet")
+    feature_model = tf.keras.Model(inputs=classification_model.input, outputs=classification_model.layers[-2].output)
+    inputs = synthetic_inputs(requests)
+    warmup = preprocess_input(inputs[:1].astype(np.float32))
+    classification_model.predict(warmup, verbose=0)
+    feature_model.predict(warmup, verbose=0)
+
+    latencies = []
+    t0 = time.perf_counter()
+    for rgb in inputs:
+        start = time.perf_counter()
+        x = preprocess_input(rgb[np.newaxis].astype(np.float32))
+        classification_model.predict(x, verbose=0)
+        feature_model.predict(x, verbose=0)
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({
+        "mode": "in-process",
+        "workers": 0,
+        "intra_op": os.cpu_count(),
+        "images_per_sec": round(requests / elapsed, 1),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+    }))
+
+
+async def run_pool(workers: int, requests: int, concurrency: int, slots: int) -> dict:
+    pool = InferencePool(workers=workers, slots=slots)
+    start_t = time.perf_counter()
+    await asyncio.to_thread(pool.start)
+    startup_s = time.perf_counter() - start_t
+    inputs = synthetic_inputs(requests)
+    await asyncio.gather(*(pool.infer(inputs[i]) for i in range(min(workers * slots, requests))))  # warm up
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(rgb):
+        async with semaphore:
+            start = time.perf_counter()
+            await pool.infer(rgb)
+            latencies.append(time.perf_counter() - start)
+
+    try:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(rgb) for rgb in inputs))
+        elapsed = time.perf_counter() - t0
+    finally:
+        pool.stop()
+    return {
+        "mode": "pool",
+        "workers": workers,
+        "intra_op": pool.intra_threads,
+        "images_per_sec": round(requests / elapsed, 1),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "startup_s": round(startup_s, 1),
+    }
+
+
+def default_worker_counts():
+    cores = os.cpu_count() or 1
+    counts, n = [], 1
+    while n <= cores:
+        counts.append(n)
+        n *= 2
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference pool scaling benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_worker_counts())
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--slots", type=int, default=8, help="Shared-memory slots (max micro-batch) per worker")
+    parser.add_argument("--skip-baseline", action="store_true")
+    parser.add_argument("--run", choices=["inprocess"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_inprocess(args.requests)
+        return
+
+    print(f"{os.cpu_count()} cores, {args.requests} images, concurrency {args.concurrency}\n")
+    rows = []
+    if not args.skip_baseline:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.inference_scaling", "--run", "inprocess", "--requests", str(args.requests)],
+            capture_output=True, text=True, check=True
+        )
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    for workers in args.workers:
+        rows.append(asyncio.run(run_pool(workers, args.requests, args.concurrency, args.slots)))
+
+    baseline = rows[0]["images_per_sec"]
+    print(f"{'mode':<12}{'workers':>8}{'intra_op':>10}{'img/s':>10}{'speedup':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    for row in rows:
+        print(f"{row['mode']:<12}{row['workers']:>8}{row['intra_op']:>10}{row['images_per_sec']:>10}"
+              f"{row['images_per_sec'] / baseline:>8.2f}x{row['p50_ms']:>9}{row['p95_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# backend/benchmarks/ingest_memory.py
+"""
+Peak RSS + time of image ingestion: the old decode path (PIL full-res twice +
+cv2.imdecode) vs. DecodedImage (one draft-mode decode shared by all stages).
+
+Each variant runs in a fresh subprocess so ru_maxrss is not polluted.
+
+    cd backend
+    python -m benchmarks.ingest_memory                 # synthetic 12 MP JPEG
+    python -m benchmarks.ingest_memory --image photo.jpg
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from image_utils import DecodedImage, peak_rss_mb
+
+
+def make_test_jpeg(path: str, width: int = 4000, height: int = 3000) -> None:
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    noise = rng.integers(0, 60, size=(height, width, 3), dtype=np.uint8)
+    pixels = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+    Image.fromarray(pixels).save(path, "JPEG", quality=92)
+
+
+def legacy_decode(image_bytes: bytes):
+    """What classify_image + extract_features did before (two PIL decodes + OpenCV)."""
+    import cv2
+    img = Image.open(BytesIO(image_bytes)).convert("RGB")
+    a = np.asarray(img.resize((224, 224)), dtype=np.float32)
+    img_cv = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    b = cv2.resize(img_cv, (120, 120))
+    img2 = Image.open(BytesIO(image_bytes)).convert("RGB")
+    c = np.asarray(img2.resize((224, 224)), dtype=np.float32)
+    return a, b, c
+
+
+def shared_decode(image_bytes: bytes):
+    image = DecodedImage(image_bytes)
+    result = image.rgb224, image.bgr_small, image.gray_hash_input
+    image.release()
+    return result
+
+
+def run_variant(variant: str, path: str) -> None:
+    with open(path, "rb") as f:
+        image_bytes = f.read()
+    before = peak_rss_mb()
+    t0 = time.perf_counter()
+    {"legacy": legacy_decode, "shared": shared_decode}[variant](image_bytes)
+    elapsed = (time.perf_counter() - t0) * 1000
+    print(json.dumps({
+        "variant": variant,
+        "ms": round(elapsed, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_rss_growth_mb": round(peak_rss_mb() - before, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image ingestion peak-RSS benchmark")
+    parser.add_argument("--image", help="JPEG to test with (default: synthetic 12 MP)")
+    parser.add_argument("--run", choices=["legacy", "shared"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_variant(args.run, args.image)
+        return
+
+    path = args.image
+    if not path:
+        path = os.path.join(tempfile.mkdtemp(), "test_12mp.jpg")
+        make_test_jpeg(path)
+    print(f"Image: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    for variant in ("legacy", "shared"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.ingest_memory", "--run", variant, "--image", path],
+            capture_output=True, text=True, check=True
+        )
+        print(out.stdout.strip())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# backend/benchmarks/loadgen.py
+"""
+Closed-loop load generator: N virtual users log in, then repeatedly pick an
+action from a weighted mix (upload, visual-search, mark-worn, analytics,
+trends, login) with exponential think time. Reports p50/p95/p99 latency,
+throughput and error rate per endpoint and checks them against SLOs.
+
+In process (default): the real app over httpx's ASGI transport, mongomock-motor,
+LocalStorage instead of Cloudinary, a fixed weather stub. Against a running node:
+--url, optionally seeding closets straight into its database with --mongo-uri.
+
+    cd backend
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.loadgen --users 20 --duration 60
+    python -m benchmarks.loadgen --config my_mix.json --output load.json
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --mongo-uri mongodb://localhost:27017 --users 50
+
+Exit status is 1 when any SLO fails. --config takes a JSON file shaped like
+DEFAULT_CONFIG; keys given there override the defaults.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fixtures import (
+    BENCH_PASSWORD, auth_headers, configure_env, git_commit, make_app, make_client, make_db, synthetic_items,
+    synthetic_jpeg
+)
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "users": 20,
+    "duration_seconds": 60,
+    "ramp_up_seconds": 10,
+    "think_time_seconds": 1.0,       # mean of an exponential distribution
+    "closet_size": 100,
+    "mix": {
+        "visual_search": 30,
+        "mark_worn": 20,
+        "trends": 20,
+        "analytics": 15,
+        "upload": 10,
+        "login": 5,
+    },
+    "paths": {
+        "login": "/api/auth/auth/login",
+        "register": "/api/auth/auth/register",
+        "upload": "/api/wardrobe/upload",
+        "visual_search": "/api/wardrobe/visual-search",
+        "mark_worn": "/api/wardrobe/{item_id}/mark-worn",
+        "analytics": "/api/wardrobe/analytics",
+        "trends": "/api/wardrobe/trends",
+    },
+    # Per endpoint; "*" applies to every endpoint without its own entry
+    "slo": {
+        "*": {"p95_ms": 500, "p99_ms": 1000, "max_error_rate": 0.01},
+        "upload": {"p95_ms": 3000, "p99_ms": 5000, "max_error_rate": 0.01},
+        "visual_search": {"p95_ms": 1500, "p99_ms": 3000, "max_error_rate": 0.01},
+        "login": {"p95_ms": 800, "p99_ms": 1500, "max_error_rate": 0.0},
+        "min_throughput_rps": 5,
+    },
+}
+
+
+def merge_config(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            merged[key] = merge_config(base[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def percentile(ordered: List[float], pct: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 1)
+
+
+@dataclass
+class VirtualUser:
+    email: str
+    user_id: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    item_ids: List[str] = field(default_factory=list)
+
+
+class LoadTest:
+    def __init__(self, config: Dict[str, Any], url: Optional[str], mongo_uri: Optional[str], database: Optional[str]):
+        self.config = config
+        self.url = url
+        self.mongo_uri = mongo_uri
+        self.database = database
+        self.paths = config["paths"]
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = Counter()
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.image_seq = 0
+        self.client = None
+        self.db = None
+
+    # ── Setup ────────────────────────────────────────────────────────────────
+    async def setup(self) -> List[VirtualUser]:
+        users = [VirtualUser(email=f"load-{i}@loadtest.example.com") for i in range(self.config["users"])]
+
+        if self.url is None:
+            storage_dir = configure_env()
+            self.db = make_db(self.mongo_uri)
+            app = make_app(self.db, storage_dir)
+            self.paths = {**self.paths, "login": app.url_path_for("login"), "register": app.url_path_for("register")}
+            self._stub_weather()
+            await self._start_workers_if_async()
+            self.client = make_client(app)
+        else:
+            import httpx
+            from motor.motor_asyncio import AsyncIOMotorClient
+            self.client = httpx.AsyncClient(base_url=self.url, timeout=120)
+            if self.mongo_uri:
+                self.db = AsyncIOMotorClient(self.mongo_uri)[self.database or "wardrobe_ai_kenya"]
+
+        if self.db is not None:
+            await self._seed_direct(users)
+        else:
+            await self._register(users)
+        return users
+
+    def _stub_weather(self) -> None:
+        import ai_utils
+
+        async def fixed_weather(city: str = "nairobi", lat=None, lon=None) -> Dict[str, Any]:
+            return {"temperature": 22.0, "condition": "cloudy", "humidity": 60, "rain_probability": 20,
+                    "city": (city or "nairobi").title()}
+        ai_utils.weather_service.get_weather = fixed_weather
+
+    async def _start_workers_if_async(self) -> None:
+        from services.enrichment import ASYNC_ENRICHMENT
+        from services.job_queue import start_workers
+        if ASYNC_ENRICHMENT:
+            start_workers(self.db, 2)
+
+    async def _seed_direct(self, users: List[VirtualUser]) -> None:
+        """Users + closets written straight to MongoDB; one bcrypt hash shared by all."""
+        from routes.auth import get_password_hash
+        password_hash = get_password_hash(BENCH_PASSWORD)
+        await self.db.users.delete_many({"email": {"$regex": r"^load-\d+@loadtest\.example\.com$"}})
+        for i, user in enumerate(users):
+            result = await self.db.users.insert_one(
+                {"email": user.email, "hashed_password": password_hash, "full_name": "Load User",
+                 "created_at": datetime.utcnow()}
+            )
+            user.user_id = str(result.inserted_id)
+            user.headers = auth_headers(user.user_id) if self.url is None else {}
+            if self.config["closet_size"]:
+                inserted = await self.db.wardrobe_items.insert_many(
+                    synthetic_items(user.user_id, self.config["closet_size"], seed=i)
+                )
+                user.item_ids = [str(oid) for oid in inserted.inserted_ids]
+
+    async def _register(self, users: List[VirtualUser]) -> None:
+        """Remote node without DB access: register through the API, closets grow via uploads."""
+        for user in users:
+            await self.client.post(self.paths["register"], json={
+                "email": user.email, "password": BENCH_PASSWORD, "full_name": "Load User"
+            })
+
+    # ── Actions ──────────────────────────────────────────────────────────────
+    async def _timed(self, endpoint: str, request) -> Optional[Any]:
+        start = time.perf_counter()
+        try:
+            response = await request
+        except Exception as e:
+            self.errors[endpoint] += 1
+            self.statuses[endpoint][type(e).__name__] += 1
+            return None
+        elapsed = (time.perf_counter() - start) * 1000
+        self.statuses[endpoint][response.status_code] += 1
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+        else:
+            self.latencies[endpoint].append(elapsed)
+        return response
+
+    def _next_image(self) -> bytes:
+        self.image_seq += 1
+        return synthetic_jpeg(50_000 + self.image_seq)
+
+    async def login(self, user: VirtualUser) -> None:
+        response = await self._timed("login", self.client.post(
+            self.paths["login"], data={"username": user.email, "password": BENCH_PASSWORD}
+        ))
+        if response is not None and response.status_code == 200:
+            user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def upload(self, user: VirtualUser) -> None:
+        files = {"file": (f"load-{self.image_seq}.jpg", self._next_image(), "image/jpeg")}
+        response = await self._timed("upload", self.client.post(self.paths["upload"], files=files, headers=user.headers))
+        if response is not None and response.status_code < 400:
+            user.item_ids.append(response.json()["item_id"])
+
+    async def visual_search(self, user: VirtualUser) -> None:
+        files = {"file": ("query.jpg", self._next_image(), "image/jpeg")}
+        await self._timed("visual_search", self.client.post(self.paths["visual_search"], files=files, headers=user.headers))
+
+    async def mark_worn(self, user: VirtualUser) -> None:
+        if not user.item_ids:
+            return await self.trends(user)
+        path = self.paths["mark_worn"].format(item_id=random.choice(user.item_ids))
+        await self._timed("mark_worn", self.client.post(path, headers=user.headers))
+
+    async def analytics(self, user: VirtualUser) -> None:
+        await self._timed("analytics", self.client.get(self.paths["analytics"], headers=user.headers))
+
+    async def trends(self, user: VirtualUser) -> None:
+        await self._timed("trends", self.client.get(self.paths["trends"], headers=user.headers))
+
+    # ── Run ──────────────────────────────────────────────────────────────────
+    async def user_loop(self, user: VirtualUser, start_delay: float, deadline: float) -> None:
+        await asyncio.sleep(start_delay)
+        await self.login(user)
+        actions = list(self.config["mix"])
+        weights = [self.config["mix"][a] for a in actions]
+        think = self.config["think_time_seconds"]
+        while time.monotonic() < deadline:
+            await getattr(self, random.choices(actions, weights)[0])(user)
+            if think > 0:
+                await asyncio.sleep(min(random.expovariate(1 / think), max(0.0, deadline - time.monotonic())))
+
+    async def run(self) -> Dict[str, Any]:
+        users = await self.setup()
+        ramp = self.config["ramp_up_seconds"]
+        started = time.monotonic()
+        deadline = started + self.config["duration_seconds"]
+        try:
+            await asyncio.gather(*(
+                self.user_loop(user, ramp * i / max(1, len(users)), deadline) for i, user in enumerate(users)
+            ))
+        finally:
+            await self.client.aclose()
+        return self.report(time.monotonic() - started)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        slo = self.config["slo"]
+        endpoints = {}
+        failures = []
+        total_requests = 0
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            ordered = sorted(self.latencies[endpoint])
+            requests = len(ordered) + self.errors[endpoint]
+            total_requests += requests
+            stats = {
+                "requests": requests,
+                "errors": self.errors[endpoint],
+                "error_rate": round(self.errors[endpoint] / requests, 4) if requests else 0.0,
+                "throughput_rps": round(requests / elapsed, 2),
+                "p50_ms": percentile(ordered, 0.50),
+                "p95_ms": percentile(ordered, 0.95),
+                "p99_ms": percentile(ordered, 0.99),
+                "max_ms": round(ordered[-1], 1) if ordered else None,
+                "status_codes": {str(k): v for k, v in self.statuses[endpoint].items()},
+            }
+            target = slo.get(endpoint, slo.get("*", {}))
+            for key in ("p95_ms", "p99_ms"):
+                if key in target and stats[key] is not None and stats[key] > target[key]:
+                    failures.append(f"{endpoint} {key} {stats[key]} > {target[key]}")
+            if "max_error_rate" in target and stats["error_rate"] > target["max_error_rate"]:
+                failures.append(f"{endpoint} error_rate {stats['error_rate']} > {target['max_error_rate']}")
+            stats["slo"] = target
+            endpoints[endpoint] = stats
+
+        throughput = round(total_requests / elapsed, 2)
+        if "min_throughput_rps" in slo and throughput < slo["min_throughput_rps"]:
+            failures.append(f"throughput {throughput} rps < {slo['min_throughput_rps']}")
+
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.utcnow().isoformat(),
+                "target": self.url or "in-process",
+                "database": "mongod" if self.mongo_uri else ("none" if self.db is None else "mongomock"),
+                "users": self.config["users"],
+                "duration_seconds": round(elapsed, 1),
+                "mix": self.config["mix"],
+            },
+            "total": {"requests": total_requests, "throughput_rps": throughput},
+            "endpoints": endpoints,
+            "slo_passed": not failures,
+            "slo_failures": failures,
+        }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    meta = report["meta"]
+    print(f"\n{meta['users']} users, {meta['duration_seconds']}s against {meta['target']} ({meta['database']})")
+    print(f"{'endpoint':<16}{'reqs':>7}{'rps':>8}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}   SLO p95/p99")
+    for name, s in report["endpoints"].items():
+        slo = s["slo"]
+        print(f"{name:<16}{s['requests']:>7}{s['throughput_rps']:>8}{s['error_rate'] * 100:>6.1f}%"
+              f"{s['p50_ms']!s:>9}{s['p95_ms']!s:>9}{s['p99_ms']!s:>9}   {slo.get('p95_ms', '-')}/{slo.get('p99_ms', '-')}")
+    print(f"{'total':<16}{report['total']['requests']:>7}{report['total']['throughput_rps']:>8}")
+    if report["slo_passed"]:
+        print("\nSLO: PASS")
+    else:
+        print("\nSLO: FAIL")
+        for failure in report["slo_failures"]:
+            print(f"  - {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test with a weighted traffic mix and SLO check")
+    parser.add_argument("--config", help="JSON file overriding DEFAULT_CONFIG")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--duration", type=int, help="Seconds")
+    parser.add_argument("--ramp-up", type=int, help="Seconds")
+    parser.add_argument("--url", help="Running node, e.g. http://127.0.0.1:8000 (default: in-process app)")
+    parser.add_argument("--mongo-uri", help="Seed closets directly (in-process: use mongod instead of mongomock)")
+    parser.add_argument("--database", help="Database of the running node (with --url and --mongo-uri)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    config = DEFAULT_CONFIG
+    if args.config:
+        with open(args.config) as f:
+            config = merge_config(config, json.load(f))
+    for key, value in (("users", args.users), ("duration_seconds", args.duration), ("ramp_up_seconds", args.ramp_up)):
+        if value is not None:
+            config = {**config, key: value}
+
+    random.seed(args.seed)
+    report = asyncio.run(LoadTest(config, args.url, args.mongo_uri, args.database).run())
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    raise SystemExit(0 if report["slo_passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
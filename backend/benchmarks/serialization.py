@@ -0,0 +1,120 @@
+# backend/benchmarks/serialization.py
+"""
+Response encoding: the old path (safe_convert twice → FastAPI's
+jsonable_encoder → json.dumps) vs. NumpyJSONResponse (one orjson pass that
+encodes NumPy natively).
+
+    cd backend
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --repeat 500 --json
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+import numpy as np
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from json_utils import dumps
+
+
+def legacy_safe_convert(obj: Any) -> Any:
+    """safe_convert as it was: one Python call per array element."""
+    if isinstance(obj, np.ndarray):
+        return [legacy_safe_convert(x) for x in obj.tolist()]
+    if isinstance(obj, (np.float32, np.float64)):
+        return float(obj)
+    if isinstance(obj, (np.int32, np.int64)):
+        return int(obj)
+    if isinstance(obj, dict):
+        return {k: legacy_safe_convert(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [legacy_safe_convert(item) for item in obj]
+    return obj
+
+
+def legacy_encode(payload: Any) -> bytes:
+    converted = legacy_safe_convert(legacy_safe_convert(payload))
+    encoded = jsonable_encoder(converted, custom_encoder={ObjectId: str})
+    return json.dumps(encoded, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+# ========== PAYLOADS ==========
+def _item(rng: np.random.Generator, with_features: bool) -> Dict[str, Any]:
+    item = {
+        "_id": ObjectId(),
+        "image_url": "https://res.cloudinary.com/demo/image/upload/v1/wardrobe-items/" + "a" * 64 + ".jpg",
+        "thumbnails": {str(s): f"https://res.cloudinary.com/demo/thumbnails/{s}.webp" for s in (128, 256, 512)},
+        "category": "dress",
+        "color": "#a83232",
+        "colors_palette": [{"hex": "#a83232", "percentage": np.float32(rng.random())} for _ in range(5)],
+        "style": "traditional",
+        "material": "kitenge",
+        "seasonality": "all-season",
+        "confidence": np.float32(rng.random()),
+        "wear_count": np.int64(rng.integers(0, 50)),
+        "created_at": datetime.utcnow(),
+    }
+    if with_features:
+        item["features"] = rng.standard_normal(1280).astype(np.float32)
+    return item
+
+
+def make_payloads() -> Dict[str, Any]:
+    rng = np.random.default_rng(0)
+    return {
+        # Upload with classification + raw 1280-d embedding (the worst case the old path hit)
+        "upload_with_embedding": {"success": True, **_item(rng, with_features=True)},
+        "visual_search_top10": {
+            "success": True,
+            "similar_items": [
+                {**_item(rng, with_features=False), "similarity_score": np.float32(rng.random()), "rank": i + 1}
+                for i in range(10)
+            ],
+        },
+        "my_items_200": {"success": True, "items": [_item(rng, with_features=False) for _ in range(200)]},
+        "catalog_100_with_embeddings": {"items": [_item(rng, with_features=True) for _ in range(100)]},
+    }
+
+
+def time_it(func: Callable[[Any], bytes], payload: Any, repeat: int) -> float:
+    func(payload)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(payload)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization microbenchmark")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for name, payload in make_payloads().items():
+        legacy_us = time_it(legacy_encode, payload, args.repeat)
+        orjson_us = time_it(dumps, payload, args.repeat)
+        # Same document either way (floats may differ in the last digit: float32 vs float64 repr)
+        assert json.loads(dumps(payload)).keys() == json.loads(legacy_encode(payload)).keys()
+        results.append({
+            "payload": name,
+            "bytes": len(dumps(payload)),
+            "legacy_us": round(legacy_us, 1),
+            "orjson_us": round(orjson_us, 1),
+            "speedup": round(legacy_us / orjson_us, 1),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'payload':<30}{'bytes':>10}{'legacy µs':>12}{'orjson µs':>12}{'speedup':>9}")
+    for r in results:
+        print(f"{r['payload']:<30}{r['bytes']:>10}{r['legacy_us']:>12}{r['orjson_us']:>12}{r['speedup']:>8}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# backend/benchmarks/suite.py
+"""
+End-to-end benchmarks of the API hot paths, in process and offline:
+mongomock-motor (or a local mongod), LocalStorage instead of Cloudinary,
+inline enrichment (ASYNC_ENRICHMENT=0) so upload measures the whole pipeline.
+
+    cd backend
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.suite                                   # → benchmarks/results/<commit>.json
+    python -m benchmarks.suite --cases visual_search --sizes 10 1000 --repeat 50
+    python -m benchmarks.suite --mongo-uri mongodb://localhost:27017
+    python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json
+
+Every upload / visual-search uses a distinct synthetic JPEG, so the
+inference cache never short-circuits the model.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from benchmarks.fixtures import (
+    BENCH_PASSWORD, auth_headers, configure_env, git_commit, make_app, make_client, make_db, seed_user, synthetic_jpeg
+)
+
+CASES = ["upload", "visual_search", "analytics", "trends", "mark_worn", "login"]
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+ANALYTICS_CLOSET_SIZE = 200
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def summarize(samples_ms: List[float], errors: int) -> Dict[str, Any]:
+    ordered = sorted(samples_ms)
+    pct = lambda p: round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 3) if ordered else None
+    return {
+        "n": len(samples_ms),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(samples_ms), 3) if samples_ms else None,
+        "stdev_ms": round(statistics.stdev(samples_ms), 3) if len(samples_ms) > 1 else 0.0,
+        "min_ms": pct(0.0),
+        "p50_ms": pct(0.5),
+        "p95_ms": pct(0.95),
+        "max_ms": round(ordered[-1], 3) if ordered else None,
+        "ops_per_sec": round(1000 * len(samples_ms) / sum(samples_ms), 2) if samples_ms else 0.0,
+    }
+
+
+async def measure(call: Callable[[int], Awaitable[Any]], repeat: int, warmup: int) -> Dict[str, Any]:
+    """Sequential requests; a response with status ≥ 400 counts as an error and isn't timed."""
+    for i in range(warmup):
+        await call(-1 - i)
+    samples, errors, last_error = [], 0, None
+    for i in range(repeat):
+        start = time.perf_counter()
+        response = await call(i)
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code >= 400:
+            errors += 1
+            last_error = f"{response.status_code}: {response.text[:200]}"
+        else:
+            samples.append(elapsed)
+    result = summarize(samples, errors)
+    if last_error:
+        result["last_error"] = last_error
+    return result
+
+
+class Suite:
+    def __init__(self, args):
+        self.args = args
+        self.storage_dir = configure_env()
+        self.db = make_db(args.mongo_uri)
+        self.app = make_app(self.db, self.storage_dir)
+        self.client = None
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, name: str, result: Dict[str, Any]) -> None:
+        self.results[name] = result
+        print(f"{name:<28} p50 {result['p50_ms']!s:>9} ms   p95 {result['p95_ms']!s:>9} ms   errors {result['errors']}")
+
+    async def bench_upload(self):
+        user_id = await seed_user(self.db, "upload@bench.local", 0)
+        headers = auth_headers(user_id)
+
+        async def call(i):
+            files = {"file": (f"upload-{i}.jpg", synthetic_jpeg(10_000 + i), "image/jpeg")}
+            return await self.client.post("/api/wardrobe/upload", files=files, headers=headers)
+        self.record("upload", await measure(call, self.args.repeat, self.args.warmup))
+
+    async def bench_visual_search(self):
+        for size in self.args.sizes:
+            user_id = await seed_user(self.db, f"search-{size}@bench.local", size, seed=size)
+            headers = auth_headers(user_id)
+
+            async def call(i, headers=headers, size=size):
+                files = {"file": (f"query-{i}.jpg", synthetic_jpeg(20_000 + size * 10 + i), "image/jpeg")}
+                return await self.client.post("/api/wardrobe/visual-search", files=files, headers=headers)
+            self.record(f"visual_search[{size}]", await measure(call, self.args.repeat, self.args.warmup))
+
+    async def _closet_user(self, name: str) -> Tuple[str, Dict[str, str]]:
+        user_id = await seed_user(self.db, f"{name}@bench.local", ANALYTICS_CLOSET_SIZE, seed=7)
+        return user_id, auth_headers(user_id)
+
+    async def bench_analytics(self):
+        _, headers = await self._closet_user("analytics")
+        call = lambda i: self.client.get("/api/wardrobe/analytics", headers=headers)
+        self.record("analytics", await measure(call, self.args.repeat, self.args.warmup))
+
+    async def bench_trends(self):
+        _, headers = await self._closet_user("trends")
+        call = lambda i: self.client.get("/api/wardrobe/trends", headers=headers)
+        self.record("trends", await measure(call, self.args.repeat, self.args.warmup))
+
+    async def bench_mark_worn(self):
+        user_id, headers = await self._closet_user("mark-worn")
+        items = await self.db.wardrobe_items.find({"user_id": user_id}, {"_id": 1}).to_list(None)
+        item_ids = [str(item["_id"]) for item in items]
+
+        async def call(i):
+            return await self.client.post(f"/api/wardrobe/{item_ids[i % len(item_ids)]}/mark-worn", headers=headers)
+        self.record("mark_worn", await measure(call, self.args.repeat, self.args.warmup))
+
+    async def bench_login(self):
+        await seed_user(self.db, "login@bench.local", 0)
+        login_path = self.app.url_path_for("login")
+
+        async def call(i):
+            return await self.client.post(
+                login_path, data={"username": "login@bench.local", "password": BENCH_PASSWORD}
+            )
+        self.record("login", await measure(call, self.args.repeat, self.args.warmup))
+
+    async def run(self) -> Dict[str, Any]:
+        if self.args.mongo_uri:
+            await self.db.client.drop_database(self.db.name)
+        async with make_client(self.app) as client:
+            self.client = client
+            for case in self.args.cases:
+                try:
+                    await getattr(self, f"bench_{case}")()
+                except Exception as e:
+                    self.results[case] = {"error": f"{type(e).__name__}: {e}"}
+                    print(f"{case:<28} FAILED: {e}")
+
+        from faiss_utils import USER_INDEX_TYPE     # after configure_env(), like the app itself
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "database": "mongod" if self.args.mongo_uri else "mongomock",
+                "repeat": self.args.repeat,
+                "warmup": self.args.warmup,
+                "codec": os.getenv("EMBEDDING_CODEC_ID", "raw"),
+                "user_index_type": USER_INDEX_TYPE,
+            },
+            "results": self.results,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend hot-path benchmark suite")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Closet sizes for visual_search")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--mongo-uri", help="Local mongod instead of mongomock-motor (uses a separate bench database)")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    report = asyncio.run(Suite(args).run())
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,13 @@
 # backend/cloudinary_utils.py
-import cloudinary
-import cloudinary.uploader
-from dotenv import load_dotenv
-import os
+from typing import Optional
 
-load_dotenv()
+from services.inference_cache import content_hash
+from storage_utils import get_storage, image_key
 
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET")
-)
-
-async def upload_to_cloudinary(image_bytes: bytes) -> str:
-    response = cloudinary.uploader.upload(image_bytes, folder="wardrobe-items")
-    return response["secure_url"]
\ No newline at end of file
+async def upload_to_cloudinary(image_bytes: bytes, key: Optional[str] = None) -> str:
+    """
+    Kept for existing callers – uploads go through the configured storage
+    backend (pooled async Cloudinary client, or local files when STORAGE_BACKEND=local).
+    """
+    stored = await get_storage().put(image_bytes, key or image_key(content_hash(image_bytes)))
+    return stored.url
\ No newline at end of file
@@ -0,0 +1,207 @@
+# backend/embedding_codec.py
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger("FashionAI")
+
+# ========== CONFIGURATION ==========
+CODEC_DIR = os.getenv("EMBEDDING_CODEC_DIR", "embedding_codecs")
+# Codec applied to new uploads + search queries. "raw" = full 1280-d MobileNetV2 vectors.
+ACTIVE_CODEC_ID = os.getenv("EMBEDDING_CODEC_ID", "raw")
+RAW_CODEC_ID = "raw"
+RAW_DIMENSION = 1280
+
+
+class EmbeddingCodec:
+    """
+    Maps raw embeddings to what is stored in MongoDB (`features`) and back to
+    the float vectors FAISS searches over.
+
+    raw → stored as-is (1280 floats)
+    pca → stored as `out_dim` floats, searched in the reduced space
+    pq  → stored as `m` uint8 codes, decoded to approximate 1280-d vectors for search
+    """
+    kind = RAW_CODEC_ID
+
+    def __init__(self, codec_id: str = RAW_CODEC_ID, input_dim: int = RAW_DIMENSION):
+        self.codec_id = codec_id
+        self.input_dim = input_dim
+
+    @property
+    def search_dim(self) -> int:
+        return self.input_dim
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Raw embeddings → stored representation (rows)."""
+        return np.array(vectors, dtype=np.float32, ndmin=2)
+
+    def to_search_space(self, stored: np.ndarray) -> np.ndarray:
+        """Stored representation → float32 vectors for FAISS."""
+        return np.array(stored, dtype=np.float32, ndmin=2)
+
+    def query(self, raw: np.ndarray) -> np.ndarray:
+        """Raw query embedding → vector comparable with to_search_space() output."""
+        return self.to_search_space(self.encode(raw))
+
+    def index_vector(self, raw: np.ndarray) -> np.ndarray:
+        """Raw embedding → the vector an index holds for it (same as a stored+reloaded item)."""
+        return self.to_search_space(self.encode(raw))
+
+    def encode_one(self, raw: np.ndarray) -> List:
+        return self.encode(raw)[0].tolist()
+
+    def meta(self) -> Dict[str, Any]:
+        return {"codec_id": self.codec_id, "kind": self.kind, "input_dim": self.input_dim}
+
+    def save(self, directory: str = CODEC_DIR) -> str:
+        path = os.path.join(directory, self.codec_id)
+        os.makedirs(path, exist_ok=True)
+        self._save_artifacts(path)
+        with open(os.path.join(path, "codec.json"), "w") as f:
+            json.dump(self.meta(), f, indent=2)
+        return path
+
+    def _save_artifacts(self, path: str) -> None:
+        pass
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    vecs = np.array(vectors, dtype=np.float32, ndmin=2, copy=True)
+    faiss.normalize_L2(vecs)
+    return vecs
+
+
+class PCACodec(EmbeddingCodec):
+    kind = "pca"
+
+    def __init__(self, codec_id: str, pca: faiss.PCAMatrix):
+        super().__init__(codec_id, pca.d_in)
+        self.pca = pca
+
+    @property
+    def search_dim(self) -> int:
+        return self.pca.d_out
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return self.pca.apply_py(_normalized(vectors))
+
+    def meta(self) -> Dict[str, Any]:
+        return {**super().meta(), "output_dim": self.pca.d_out}
+
+    def _save_artifacts(self, path: str) -> None:
+        faiss.write_VectorTransform(self.pca, os.path.join(path, "pca.bin"))
+
+
+class PQCodec(EmbeddingCodec):
+    kind = "pq"
+
+    def __init__(self, codec_id: str, pq: faiss.ProductQuantizer):
+        super().__init__(codec_id, pq.d)
+        self.pq = pq
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return self.pq.compute_codes(_normalized(vectors))
+
+    def to_search_space(self, stored: np.ndarray) -> np.ndarray:
+        return self.pq.decode(np.array(stored, dtype=np.uint8, ndmin=2))
+
+    def query(self, raw: np.ndarray) -> np.ndarray:
+        # Asymmetric: the query keeps full precision
+        return np.array(raw, dtype=np.float32, ndmin=2)
+
+    def meta(self) -> Dict[str, Any]:
+        return {**super().meta(), "m": self.pq.M, "nbits": self.pq.nbits}
+
+    def _save_artifacts(self, path: str) -> None:
+        faiss.write_ProductQuantizer(self.pq, os.path.join(path, "pq.bin"))
+
+
+def _make_codec_id(kind: str, size: int, sample: np.ndarray) -> str:
+    digest = hashlib.sha1(sample[:1000].tobytes()).hexdigest()[:8]
+    return f"{kind}{size}-{datetime.utcnow().strftime('%Y%m%d')}-{digest}"
+
+
+def train_codec(kind: str, sample: np.ndarray, size: int) -> EmbeddingCodec:
+    """
+    Fit a codec offline on a sample of raw embeddings.
+    kind="pca": size = output dimension (e.g. 256)
+    kind="pq":  size = number of sub-quantizers / bytes per vector (e.g. 64)
+    """
+    sample = _normalized(sample)
+    codec_id = _make_codec_id(kind, size, sample)
+    if kind == "pca":
+        pca = faiss.PCAMatrix(sample.shape[1], size)
+        pca.train(sample)
+        return PCACodec(codec_id, pca)
+    if kind == "pq":
+        pq = faiss.ProductQuantizer(sample.shape[1], size, 8)
+        pq.train(sample)
+        return PQCodec(codec_id, pq)
+    raise ValueError(f"Unknown codec kind '{kind}', expected 'pca' or 'pq'")
+
+
+@lru_cache(maxsize=8)
+def load_codec(codec_id: str, directory: str = CODEC_DIR) -> EmbeddingCodec:
+    if codec_id == RAW_CODEC_ID:
+        return EmbeddingCodec()
+    path = os.path.join(directory, codec_id)
+    with open(os.path.join(path, "codec.json")) as f:
+        meta = json.load(f)
+    if meta["kind"] == "pca":
+        return PCACodec(codec_id, faiss.read_VectorTransform(os.path.join(path, "pca.bin")))
+    if meta["kind"] == "pq":
+        return PQCodec(codec_id, faiss.read_ProductQuantizer(os.path.join(path, "pq.bin")))
+    raise ValueError(f"Unknown codec kind '{meta['kind']}' for {codec_id}")
+
+
+def get_active_codec() -> EmbeddingCodec:
+    try:
+        return load_codec(ACTIVE_CODEC_ID)
+    except FileNotFoundError:
+        logger.error(f"Embedding codec '{ACTIVE_CODEC_ID}' not found in {CODEC_DIR}, using raw vectors")
+        return load_codec(RAW_CODEC_ID)
+
+
+def codec_filter(codec_id: str) -> Dict[str, Any]:
+    """Mongo filter for items stored with this codec (old items have no codec_id = raw)."""
+    if codec_id == RAW_CODEC_ID:
+        return {"codec_id": {"$in": [None, RAW_CODEC_ID]}}
+    return {"codec_id": codec_id}
+
+
+def evaluate_recall(codec: EmbeddingCodec, raw: np.ndarray, n_queries: int = 200, k: int = 10) -> Dict[str, float]:
+    """
+    recall@k of the codec vs. exact search on raw vectors, using part of the
+    sample as queries against the rest.
+    """
+    vecs = _normalized(raw)
+    queries, base = vecs[:n_queries], vecs[n_queries:]
+
+    exact = faiss.IndexFlatIP(vecs.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+
+    coded = np.ascontiguousarray(codec.to_search_space(codec.encode(base)))
+    coded_queries = np.ascontiguousarray(codec.query(queries))
+    faiss.normalize_L2(coded)
+    faiss.normalize_L2(coded_queries)
+    approx = faiss.IndexFlatIP(coded.shape[1])
+    approx.add(coded)
+    _, found = approx.search(coded_queries, k)
+
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    stored_bytes = codec.encode(base[:1]).nbytes
+    return {
+        f"recall_at_{k}": round(hits / (len(queries) * k), 4),
+        "bytes_per_vector": int(stored_bytes),
+        "compression": round(vecs.shape[1] * 4 / stored_bytes, 1),
+        "search_dim": int(coded.shape[1]),
+    }
@@ -0,0 +1,405 @@
+# backend/faiss_utils.py
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+
+# ========== INDEX BACKENDS ==========
+# flat  → exact brute force (IndexFlatIP), best for single closets
+# ivfpq → inverted file + product quantization, needs training, for millions of vectors;
+#          the only type whose snapshots workers share through mmap
+# hnsw  → graph index, no training, fast + high recall but more RAM
+INDEX_TYPES = ("flat", "ivfpq", "hnsw")
+# Closet indexes are built per search from ≤1000 vectors: brute force beats building
+# an HNSW graph or training IVF centroids on every request, so they're always flat
+USER_INDEX_TYPE = "flat"
+CATALOG_INDEX_TYPE = os.getenv("FAISS_CATALOG_INDEX_TYPE", "hnsw")
+
+IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "1024"))
+IVF_PQ_M = int(os.getenv("FAISS_IVF_PQ_M", "64"))       # sub-quantizers, must divide the dimension
+HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+DEFAULT_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+DEFAULT_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+HNSW_EF_CONSTRUCTION = 80
+# A snapshot-loaded index is rebuilt once its delta layer + tombstones exceed this share of it
+COMPACT_RATIO = float(os.getenv("FAISS_COMPACT_RATIO", "0.2"))
+
+# IVF training wants roughly 39 points per centroid
+MIN_TRAIN_POINTS_PER_LIST = 39
+
+
+def make_index(
+    index_type: str,
+    dimension: int,
+    nlist: int = IVF_NLIST,
+    pq_m: int = IVF_PQ_M,
+    hnsw_m: int = HNSW_M
+) -> faiss.Index:
+    """
+    Create an (untrained) inner-product index of the given backend type.
+    Vectors are expected to be L2-normalized so inner product = cosine.
+    """
+    index_type = index_type.lower()
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dimension)
+    if index_type == "ivfpq":
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+        index.nprobe = DEFAULT_NPROBE
+        return index
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = DEFAULT_EF_SEARCH
+        return index
+    raise ValueError(f"Unknown FAISS index type '{index_type}', expected one of {INDEX_TYPES}")
+
+
+def index_type_for_size(index_type: str, n_vectors: int, nlist: int = IVF_NLIST) -> str:
+    """IVF can't be trained on a handful of vectors – use exact search for small sets."""
+    if index_type == "ivfpq" and n_vectors < nlist * MIN_TRAIN_POINTS_PER_LIST:
+        return "flat"
+    return index_type
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Float32, 2-D, L2-normalized copy (the caller's array is left untouched)."""
+    vecs = np.array(vectors, dtype=np.float32, copy=True, ndmin=2)
+    faiss.normalize_L2(vecs)
+    return vecs
+
+
+def build_search_params(
+    index: faiss.Index,
+    selector: Optional[faiss.IDSelector] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None
+) -> Optional[faiss.SearchParameters]:
+    """
+    Per-request search knobs: nprobe for IVF, efSearch for HNSW.
+    Returns None when nothing needs overriding (index defaults are used).
+    """
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexIVF) and nprobe is not None:
+        params = faiss.SearchParametersIVF()
+        params.nprobe = nprobe
+    elif isinstance(inner, faiss.IndexHNSW) and ef_search is not None:
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+class FaissIdAllocator:
+    """
+    Hands out unique int64 ids for one SharedFaissIndex.
+
+    Ids only have to be unique within an index, and every process owns its
+    indexes (snapshots carry their next_id along), so a thread-safe
+    in-process counter is enough – nothing is coordinated across workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next = 0
+
+    @property
+    def next_id(self) -> int:
+        return self._next
+
+    def advance_to(self, next_id: int) -> None:
+        """Never hand out ids below next_id (e.g. ones already used by a snapshot)."""
+        with self._lock:
+            if next_id > self._next:
+                self._next = next_id
+
+    def allocate_local(self) -> int:
+        with self._lock:
+            faiss_id = self._next
+            self._next += 1
+            return faiss_id
+
+
+class SharedFaissIndex:
+    """
+    Cross-user FAISS index (the catalog index, services/catalog_search) with a
+    reverse map (faiss id → user/item).
+
+    All mutations go through one lock. Searches can be restricted to a single
+    user with an IDSelector, so FAISS only scores that user's vectors instead
+    of searching everything and filtering afterwards.
+
+    The backend is configurable (flat / ivfpq / hnsw). IVF has to be trained
+    before vectors are added; HNSW can't remove vectors, so removed ids are
+    tombstoned and excluded at search time until the next rebuild.
+
+    An index loaded from a snapshot keeps the snapshot as a read-only
+    `base` layer; later adds go to a small in-memory flat `index` layer and
+    removals of base vectors become tombstones. Searches query both layers
+    and merge. Both keep growing until needs_compaction() says it's time
+    to rebuild (see services/index_snapshots.snapshot_loop).
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        allocator: Optional[FaissIdAllocator] = None,
+        index_type: str = "flat",
+        **index_kwargs
+    ):
+        self.dimension = dimension
+        self.index_type = index_type
+        self.allocator = allocator or FaissIdAllocator()
+        self.index = faiss.IndexIDMap2(make_index(index_type, dimension, **index_kwargs))
+        self.base: Optional[faiss.Index] = None
+        self._base_ids: Set[int] = set()
+        self._delta_removable = index_type != "hnsw"
+        self._tombstones: Set[int] = set()
+        self._lock = threading.RLock()
+        # faiss_id → (user_id, item_id)
+        self.id_to_item: Dict[int, Tuple[str, str]] = {}
+        # (user_id, item_id) → faiss_id
+        self.item_to_id: Dict[Tuple[str, str], int] = {}
+        # user_id → set of faiss ids
+        self.user_ids: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.id_to_item)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.index.is_trained
+
+    @staticmethod
+    def _prepare(vector: np.ndarray) -> np.ndarray:
+        return normalize(vector)
+
+    def train(self, sample: np.ndarray) -> None:
+        """Offline training (IVF centroids + PQ codebooks) on a sample of vectors."""
+        vecs = normalize(sample)
+        with self._lock:
+            if not self.index.is_trained:
+                self.index.train(vecs)
+
+    def _insert(self, faiss_id: int, user_id: str, item_id: str, vec: np.ndarray) -> None:
+        self.index.add_with_ids(vec, np.array([faiss_id], dtype=np.int64))
+        self.id_to_item[faiss_id] = (user_id, item_id)
+        self.item_to_id[(user_id, item_id)] = faiss_id
+        self.user_ids.setdefault(user_id, set()).add(faiss_id)
+
+    def _delete(self, faiss_id: int) -> None:
+        if faiss_id in self._base_ids or not self._delta_removable:
+            self._tombstones.add(faiss_id)
+        else:
+            self.index.remove_ids(np.array([faiss_id], dtype=np.int64))
+        user_id, item_id = self.id_to_item.pop(faiss_id)
+        self.item_to_id.pop((user_id, item_id), None)
+        ids = self.user_ids.get(user_id)
+        if ids is not None:
+            ids.discard(faiss_id)
+            if not ids:
+                del self.user_ids[user_id]
+
+    def add(self, user_id: str, item_id: str, vector: np.ndarray, faiss_id: Optional[int] = None) -> int:
+        """
+        Add (or replace) an item's vector, returns its faiss id.
+        A replaced vector keeps its id unless the old one could only be
+        tombstoned (snapshot base layer, HNSW) – then the item gets a new id.
+        """
+        vec = self._prepare(vector)
+        with self._lock:
+            existing = self.item_to_id.get((user_id, item_id))
+            if existing is not None:
+                self._delete(existing)
+                faiss_id = existing
+            elif faiss_id is None:
+                faiss_id = self.allocator.allocate_local()
+            if faiss_id in self._tombstones:
+                # The old vector is still stored (HNSW / snapshot base) – re-adding under
+                # the same id would be excluded by the tombstone, so take a fresh id
+                faiss_id = self.allocator.allocate_local()
+            self._insert(faiss_id, user_id, item_id, vec)
+        return faiss_id
+
+    def add_many(
+        self,
+        entries: Iterable[Tuple[str, str]],
+        vectors: np.ndarray
+    ) -> List[int]:
+        """Bulk add (user_id, item_id) pairs – one FAISS call instead of one per item."""
+        entries = list(entries)
+        vecs = normalize(vectors)
+        with self._lock:
+            for user_id, item_id in entries:
+                if (user_id, item_id) in self.item_to_id:
+                    self._delete(self.item_to_id[(user_id, item_id)])
+            ids = [self.allocator.allocate_local() for _ in entries]
+            self.index.add_with_ids(vecs, np.array(ids, dtype=np.int64))
+            for faiss_id, (user_id, item_id) in zip(ids, entries):
+                self.id_to_item[faiss_id] = (user_id, item_id)
+                self.item_to_id[(user_id, item_id)] = faiss_id
+                self.user_ids.setdefault(user_id, set()).add(faiss_id)
+        return ids
+
+    def update(self, user_id: str, item_id: str, vector: np.ndarray) -> int:
+        """Replace an item's vector; the returned id may differ from the old one (see add)."""
+        with self._lock:
+            if (user_id, item_id) not in self.item_to_id:
+                raise KeyError(f"Item {item_id} is not indexed for user {user_id}")
+            return self.add(user_id, item_id, vector)
+
+    def remove(self, user_id: str, item_id: str) -> bool:
+        with self._lock:
+            faiss_id = self.item_to_id.get((user_id, item_id))
+            if faiss_id is None:
+                return False
+            self._delete(faiss_id)
+            return True
+
+    def remove_user(self, user_id: str) -> int:
+        with self._lock:
+            ids = list(self.user_ids.get(user_id, ()))
+            for faiss_id in ids:
+                self._delete(faiss_id)
+            return len(ids)
+
+    def needs_compaction(self, ratio: float = COMPACT_RATIO) -> bool:
+        """True once the delta layer + tombstones are more than `ratio` of the stored vectors."""
+        with self._lock:
+            stored = self.index.ntotal + (self.base.ntotal if self.base is not None else 0)
+            overhead = len(self._tombstones) + (self.index.ntotal if self.base is not None else 0)
+            return stored > 0 and overhead > ratio * stored
+
+    def lookup(self, faiss_id: int) -> Optional[Tuple[str, str]]:
+        return self.id_to_item.get(int(faiss_id))
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int = 8,
+        user_id: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Cosine search over the shared index.
+        If user_id is given only that user's vectors are scored.
+        nprobe (IVF) / ef_search (HNSW) trade recall for speed per request.
+        """
+        vec = self._prepare(query)
+        with self._lock:
+            if not self.id_to_item:
+                return []
+            selector = None
+            if user_id is not None:
+                ids = self.user_ids.get(user_id)
+                if not ids:
+                    return []
+                selector = faiss.IDSelectorBatch(np.fromiter(ids, dtype=np.int64, count=len(ids)))
+                top_k = min(top_k, len(ids))
+            elif self._tombstones:
+                dead = np.fromiter(self._tombstones, dtype=np.int64, count=len(self._tombstones))
+                dead_sel = faiss.IDSelectorBatch(dead)
+                selector = faiss.IDSelectorNot(dead_sel)
+            hits = []
+            for layer in (self.base, self.index):
+                if layer is None or layer.ntotal == 0:
+                    continue
+                params = build_search_params(layer, selector, nprobe=nprobe, ef_search=ef_search)
+                distances, labels = layer.search(vec, top_k, params=params)
+                hits.extend(zip(distances[0], labels[0]))
+            if self.base is not None:
+                hits.sort(key=lambda hit: hit[0], reverse=True)
+                hits = hits[:top_k]
+
+            results = []
+            for dist, faiss_id in hits:
+                if faiss_id == -1:
+                    continue
+                owner = self.id_to_item.get(int(faiss_id))
+                if owner is None:
+                    continue
+                results.append({
+                    "faiss_id": int(faiss_id),
+                    "user_id": owner[0],
+                    "item_id": owner[1],
+                    "similarity_score": round(float(dist), 4)
+                })
+        return results
+
+    # ========== SNAPSHOTS ==========
+    def save(self, directory: str) -> None:
+        """
+        Write the index layers + id maps into `directory`.
+        The mutable layer is serialized under the lock, files are written outside it.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            delta_bytes = faiss.serialize_index(self.index) if self.index.ntotal else None
+            meta = {
+                "dimension": self.dimension,
+                "index_type": self.index_type,
+                "entries": [[faiss_id, user_id, item_id] for faiss_id, (user_id, item_id) in self.id_to_item.items()],
+                "base_ids": sorted(self._base_ids) if self.base is not None else None,
+                "tombstones": sorted(self._tombstones),
+                "next_id": self.allocator.next_id,
+            }
+        if self.base is not None:
+            # Base layer is read-only, no lock needed
+            faiss.write_index(self.base, os.path.join(directory, "base.index"))
+            if delta_bytes is not None:
+                faiss.write_index(faiss.deserialize_index(delta_bytes), os.path.join(directory, "delta.index"))
+        else:
+            faiss.write_index(
+                faiss.deserialize_index(delta_bytes) if delta_bytes is not None else self.index,
+                os.path.join(directory, "base.index")
+            )
+        with open(os.path.join(directory, "ids.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(
+        cls,
+        directory: str,
+        mmap: bool = True,
+        allocator: Optional[FaissIdAllocator] = None
+    ) -> "SharedFaissIndex":
+        """
+        Load a snapshot written by save(). With mmap=True the base layer is
+        opened with IO_FLAG_MMAP, which FAISS only honours for IVF inverted
+        lists: an ivfpq base shares its pages between workers, flat and hnsw
+        bases (hnsw is the catalog default) are read into each process's heap.
+        """
+        with open(os.path.join(directory, "ids.json")) as f:
+            meta = json.load(f)
+
+        shared = cls(meta["dimension"], allocator=allocator, index_type="flat")
+        shared.index_type = meta["index_type"]
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        shared.base = faiss.read_index(os.path.join(directory, "base.index"), flags)
+
+        delta_path = os.path.join(directory, "delta.index")
+        if os.path.exists(delta_path):
+            shared.index = faiss.read_index(delta_path)
+
+        for faiss_id, user_id, item_id in meta["entries"]:
+            shared.id_to_item[faiss_id] = (user_id, item_id)
+            shared.item_to_id[(user_id, item_id)] = faiss_id
+            shared.user_ids.setdefault(user_id, set()).add(faiss_id)
+        if meta["base_ids"] is not None:
+            shared._base_ids = set(meta["base_ids"])
+        else:
+            shared._base_ids = set(shared.id_to_item)
+        shared._tombstones = set(meta["tombstones"])
+
+        used = max([*shared.id_to_item, *shared._tombstones], default=-1)
+        shared.allocator.advance_to(max(meta["next_id"], used + 1))
+        return shared
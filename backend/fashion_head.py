@@ -0,0 +1,266 @@
+# backend/fashion_head.py
+"""
+Fashion category head: multinomial logistic regression on the 1280-d
+pooled embedding, trained on our own labelled photos.
+
+It replaces ImageNet decode_predictions + substring matching against
+FASHION_CATEGORIES. The embedding already comes out of the same forward
+pass as the ImageNet probabilities, so classifying is one small matmul
+instead of a top-10 label lookup. A head belongs to one model version
+(its embedding space) and lives next to the models:
+
+    models/heads/<version>.npz     weights, standardization, class names
+    models/heads/<version>.json    training / evaluation report
+
+    cd backend
+    python -m jobs.fashion_head train /data/wardrobe-labels
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from model_version import MODEL_DIR
+
+logger = logging.getLogger(__name__)
+
+# ========== CONFIGURATION ==========
+FASHION_HEAD_DIR = os.getenv("FASHION_HEAD_DIR", os.path.join(MODEL_DIR, "heads"))
+# Below this probability an item is "other" rather than a wrong guess
+FASHION_HEAD_MIN_CONFIDENCE = float(os.getenv("FASHION_HEAD_MIN_CONFIDENCE", "0.35"))
+
+
+def head_path(version: str) -> str:
+    return os.path.join(FASHION_HEAD_DIR, f"{version}.npz")
+
+
+def report_path(version: str) -> str:
+    return os.path.join(FASHION_HEAD_DIR, f"{version}.json")
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def _l2_normalize(x: np.ndarray) -> np.ndarray:
+    # Same geometry as search (cosine) – brightness/contrast change the norm more than the direction
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+
+# ========== HEAD ==========
+class FashionHead:
+    """softmax(((normalize(embedding) - mean) / scale) @ weights + bias) over our categories."""
+
+    def __init__(
+        self,
+        classes: Sequence[str],
+        weights: np.ndarray,
+        bias: np.ndarray,
+        mean: np.ndarray,
+        scale: np.ndarray,
+        min_confidence: float = FASHION_HEAD_MIN_CONFIDENCE
+    ):
+        self.classes = list(classes)
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.mean = mean.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+        self.min_confidence = min_confidence
+        self.head_id = hashlib.sha1(self.weights.tobytes() + self.bias.tobytes()).hexdigest()[:12]
+
+    @property
+    def dim(self) -> int:
+        return self.weights.shape[0]
+
+    def _standardize(self, embeddings: np.ndarray) -> np.ndarray:
+        return (_l2_normalize(np.asarray(embeddings, dtype=np.float32)) - self.mean) / self.scale
+
+    def predict_proba(self, embeddings: np.ndarray) -> np.ndarray:
+        """One row (or a batch) of embeddings → class probabilities."""
+        return _softmax(self._standardize(embeddings) @ self.weights + self.bias)
+
+    def categorize(self, embedding: np.ndarray) -> Tuple[str, str, float]:
+        """Same shape as ai_utils.categorize: (category, subcategory, confidence)."""
+        probs = self.predict_proba(embedding)
+        best = int(np.argmax(probs))
+        conf = float(probs[best])
+        if conf < self.min_confidence:
+            return "other", "", conf
+        return self.classes[best], self.classes[best], conf
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, classes=np.array(self.classes), weights=self.weights, bias=self.bias,
+                 mean=self.mean, scale=self.scale)
+        os.replace(tmp, path)  # a serving process never sees a half-written file
+
+    @classmethod
+    def load(cls, path: str) -> "FashionHead":
+        with np.load(path) as data:
+            return cls([str(c) for c in data["classes"]], data["weights"], data["bias"], data["mean"], data["scale"])
+
+
+def load_head(version: str) -> Optional[FashionHead]:
+    """The head trained for this model version, or None (→ ImageNet label matching)."""
+    path = head_path(version)
+    if not os.path.exists(path):
+        return None
+    try:
+        return FashionHead.load(path)
+    except Exception as e:
+        logger.warning(f"Could not load fashion head {path}: {e}")
+        return None
+
+
+def head_summary(version: str) -> Optional[Dict[str, Any]]:
+    """What the model registry shows for a version's head (from its report)."""
+    try:
+        with open(report_path(version)) as f:
+            report = json.load(f)
+    except FileNotFoundError:
+        return None
+    head = report.get("head", {})
+    return {
+        "head_id": report.get("head_id"),
+        "trained_at": report.get("trained_at"),
+        "classes": head.get("classes"),
+        "val_accuracy": head.get("accuracy"),
+        "baseline_accuracy": report.get("baseline", {}).get("accuracy"),
+    }
+
+
+def save_head(head: FashionHead, version: str, report: Dict[str, Any]) -> str:
+    path = head_path(version)
+    head.save(path)
+    with open(report_path(version), "w") as f:
+        json.dump({**report, "head_id": head.head_id, "path": path}, f, indent=2, default=str)
+    return path
+
+
+# ========== TRAINING ==========
+def train_head(
+    embeddings: np.ndarray,
+    labels: Sequence[int],
+    classes: Sequence[str],
+    l2: float = 1e-3,
+    epochs: int = 100,
+    learning_rate: float = 0.01,
+    batch_size: int = 256,
+    seed: int = 42
+) -> FashionHead:
+    """
+    Mini-batch Adam on the class-balanced cross-entropy. Inputs are
+    L2-normalized and standardized with the training mean/std, which the
+    head keeps so serving applies the same transform.
+    """
+    x = _l2_normalize(np.asarray(embeddings, dtype=np.float32))
+    mean = x.mean(axis=0)
+    scale = x.std(axis=0) + 1e-6
+    x = (x - mean) / scale
+    y = np.asarray(labels, dtype=np.int64)
+    n, d = x.shape
+    k = len(classes)
+    targets = np.eye(k, dtype=np.float32)[y]
+    # Balanced: a rare category (kanga) counts as much as a common one (shirt)
+    counts = np.bincount(y, minlength=k)
+    sample_weights = (n / (k * np.maximum(counts, 1)))[y].astype(np.float32)
+
+    rng = np.random.default_rng(seed)
+    weights = np.zeros((d, k), dtype=np.float32)
+    bias = np.zeros(k, dtype=np.float32)
+    params = [weights, bias]
+    m = [np.zeros_like(p) for p in params]
+    v = [np.zeros_like(p) for p in params]
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    step = 0
+    for epoch in range(epochs):
+        order = rng.permutation(n)
+        for start in range(0, n, batch_size):
+            idx = order[start:start + batch_size]
+            xb, sw = x[idx], sample_weights[idx]
+            probs = _softmax(xb @ weights + bias)
+            grad_logits = (probs - targets[idx]) * (sw / sw.sum())[:, None]
+            grads = [xb.T @ grad_logits + l2 * weights, grad_logits.sum(axis=0)]
+            step += 1
+            for p, g, m_i, v_i in zip(params, grads, m, v):
+                m_i *= beta1
+                m_i += (1 - beta1) * g
+                v_i *= beta2
+                v_i += (1 - beta2) * g * g
+                p -= learning_rate * (m_i / (1 - beta1 ** step)) / (np.sqrt(v_i / (1 - beta2 ** step)) + eps)
+    return FashionHead(classes, weights, bias, mean, scale)
+
+
+# ========== EVALUATION ==========
+def classification_report(
+    predicted: Sequence[str], expected: Sequence[str], classes: Sequence[str]
+) -> Dict[str, Any]:
+    """Accuracy, macro F1, per-class precision/recall and the most common confusions."""
+    predicted, expected = list(predicted), list(expected)
+    per_class = {}
+    f1s = []
+    for name in classes:
+        tp = sum(1 for p, e in zip(predicted, expected) if p == name and e == name)
+        n_pred = sum(1 for p in predicted if p == name)
+        n_true = sum(1 for e in expected if e == name)
+        precision = tp / n_pred if n_pred else 0.0
+        recall = tp / n_true if n_true else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        f1s.append(f1)
+        per_class[name] = {"precision": round(precision, 3), "recall": round(recall, 3),
+                           "f1": round(f1, 3), "support": n_true}
+    correct = sum(1 for p, e in zip(predicted, expected) if p == e)
+    confusions = Counter(f"{e}→{p}" for p, e in zip(predicted, expected) if p != e)
+    return {
+        "accuracy": round(correct / len(expected), 4) if expected else None,
+        "macro_f1": round(float(np.mean(f1s)), 4) if f1s else None,
+        "other_rate": round(predicted.count("other") / len(predicted), 3) if predicted else None,
+        "images": len(expected),
+        "per_class": per_class,
+        "top_confusions": dict(confusions.most_common(10)),
+    }
+
+
+def time_per_item_us(fn: Callable[[int], Any], n: int, repeat: int = 3) -> float:
+    """Mean microseconds of fn(i) over i in range(n), best of `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(n):
+            fn(i)
+        best = min(best, time.perf_counter() - start)
+    return round(best / max(n, 1) * 1e6, 1)
+
+
+def evaluate_head(
+    head: FashionHead,
+    embeddings: np.ndarray,
+    expected: Sequence[str],
+    baseline: Optional[Callable[[int], str]] = None
+) -> Dict[str, Any]:
+    """
+    Head vs. the ImageNet label-matching baseline on the same images.
+    `baseline(i)` gives the old classifier's category for image i.
+    """
+    predicted = [head.categorize(e)[0] for e in embeddings]
+    report: Dict[str, Any] = {
+        "head": {**classification_report(predicted, expected, head.classes),
+                 "classes": head.classes,
+                 "min_confidence": head.min_confidence,
+                 "us_per_item": time_per_item_us(lambda i: head.categorize(embeddings[i]), len(embeddings))},
+        "evaluated_at": datetime.utcnow(),
+    }
+    if baseline is not None:
+        baseline_predicted = [baseline(i) for i in range(len(expected))]
+        report["baseline"] = {**classification_report(baseline_predicted, expected, head.classes),
+                              "us_per_item": time_per_item_us(baseline, len(expected))}
+    return report
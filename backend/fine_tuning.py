@@ -0,0 +1,367 @@
+# backend/fine_tuning.py
+"""
+Streaming fine-tuning of MobileNetV2 on a folder-per-class fashion dataset.
+
+tf.data instead of ImageDataGenerator: files are decoded and resized in
+parallel once, cached to disk as uint8 224×224, then shuffled, augmented,
+batched and prefetched while the previous step trains. Training is staged
+(head only → top of the backbone → everything) with mixed precision where
+the hardware has it, and can be stopped and resumed at epoch granularity.
+
+    cd backend
+    python -m jobs.fine_tune /data/afrifashion1600 --epochs 10 --batch-size 32
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2, preprocess_input
+
+from model_version import MODEL_DIR, save_model_metadata
+
+logger = logging.getLogger(__name__)
+
+# ========== CONFIGURATION ==========
+IMAGE_SIZE = (224, 224)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif")
+VALIDATION_SPLIT = 0.2
+SHUFFLE_BUFFER = 2048
+FINE_TUNE_CACHE_DIR = os.getenv("FINE_TUNE_CACHE_DIR", os.path.join(MODEL_DIR, "tfdata_cache"))
+FINE_TUNE_CHECKPOINT_DIR = os.getenv("FINE_TUNE_CHECKPOINT_DIR", os.path.join(MODEL_DIR, "checkpoints"))
+INPUT_BENCHMARK_BATCHES = 30
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+@dataclass
+class Stage:
+    name: str
+    epochs: int
+    learning_rate: float
+    # Fraction of backbone layers kept frozen (1.0 = train the head only)
+    frozen_fraction: float
+
+
+def staged_schedule(epochs: int) -> List[Stage]:
+    """~30% head only, ~50% top 30% of the backbone, ~20% everything at a low rate."""
+    head = max(1, round(epochs * 0.3))
+    full = max(0, round(epochs * 0.2)) if epochs >= 3 else 0
+    top = max(0, epochs - head - full)
+    stages = [
+        Stage("head", head, 1e-3, 1.0),
+        Stage("top", top, 1e-4, 0.7),
+        Stage("full", full, 1e-5, 0.0),
+    ]
+    return [s for s in stages if s.epochs > 0]
+
+
+# ========== DATA PIPELINE ==========
+def list_images(directory: str, class_names: Optional[List[str]] = None) -> Tuple[List[str], List[int], List[str]]:
+    """dataset/<class>/<image> → (paths, label indices, class names sorted like flow_from_directory)"""
+    if class_names is None:
+        class_names = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    paths, labels = [], []
+    for label, name in enumerate(class_names):
+        for path in sorted(glob.glob(os.path.join(directory, name, "*"))):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(path)
+                labels.append(label)
+    return paths, labels, class_names
+
+
+def split_dataset(dataset_path: str, validation_split: float = VALIDATION_SPLIT, seed: int = 42):
+    """
+    train/ + val/ (or validation/) sub-folders if present, otherwise a seeded
+    random split of the class folders. Returns ((paths, labels), (paths, labels), class_names).
+    """
+    train_dir = os.path.join(dataset_path, "train")
+    val_dir = next((os.path.join(dataset_path, d) for d in ("val", "validation")
+                    if os.path.isdir(os.path.join(dataset_path, d))), None)
+    if os.path.isdir(train_dir) and val_dir:
+        train_paths, train_labels, class_names = list_images(train_dir)
+        val_paths, val_labels, _ = list_images(val_dir, class_names)
+        return (train_paths, train_labels), (val_paths, val_labels), class_names
+
+    paths, labels, class_names = list_images(dataset_path)
+    order = np.random.default_rng(seed).permutation(len(paths))
+    n_val = int(len(paths) * validation_split)
+    val_idx, train_idx = order[:n_val], order[n_val:]
+    pick = lambda idx: ([paths[i] for i in idx], [labels[i] for i in idx])
+    return pick(train_idx), pick(val_idx), class_names
+
+
+def _decode(path, label):
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, IMAGE_SIZE, antialias=True)
+    # uint8 keeps the on-disk cache at 150 KB per image
+    return tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8), label
+
+
+def _augment(image, label):
+    image = tf.image.random_flip_left_right(image)
+    # Random crop of 80–100% of the side, back to 224
+    side = tf.cast(tf.cast(IMAGE_SIZE[0], tf.float32) * tf.random.uniform([], 0.8, 1.0), tf.int32)
+    image = tf.image.random_crop(image, [side, side, 3])
+    image = tf.image.resize(image, IMAGE_SIZE)
+    image = tf.image.random_brightness(image, 25.0)
+    image = tf.image.random_contrast(image, 0.8, 1.2)
+    return tf.clip_by_value(image, 0.0, 255.0), label
+
+
+def _preprocess(images, labels):
+    # Same scaling as inference (preprocess_input in ServingModel._predict_local and the pool workers), not ImageDataGenerator's 1/255
+    return preprocess_input(tf.cast(images, tf.float32)), labels
+
+
+def _cache_file(cache_dir: str, split: str, paths: List[str]) -> str:
+    """Keyed by the file list, so adding images to the dataset invalidates the cache."""
+    fingerprint = hashlib.sha256("\n".join(paths).encode()).hexdigest()[:12]
+    prefix = os.path.join(cache_dir, f"{split}-{fingerprint}")
+    # An interrupted first epoch leaves a lockfile behind that would block the cache
+    for stale in glob.glob(f"{prefix}*.lockfile"):
+        os.remove(stale)
+    return prefix
+
+
+def make_dataset(
+    paths: List[str],
+    labels: List[int],
+    num_classes: int,
+    batch_size: int,
+    training: bool,
+    cache_dir: Optional[str] = FINE_TUNE_CACHE_DIR,
+    seed: int = 42
+) -> tf.data.Dataset:
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if training:
+        # Shuffle file order before decode so the first (cache-filling) epoch is mixed too
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=False)
+    ds = ds.map(_decode, num_parallel_calls=AUTOTUNE)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        ds = ds.cache(_cache_file(cache_dir, "train" if training else "val", paths))
+    else:
+        ds = ds.cache()
+    if training:
+        ds = ds.shuffle(min(SHUFFLE_BUFFER, len(paths)), seed=seed)
+        ds = ds.map(_augment, num_parallel_calls=AUTOTUNE)
+    ds = ds.batch(batch_size, num_parallel_calls=AUTOTUNE)
+    ds = ds.map(lambda x, y: (x, tf.one_hot(y, num_classes)), num_parallel_calls=AUTOTUNE)
+    ds = ds.map(_preprocess, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+
+    options = tf.data.Options()
+    options.deterministic = not training   # lets parallel maps hand out whatever finishes first
+    return ds.with_options(options)
+
+
+def measure_input_throughput(ds: tf.data.Dataset, batches: int = INPUT_BENCHMARK_BATCHES) -> float:
+    """Images/sec the pipeline alone delivers (run after the cache is filled)."""
+    count = 0
+    start = time.perf_counter()
+    for images, _ in ds.take(batches):
+        count += int(images.shape[0])
+    return count / max(time.perf_counter() - start, 1e-9)
+
+
+# ========== MODEL ==========
+def configure_precision(mode: str = "auto") -> str:
+    """
+    auto → mixed_float16 on GPU, float32 on CPU. mixed_bfloat16 only pays off
+    on CPUs with AVX512-BF16 / AMX, so on CPU nodes it's opt-in.
+    """
+    if mode == "auto":
+        mode = "mixed_float16" if tf.config.list_physical_devices("GPU") else "float32"
+    tf.keras.mixed_precision.set_global_policy(mode)
+    return mode
+
+
+def build_model(num_classes: int) -> Tuple[tf.keras.Model, tf.keras.Model]:
+    """Same head as before (pool → 1024 → dropout → softmax); returns (model, backbone)."""
+    backbone = MobileNetV2(weights="imagenet", include_top=False, input_shape=(*IMAGE_SIZE, 3))
+    inputs = tf.keras.Input(shape=(*IMAGE_SIZE, 3))
+    # training=False keeps BatchNorm statistics frozen even once the backbone is unfrozen
+    x = backbone(inputs, training=False)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    x = tf.keras.layers.Dense(1024, activation="relu")(x)
+    x = tf.keras.layers.Dropout(0.5)(x)
+    # Softmax in float32 under mixed precision
+    outputs = tf.keras.layers.Dense(num_classes, activation="softmax", dtype="float32")(x)
+    return tf.keras.Model(inputs, outputs), backbone
+
+
+def set_frozen_fraction(backbone: tf.keras.Model, frozen_fraction: float) -> None:
+    backbone.trainable = frozen_fraction < 1.0
+    cutoff = int(len(backbone.layers) * frozen_fraction)
+    for i, layer in enumerate(backbone.layers):
+        layer.trainable = i >= cutoff and not isinstance(layer, tf.keras.layers.BatchNormalization)
+
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Training images/sec per epoch (adds `images_per_sec` to the epoch logs)."""
+
+    def __init__(self, batch_size: int, stage: str):
+        super().__init__()
+        self.batch_size = batch_size
+        self.stage = stage
+        self.epochs: List[Dict[str, Any]] = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+        self._steps = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._steps += 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._start
+        images_per_sec = self._steps * self.batch_size / max(elapsed, 1e-9)
+        if logs is not None:
+            logs["images_per_sec"] = images_per_sec
+        self.epochs.append({
+            "stage": self.stage,
+            "epoch": epoch + 1,
+            "seconds": round(elapsed, 1),
+            "images_per_sec": round(images_per_sec, 1),
+            **{k: round(float(v), 4) for k, v in (logs or {}).items() if k != "images_per_sec"},
+        })
+        logger.info(f"[{self.stage}] epoch {epoch + 1}: {images_per_sec:.1f} images/sec")
+
+
+# ========== TRAINING ==========
+def _load_progress(checkpoint_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(checkpoint_dir, "progress.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_progress(checkpoint_dir: str, progress: Dict[str, Any]) -> None:
+    with open(os.path.join(checkpoint_dir, "progress.json"), "w") as f:
+        json.dump(progress, f, indent=2, default=str)
+
+
+def _clear_checkpoints(checkpoint_dir: str) -> None:
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+
+def train(
+    dataset_path: str,
+    epochs: int = 10,
+    batch_size: int = 32,
+    stages: Optional[List[Stage]] = None,
+    precision: str = "auto",
+    cache_dir: Optional[str] = FINE_TUNE_CACHE_DIR,
+    checkpoint_dir: str = FINE_TUNE_CHECKPOINT_DIR,
+    resume: bool = True,
+    seed: int = 42
+) -> Tuple[tf.keras.Model, Dict[str, Any]]:
+    """
+    Fine-tune and save models/<version>.h5 (+ metadata sidecar).
+
+    Each finished stage saves its weights; within a stage BackupAndRestore
+    checkpoints every epoch. Re-running with resume=True skips finished
+    stages and continues the interrupted one where it stopped.
+    Returns (model, report) – the report has per-epoch images/sec.
+    """
+    stages = stages or staged_schedule(epochs)
+    (train_paths, train_labels), (val_paths, val_labels), class_names = split_dataset(dataset_path, seed=seed)
+    if not train_paths:
+        raise ValueError(f"No images found under {dataset_path}")
+    num_classes = len(class_names)
+    policy = configure_precision(precision)
+
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    progress = _load_progress(checkpoint_dir) if resume else {}
+    if progress and progress.get("class_names") != class_names:
+        logger.info("Dataset classes changed since the checkpoint, starting over")
+        progress = {}
+    if not progress:
+        _clear_checkpoints(checkpoint_dir)   # leftovers would make BackupAndRestore resume mid-stage
+        progress = {
+            "version": f"finetuned-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}",
+            "class_names": class_names,
+            "completed_stages": [],
+            "epochs": [],
+        }
+
+    train_ds = make_dataset(train_paths, train_labels, num_classes, batch_size, True, cache_dir, seed)
+    val_ds = make_dataset(val_paths, val_labels, num_classes, batch_size, False, cache_dir, seed) if val_paths else None
+    logger.info(f"{len(train_paths)} training / {len(val_paths)} validation images, "
+                f"{num_classes} classes, precision={policy}")
+
+    model, backbone = build_model(num_classes)
+    if progress["completed_stages"]:
+        last = progress["completed_stages"][-1]
+        model.load_weights(os.path.join(checkpoint_dir, f"stage-{last}.weights.h5"))
+        logger.info(f"Resuming after stage '{last}'")
+
+    started = time.perf_counter()
+    for stage in stages:
+        if stage.name in progress["completed_stages"]:
+            continue
+        set_frozen_fraction(backbone, stage.frozen_fraction)
+        # Recompile after changing trainable flags (also resets the optimizer for the new rate)
+        model.compile(
+            optimizer=tf.keras.optimizers.Adam(learning_rate=stage.learning_rate),
+            loss="categorical_crossentropy",
+            metrics=["accuracy"]
+        )
+        throughput = ThroughputCallback(batch_size, stage.name)
+        model.fit(
+            train_ds,
+            epochs=stage.epochs,
+            validation_data=val_ds,
+            callbacks=[
+                throughput,
+                tf.keras.callbacks.BackupAndRestore(os.path.join(checkpoint_dir, f"backup-{stage.name}")),
+            ],
+            verbose=2
+        )
+        model.save_weights(os.path.join(checkpoint_dir, f"stage-{stage.name}.weights.h5"))
+        progress["completed_stages"].append(stage.name)
+        progress["epochs"].extend(throughput.epochs)
+        _save_progress(checkpoint_dir, progress)
+
+    report: Dict[str, Any] = {
+        "version": progress["version"],
+        "classes": num_classes,
+        "train_images": len(train_paths),
+        "val_images": len(val_paths),
+        "precision": policy,
+        "batch_size": batch_size,
+        "stages": [asdict(s) for s in stages],
+        "epochs": progress["epochs"],
+        "train_seconds": round(time.perf_counter() - started, 1),
+        # After training the cache is warm, so this is the steady-state pipeline rate
+        "input_pipeline_images_per_sec": round(measure_input_throughput(train_ds), 1),
+    }
+    epoch_rates = [e["images_per_sec"] for e in progress["epochs"]]
+    if epoch_rates:
+        report["train_images_per_sec"] = round(float(np.median(epoch_rates)), 1)
+    if val_ds is not None:
+        loss, accuracy = model.evaluate(val_ds, verbose=0)
+        report.update({"val_loss": round(float(loss), 4), "val_accuracy": round(float(accuracy), 4)})
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    path = os.path.join(MODEL_DIR, f"{progress['version']}.h5")
+    model.save(path)
+    save_model_metadata(path, {
+        **{k: v for k, v in report.items() if k != "epochs"},
+        "class_names": class_names,
+        "dataset": dataset_path,
+        "created_at": datetime.utcnow(),
+    })
+    report["path"] = path
+    _clear_checkpoints(checkpoint_dir)       # done – the next run starts a new version
+    logger.info(f"Fine-tuned model saved to {path}")
+    return model, report
@@ -0,0 +1,98 @@
+# backend/image_utils.py
+import os
+import resource
+from functools import cached_property
+from io import BytesIO
+
+import numpy as np
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image
+
+# ========== CONFIGURATION ==========
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+READ_CHUNK_BYTES = 256 * 1024
+
+MODEL_INPUT_SIZE = (224, 224)   # MobileNetV2
+PALETTE_SIZE = (120, 120)       # k-means colour extraction
+PHASH_SIZE = (9, 8)             # dHash
+
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Copy an upload into memory in chunks, with a 413 once it exceeds max_bytes.
+
+    This is a size check, not streaming: Starlette has already received the
+    whole multipart body and spooled it to a temporary file (on disk past
+    1 MB) before the route runs. It only keeps oversized files out of
+    process memory – capping what clients may send at all is the reverse
+    proxy's job (e.g. nginx client_max_body_size).
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"Image too large (max {max_bytes // (1024 * 1024)} MB)"
+        )
+
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise HTTPException(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                f"Image too large (max {max_bytes // (1024 * 1024)} MB)"
+            )
+    return bytes(buffer)
+
+
+class DecodedImage:
+    """
+    One decode of an uploaded image, shared by every pipeline stage.
+
+    JPEGs are decoded with Image.draft(), which lets libjpeg scale by 1/2,
+    1/4 or 1/8 while decoding, so a 12 MP photo is never materialised at
+    full resolution just to be shrunk to 224×224. Derived arrays are
+    computed lazily – a cache hit that never needs them costs nothing.
+    """
+
+    def __init__(self, image_bytes: bytes):
+        self.image_bytes = image_bytes
+        self.model_outputs = None   # (model version, probabilities, embedding) of its forward pass
+
+    @cached_property
+    def base(self) -> Image.Image:
+        """Smallest decode that is still ≥ the model input size, in RGB."""
+        img = Image.open(BytesIO(self.image_bytes))
+        img.draft("RGB", MODEL_INPUT_SIZE)
+        return img.convert("RGB")
+
+    @cached_property
+    def rgb224(self) -> np.ndarray:
+        """uint8 (224, 224, 3) RGB – model input before preprocess_input."""
+        return np.asarray(self.base.resize(MODEL_INPUT_SIZE), dtype=np.uint8)
+
+    @cached_property
+    def bgr_small(self) -> np.ndarray:
+        """uint8 (120, 120, 3) BGR – what the OpenCV k-means palette step works on."""
+        rgb = np.asarray(self.base.resize(PALETTE_SIZE, Image.BILINEAR), dtype=np.uint8)
+        return np.ascontiguousarray(rgb[:, :, ::-1])
+
+    @cached_property
+    def gray_hash_input(self) -> np.ndarray:
+        """int16 (8, 9) grayscale for the dHash."""
+        return np.asarray(self.base.convert("L").resize(PHASH_SIZE, Image.BILINEAR), dtype=np.int16)
+
+    def release(self) -> None:
+        """Drop the decoded base image once all derived arrays exist."""
+        self.__dict__.pop("base", None)
+
+
+def as_decoded(image) -> DecodedImage:
+    return image if isinstance(image, DecodedImage) else DecodedImage(image)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,390 @@
+# backend/inference_pool.py
+import asyncio
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from model_version import MODEL_PATH, class_names_for
+
+logger = logging.getLogger(__name__)
+
+# ========== CONFIGURATION ==========
+# 0 → models run inside the API process (ai_utils), as before
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+INFERENCE_SLOTS_PER_WORKER = int(os.getenv("INFERENCE_SLOTS_PER_WORKER", "8"))   # also the max micro-batch
+# 0 → cores / workers, so the pool as a whole doesn't oversubscribe the machine
+INFERENCE_INTRA_OP_THREADS = int(os.getenv("INFERENCE_INTRA_OP_THREADS", "0"))
+INFERENCE_INTER_OP_THREADS = int(os.getenv("INFERENCE_INTER_OP_THREADS", "1"))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "30"))
+READY_TIMEOUT_SECONDS = 300
+SUPERVISE_INTERVAL_SECONDS = 1.0     # how often worker processes are checked for liveness
+RESTART_BACKOFF_SECONDS = 5          # between restarts of a worker that keeps failing
+
+INPUT_SHAPE = (224, 224, 3)     # uint8 RGB, DecodedImage.rgb224
+NUM_CLASSES = 1000              # MobileNetV2 ImageNet head (fine-tuned heads: len(class_names))
+EMBEDDING_DIM = 1280            # global-average-pooled features
+
+
+def model_heads(model) -> list:
+    """
+    [class probabilities, pooled embedding] outputs of a MobileNetV2 classifier –
+    stock or fine-tuned (backbone + GlobalAveragePooling2D + new head), so the
+    embedding is the same 1280-d space either way.
+    """
+    import tensorflow as tf
+    pooled = [layer for layer in model.layers if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D)]
+    return [model.output, pooled[-1].output]
+
+
+class _SlotBuffers:
+    """
+    One worker's shared memory: `slots` input images (uint8) and `slots`
+    output rows (probabilities followed by the embedding, float32). Only
+    (request id, slot) tuples cross the process boundary.
+    """
+
+    def __init__(self, slots: int, output_width: int, names: Optional[Tuple[str, str]] = None):
+        self.owner = names is None
+        if self.owner:
+            self._input_shm = shared_memory.SharedMemory(create=True, size=slots * int(np.prod(INPUT_SHAPE)))
+            self._output_shm = shared_memory.SharedMemory(create=True, size=slots * output_width * 4)
+        else:
+            self._input_shm = shared_memory.SharedMemory(name=names[0])
+            self._output_shm = shared_memory.SharedMemory(name=names[1])
+        self.inputs = np.ndarray((slots, *INPUT_SHAPE), dtype=np.uint8, buffer=self._input_shm.buf)
+        self.outputs = np.ndarray((slots, output_width), dtype=np.float32, buffer=self._output_shm.buf)
+
+    @property
+    def names(self) -> Tuple[str, str]:
+        return self._input_shm.name, self._output_shm.name
+
+    def close(self) -> None:
+        # Views must go before the mapping can be closed
+        del self.inputs, self.outputs
+        for shm in (self._input_shm, self._output_shm):
+            shm.close()
+            if self.owner:
+                shm.unlink()
+
+
+# ========== WORKER PROCESS ==========
+def _worker_main(worker_id, names, slots, num_classes, requests, responses, intra_threads, inter_threads, model_path):
+    """
+    Owns one MobileNetV2 with two outputs (class probabilities + pooled
+    embedding), so classification and embedding cost a single forward pass.
+    Whatever is already queued is run as one micro-batch.
+    """
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(intra_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_threads)
+        from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2, preprocess_input
+
+        base = tf.keras.models.load_model(model_path) if model_path else MobileNetV2(weights="imagenet")
+        model = tf.keras.Model(inputs=base.input, outputs=model_heads(base))
+        buffers = _SlotBuffers(slots, num_classes + EMBEDDING_DIM, names)
+        model(np.zeros((1, *INPUT_SHAPE), dtype=np.float32), training=False)  # build / warm up
+    except Exception as e:
+        # Reported instead of just exiting, so the pool can say why
+        responses.put(("load_error", worker_id, f"{type(e).__name__}: {e}"))
+        return
+    responses.put(("ready", worker_id, None))
+
+    stopping = False
+    while not stopping:
+        message = requests.get()
+        if message is None:
+            break
+        batch = [message]
+        while len(batch) < slots:
+            try:
+                message = requests.get_nowait()
+            except queue.Empty:
+                break
+            if message is None:
+                stopping = True
+                break
+            batch.append(message)
+
+        slot_ids = [slot for _, slot in batch]
+        try:
+            x = preprocess_input(buffers.inputs[slot_ids].astype(np.float32))
+            probs, features = model(x, training=False)
+            buffers.outputs[slot_ids, :num_classes] = probs.numpy()
+            buffers.outputs[slot_ids, num_classes:] = features.numpy()
+            for request_id, _ in batch:
+                responses.put(("ok", request_id, None))
+        except Exception as e:
+            for request_id, _ in batch:
+                responses.put(("error", request_id, repr(e)))
+
+    buffers.close()
+
+
+# ========== POOL (API PROCESS) ==========
+class InferencePool:
+    """
+    Process pool owning the models. `await infer(rgb224)` copies the image
+    straight into a free shared-memory slot, and reads probabilities and
+    embedding back from the same slot – no large array is pickled.
+
+    The response reader thread also supervises the workers. When one dies,
+    its in-flight requests fail right away. Its slots stop being handed out,
+    and it is restarted (every RESTART_BACKOFF_SECONDS while it keeps
+    failing). The slots come back once the new process reports ready. Slot
+    entries carry the worker's generation, so ones queued before the crash
+    are dropped instead of reaching the new process twice.
+    """
+
+    def __init__(
+        self,
+        workers: int = INFERENCE_WORKERS,
+        slots: int = INFERENCE_SLOTS_PER_WORKER,
+        intra_threads: int = INFERENCE_INTRA_OP_THREADS,
+        inter_threads: int = INFERENCE_INTER_OP_THREADS,
+        model_path: Optional[str] = MODEL_PATH
+    ):
+        self.workers = workers
+        self.slots = slots
+        self.intra_threads = intra_threads or max(1, (os.cpu_count() or 1) // max(1, workers))
+        self.inter_threads = inter_threads
+        self.model_path = model_path
+        class_names = class_names_for(model_path)
+        self.num_classes = len(class_names) if class_names else NUM_CLASSES
+        self._ctx = mp.get_context("spawn")     # fork + TensorFlow don't mix
+        self._buffers: List[_SlotBuffers] = []
+        self._requests: List[mp.Queue] = []
+        self._processes: List[mp.Process] = []
+        self._responses: Optional[mp.Queue] = None
+        # Per worker: "starting" / "ready" / "dead", slot generation, when to try a restart
+        self._state: List[str] = []
+        self._generation: List[int] = []
+        self._restart_at: List[Optional[float]] = []
+        self._pending: Dict[int, Tuple[asyncio.Future, int, int, int]] = {}
+        self._ids = itertools.count()
+        self._free: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader: Optional[threading.Thread] = None
+        self._stopping = False
+        self.restarts = 0
+        self.started = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.started
+
+    def _spawn(self, worker_id: int) -> None:
+        """(Re)start one worker process on its existing shared memory, with a fresh request queue."""
+        requests = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._buffers[worker_id].names, self.slots, self.num_classes, requests, self._responses,
+                  self.intra_threads, self.inter_threads, self.model_path),
+            name=f"inference-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self._requests[worker_id] = requests
+        self._processes[worker_id] = process
+        self._state[worker_id] = "starting"
+
+    def start(self) -> None:
+        """
+        Blocking (run via asyncio.to_thread): spawns the workers and waits until
+        their models are loaded. Raises RuntimeError if a worker can't load its
+        model, dies, or isn't ready within READY_TIMEOUT_SECONDS.
+        """
+        if self.started or self.workers <= 0:
+            return
+        self._stopping = False
+        self._responses = self._ctx.Queue()
+        self._state = ["starting"] * self.workers
+        self._generation = [0] * self.workers
+        self._restart_at = [None] * self.workers
+        self._requests = [None] * self.workers
+        self._processes = [None] * self.workers
+        self._buffers = [_SlotBuffers(self.slots, self.num_classes + EMBEDDING_DIM) for _ in range(self.workers)]
+        try:
+            for worker_id in range(self.workers):
+                self._spawn(worker_id)
+            self._wait_ready()
+        except BaseException:
+            self._shutdown()
+            raise
+
+        # Interleaved, so consecutive requests spread over workers
+        self._free = asyncio.Queue()
+        for slot in range(self.slots):
+            for worker_id in range(self.workers):
+                self._free.put_nowait((worker_id, slot, 0))
+        self._reader = threading.Thread(target=self._read_responses, name="inference-responses", daemon=True)
+        self._reader.start()
+        self.started = True
+        logger.info(f"Inference pool: {self.workers} workers × {self.slots} slots, "
+                    f"intra_op={self.intra_threads} inter_op={self.inter_threads}")
+
+    def _wait_ready(self) -> None:
+        deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+        while "starting" in self._state:
+            try:
+                kind, worker_id, detail = self._responses.get(timeout=SUPERVISE_INTERVAL_SECONDS)
+            except queue.Empty:
+                for worker_id, process in enumerate(self._processes):
+                    if self._state[worker_id] == "starting" and not process.is_alive():
+                        raise RuntimeError(f"Inference worker {worker_id} exited with code {process.exitcode} "
+                                           f"while loading {self.model_path or 'MobileNetV2'}")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Inference workers not ready after {READY_TIMEOUT_SECONDS}s")
+                continue
+            if kind == "load_error":
+                raise RuntimeError(f"Inference worker {worker_id} could not load "
+                                   f"{self.model_path or 'MobileNetV2'}: {detail}")
+            if kind == "ready":
+                self._state[worker_id] = "ready"
+                logger.info(f"Inference worker {worker_id} ready")
+
+    # ========== SUPERVISION (reader thread) ==========
+    def _read_responses(self) -> None:
+        checked = time.monotonic()
+        while True:
+            try:
+                message = self._responses.get(timeout=SUPERVISE_INTERVAL_SECONDS)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                return
+            if message:
+                kind, key, detail = message
+                if kind == "ready":
+                    self._worker_ready(key)
+                elif kind == "load_error":
+                    self._worker_down(key, f"could not load its model: {detail}")
+                elif self._loop is not None:
+                    self._loop.call_soon_threadsafe(self._complete, kind, key, detail)
+            if time.monotonic() - checked >= SUPERVISE_INTERVAL_SECONDS:
+                self._supervise()
+                checked = time.monotonic()
+
+    def _supervise(self) -> None:
+        if self._stopping:
+            return
+        now = time.monotonic()
+        for worker_id, process in enumerate(self._processes):
+            state = self._state[worker_id]
+            if state in ("ready", "starting") and not process.is_alive():
+                self._worker_down(worker_id, f"exited with code {process.exitcode}")
+            elif state == "dead" and now >= self._restart_at[worker_id]:
+                logger.info(f"Restarting inference worker {worker_id}")
+                self.restarts += 1
+                self._spawn(worker_id)
+
+    def _worker_down(self, worker_id: int, reason: str) -> None:
+        if self._stopping:
+            return
+        was_ready = self._state[worker_id] == "ready"
+        self._state[worker_id] = "dead"
+        self._restart_at[worker_id] = time.monotonic() + (0 if was_ready else RESTART_BACKOFF_SECONDS)
+        if was_ready:
+            # Slots still queued in _free are stale from now on
+            self._generation[worker_id] += 1
+            self._on_loop(self._fail_pending, worker_id, reason)
+        logger.error(f"Inference worker {worker_id} {reason}, restarting")
+
+    def _worker_ready(self, worker_id: int) -> None:
+        if self._stopping or self._state[worker_id] != "starting":
+            return
+        self._state[worker_id] = "ready"
+        self._on_loop(self._add_slots, worker_id, self._generation[worker_id])
+        logger.info(f"Inference worker {worker_id} ready again")
+
+    def _on_loop(self, callback, *args) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(callback, *args)
+        else:
+            callback(*args)     # nothing has used the pool yet
+
+    # ========== EVENT LOOP ==========
+    def _fail_pending(self, worker_id: int, reason: str) -> None:
+        for request_id, (future, owner, _, _) in list(self._pending.items()):
+            if owner == worker_id:
+                del self._pending[request_id]
+                if not future.done():
+                    future.set_exception(RuntimeError(f"Inference worker {worker_id} {reason}"))
+
+    def _add_slots(self, worker_id: int, generation: int) -> None:
+        for slot in range(self.slots):
+            self._free.put_nowait((worker_id, slot, generation))
+
+    def _complete(self, kind: str, request_id: int, error: Optional[str]) -> None:
+        """On the event loop. The slot is released only now, even if the caller gave up waiting."""
+        entry = self._pending.pop(request_id, None)
+        if entry is None:
+            return  # its worker died and the request was failed already
+        future, worker_id, slot, generation = entry
+        if not future.done():
+            if kind == "ok":
+                row = self._buffers[worker_id].outputs[slot]
+                future.set_result((row[:self.num_classes].copy(), row[self.num_classes:].copy()))
+            else:
+                future.set_exception(RuntimeError(f"Inference worker {worker_id} failed: {error}"))
+        if generation == self._generation[worker_id]:
+            self._free.put_nowait((worker_id, slot, generation))
+
+    async def _take_slot(self) -> Tuple[int, int, int]:
+        while True:
+            worker_id, slot, generation = await self._free.get()
+            if generation == self._generation[worker_id]:
+                return worker_id, slot, generation
+            # Slot of a worker that died since – dropped, the restarted worker brings it back
+
+    async def infer(self, rgb224: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """uint8 (224, 224, 3) RGB → (class probabilities (num_classes,), embedding (1280,))"""
+        self._loop = asyncio.get_running_loop()
+        if "ready" not in self._state:
+            raise RuntimeError("No inference worker is running")
+        worker_id, slot, generation = await asyncio.wait_for(self._take_slot(), INFERENCE_TIMEOUT_SECONDS)
+        self._buffers[worker_id].inputs[slot] = rgb224
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[request_id] = (future, worker_id, slot, generation)
+        self._requests[worker_id].put((request_id, slot))
+        return await asyncio.wait_for(asyncio.shield(future), INFERENCE_TIMEOUT_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "ready": self._state.count("ready"),
+            "restarts": self.restarts,
+            "inflight": len(self._pending),
+        }
+
+    def _shutdown(self) -> None:
+        self._stopping = True
+        for requests in self._requests:
+            if requests is not None:
+                requests.put(None)
+        for process in self._processes:
+            if process is None:
+                continue
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        for buffers in self._buffers:
+            buffers.close()
+        self._buffers, self._requests, self._processes = [], [], []
+        self._state = []
+
+    def stop(self) -> None:
+        if not self.started:
+            return
+        self._shutdown()
+        self._responses.put(None)
+        self.started = False
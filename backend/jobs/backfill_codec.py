@@ -0,0 +1,127 @@
+# backend/jobs/backfill_codec.py
+"""
+Train, evaluate and backfill an embedding codec (PCA / PQ) for wardrobe_items.features.
+
+    cd backend
+    python -m jobs.backfill_codec train --kind pca --size 256
+    python -m jobs.backfill_codec evaluate pca256-20261018-1a2b3c4d
+    python -m jobs.backfill_codec apply pca256-20261018-1a2b3c4d
+    # then set EMBEDDING_CODEC_ID=pca256-20261018-1a2b3c4d and restart the API
+
+`apply` only touches items still stored as raw vectors and checkpoints its
+progress, so it can be stopped and re-run (e.g. once more after flipping
+the env var, to pick up uploads made in between).
+"""
+import argparse
+import asyncio
+import json
+import logging
+from datetime import datetime
+
+import numpy as np
+from pymongo import UpdateOne
+
+from embedding_codec import RAW_CODEC_ID, codec_filter, evaluate_recall, load_codec, train_codec
+from jobs.common import clear_checkpoint, get_db, load_checkpoint, save_checkpoint
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("FashionAI")
+
+RAW_FILTER = {"features.0": {"$exists": True}, **codec_filter(RAW_CODEC_ID)}
+
+
+async def sample_raw_features(db, sample_size: int) -> np.ndarray:
+    docs = await db.wardrobe_items.aggregate([
+        {"$match": RAW_FILTER},
+        {"$sample": {"size": sample_size}},
+        {"$project": {"_id": 0, "features": 1}}
+    ]).to_list(sample_size)
+    if not docs:
+        raise SystemExit("No raw embeddings found in wardrobe_items")
+    return np.array([doc["features"] for doc in docs], dtype=np.float32)
+
+
+async def train(db, args):
+    sample = await sample_raw_features(db, args.sample)
+    logger.info(f"Training {args.kind} codec (size={args.size}) on {len(sample)} vectors")
+    codec = train_codec(args.kind, sample, args.size)
+    path = codec.save()
+    logger.info(f"Saved codec {codec.codec_id} to {path}")
+    report = evaluate_recall(codec, sample, n_queries=min(200, len(sample) // 10), k=args.k)
+    print(json.dumps({"codec_id": codec.codec_id, **report}, indent=2))
+
+
+async def evaluate(db, args):
+    codec = load_codec(args.codec_id)
+    sample = await sample_raw_features(db, args.sample)
+    report = evaluate_recall(codec, sample, n_queries=min(200, len(sample) // 10), k=args.k)
+    print(json.dumps({"codec_id": codec.codec_id, "sample": len(sample), **report}, indent=2))
+
+
+async def apply(db, args):
+    codec = load_codec(args.codec_id)
+    job_name = f"backfill_codec:{codec.codec_id}"
+    checkpoint = await load_checkpoint(db, job_name)
+    query = dict(RAW_FILTER)
+    if checkpoint and not args.restart:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+        logger.info(f"Resuming after {checkpoint['last_id']} ({checkpoint.get('done', 0)} done)")
+    done = checkpoint.get("done", 0) if checkpoint and not args.restart else 0
+
+    cursor = db.wardrobe_items.find(query, {"features": 1}).sort("_id", 1).batch_size(args.batch)
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= args.batch:
+            done += await _write_batch(db, codec, batch, args.keep_raw)
+            await save_checkpoint(db, job_name, batch[-1]["_id"], done=done)
+            logger.info(f"{done} items re-encoded")
+            batch = []
+    if batch:
+        done += await _write_batch(db, codec, batch, args.keep_raw)
+    await clear_checkpoint(db, job_name)
+    logger.info(f"Backfill complete: {done} items now stored as {codec.codec_id}")
+
+
+async def _write_batch(db, codec, docs, keep_raw: bool) -> int:
+    encoded = codec.encode(np.array([doc["features"] for doc in docs], dtype=np.float32))
+    now = datetime.utcnow()
+    ops = []
+    for doc, vec in zip(docs, encoded):
+        update = {"features": vec.tolist(), "codec_id": codec.codec_id, "updated_at": now}
+        if keep_raw:
+            update["features_raw"] = doc["features"]
+        # Filter on the raw codec again so a concurrent re-encode can't be applied twice
+        ops.append(UpdateOne({"_id": doc["_id"], **codec_filter(RAW_CODEC_ID)}, {"$set": update}))
+    result = await db.wardrobe_items.bulk_write(ops, ordered=False)
+    return result.modified_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding codec training / backfill")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_train = sub.add_parser("train", help="fit a new codec on a sample of stored raw embeddings")
+    p_train.add_argument("--kind", choices=["pca", "pq"], default="pca")
+    p_train.add_argument("--size", type=int, default=256, help="PCA output dim / PQ bytes per vector")
+    p_train.add_argument("--sample", type=int, default=50_000)
+    p_train.add_argument("--k", type=int, default=10)
+
+    p_eval = sub.add_parser("evaluate", help="recall@k of a codec vs exact raw search")
+    p_eval.add_argument("codec_id")
+    p_eval.add_argument("--sample", type=int, default=20_000)
+    p_eval.add_argument("--k", type=int, default=10)
+
+    p_apply = sub.add_parser("apply", help="re-encode stored raw embeddings with a codec")
+    p_apply.add_argument("codec_id")
+    p_apply.add_argument("--batch", type=int, default=500)
+    p_apply.add_argument("--keep-raw", action="store_true", help="also keep the 1280-d vector in features_raw")
+    p_apply.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+
+    args = parser.parse_args()
+    db = get_db()
+    asyncio.run({"train": train, "evaluate": evaluate, "apply": apply}[args.command](db, args))
+
+
+if __name__ == "__main__":
+    main()
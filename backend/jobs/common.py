@@ -0,0 +1,36 @@
+# backend/jobs/common.py
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+load_dotenv()
+
+# Same database as main.DATABASE_NAME (not imported to avoid starting the API app)
+DATABASE_NAME = "wardrobe_ai_kenya"
+
+
+def get_db():
+    mongo_uri = os.getenv("MONGO_URI")
+    if not mongo_uri:
+        raise RuntimeError("MONGO_URI is not set in .env file!")
+    return AsyncIOMotorClient(mongo_uri)[DATABASE_NAME]
+
+
+async def load_checkpoint(db, job_name: str) -> Optional[Dict[str, Any]]:
+    """Last saved progress of a resumable job (None = start from scratch)."""
+    return await db.job_checkpoints.find_one({"_id": job_name})
+
+
+async def save_checkpoint(db, job_name: str, last_id, **stats) -> None:
+    await db.job_checkpoints.update_one(
+        {"_id": job_name},
+        {"$set": {"last_id": last_id, "updated_at": datetime.utcnow(), **stats}},
+        upsert=True
+    )
+
+
+async def clear_checkpoint(db, job_name: str) -> None:
+    await db.job_checkpoints.delete_one({"_id": job_name})
@@ -0,0 +1,191 @@
+# backend/jobs/fashion_head.py
+"""
+Train / evaluate the fashion category head (fashion_head.py) for a model
+version on a folder-per-category set of labelled photos:
+
+    dataset/<category>/<image>      shirt/, trousers/, dress/, traditional/, other/, ...
+    (or dataset/train/<category> + dataset/val/<category>)
+
+    cd backend
+    python -m jobs.fashion_head train /data/wardrobe-labels
+    python -m jobs.fashion_head train /data/wardrobe-labels --version finetuned-20261018-120000 --workers 4
+    python -m jobs.fashion_head evaluate /data/eval
+    # running APIs pick a new head up on POST /api/admin/models/<version>/activate (or jobs.models activate)
+
+Embeddings come from the same forward pass the API runs; --features-cache
+keeps them so trying another --l2 doesn't re-run the model. The report
+compares the head with the ImageNet label matching it replaces (accuracy,
+macro F1, per-class precision/recall, confusions, µs per item) and is
+saved next to the head.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from fashion_head import evaluate_head, save_head, train_head
+from image_utils import DecodedImage
+from model_registry import ServingModel, model_registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("FashionAI")
+
+EMBED_CONCURRENCY = 32
+
+
+# ========== EMBEDDINGS ==========
+def _read_decoded(path: str) -> DecodedImage:
+    with open(path, "rb") as f:
+        decoded = DecodedImage(f.read())
+    decoded.rgb224  # decode here, in the thread
+    return decoded
+
+
+async def embed_images(model: ServingModel, paths: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(probabilities, embeddings) for every image, in order."""
+    semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+    done = 0
+
+    async def one(path):
+        nonlocal done
+        async with semaphore:
+            decoded = await asyncio.to_thread(_read_decoded, path)
+            outputs = await model.predict(decoded)
+        done += 1
+        if done % 500 == 0:
+            logger.info(f"Embedded {done}/{len(paths)} images")
+        return outputs
+
+    outputs = await asyncio.gather(*(one(p) for p in paths))
+    if not outputs:
+        return np.zeros((0, 0), dtype=np.float32), np.zeros((0, model.embedding_dim), dtype=np.float32)
+    return np.stack([o[0] for o in outputs]), np.stack([o[1] for o in outputs])
+
+
+async def cached_embeddings(
+    model: ServingModel, paths: List[str], cache_file: Optional[str]
+) -> Tuple[np.ndarray, np.ndarray]:
+    if cache_file and os.path.exists(cache_file):
+        with np.load(cache_file) as data:
+            if str(data["version"]) == model.version and list(data["paths"]) == paths:
+                logger.info(f"Using embeddings from {cache_file}")
+                return data["probs"], data["embeddings"]
+    probs, embeddings = await embed_images(model, paths)
+    if cache_file:
+        np.savez(cache_file, version=model.version, paths=np.array(paths), probs=probs, embeddings=embeddings)
+    return probs, embeddings
+
+
+# ========== COMMANDS ==========
+def _load_model(args) -> ServingModel:
+    version = args.version or model_registry.current_version()
+    manifest = model_registry.get_manifest(version)
+    if manifest is None:
+        raise SystemExit(f"Unknown model version {version}")
+    model = ServingModel(manifest)
+    model.load(workers=args.workers)
+    return model
+
+
+def _baseline(model: ServingModel, probs: np.ndarray):
+    """The old classifier: ImageNet (or fine-tuned) labels matched against FASHION_CATEGORIES."""
+    from ai_utils import categorize
+    return lambda i: categorize(probs[i], model.class_names)[0]
+
+
+def _warn_unknown_categories(classes: List[str]) -> None:
+    from attribute_rules import ATTRIBUTE_RULES_PATH, attribute_rules
+    unknown = [c for c in classes if c.lower() not in attribute_rules.categories and c != "other"]
+    if unknown:
+        logger.warning(f"Categories no rule in {ATTRIBUTE_RULES_PATH} names (they get the defaults): {unknown}")
+
+
+async def train(args):
+    from fine_tuning import split_dataset
+
+    (train_paths, train_labels), (val_paths, val_labels), classes = split_dataset(
+        args.dataset_path, args.validation_split, args.seed
+    )
+    _warn_unknown_categories(classes)
+    model = _load_model(args)
+    try:
+        cache = f"{args.features_cache}.npz" if args.features_cache else None
+        probs, embeddings = await cached_embeddings(model, train_paths + val_paths, cache)
+    finally:
+        await model.retire(timeout=0)
+
+    n_train = len(train_paths)
+    head = train_head(embeddings[:n_train], train_labels, classes,
+                      l2=args.l2, epochs=args.epochs, learning_rate=args.learning_rate, seed=args.seed)
+
+    # No validation images → the report is on the training set and says so
+    eval_slice = slice(n_train, None) if val_paths else slice(0, n_train)
+    expected = [classes[i] for i in (val_labels if val_paths else train_labels)]
+    report = evaluate_head(head, embeddings[eval_slice], expected, _baseline(model, probs[eval_slice]))
+    report.update({
+        "version": model.version,
+        "dataset": os.path.abspath(args.dataset_path),
+        "evaluated_on": "val" if val_paths else "train",
+        "train_images": n_train,
+        "val_images": len(val_paths),
+        "train_accuracy": round(float(np.mean(
+            np.argmax(head.predict_proba(embeddings[:n_train]), axis=1) == np.asarray(train_labels))), 4),
+        "hyperparameters": {"l2": args.l2, "epochs": args.epochs, "learning_rate": args.learning_rate, "seed": args.seed},
+        "trained_at": datetime.utcnow(),
+    })
+    if not args.dry_run:
+        report["path"] = save_head(head, model.version, report)
+    print(json.dumps({"head_id": head.head_id, **report}, indent=2, default=str))
+
+
+async def evaluate(args):
+    from fine_tuning import list_images
+
+    model = _load_model(args)
+    if model.head is None:
+        raise SystemExit(f"No fashion head for {model.version} – run `python -m jobs.fashion_head train` first")
+    paths, labels, classes = list_images(args.dataset_path)
+    try:
+        cache = f"{args.features_cache}.npz" if args.features_cache else None
+        probs, embeddings = await cached_embeddings(model, paths, cache)
+    finally:
+        await model.retire(timeout=0)
+    report = evaluate_head(model.head, embeddings, [classes[i] for i in labels], _baseline(model, probs))
+    print(json.dumps({
+        "version": model.version, "head_id": model.head.head_id,
+        "dataset": os.path.abspath(args.dataset_path), **report
+    }, indent=2, default=str))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fashion category head on the model's embeddings")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_train = sub.add_parser("train", help="fit the head on labelled photos and save it with its report")
+    p_train.add_argument("dataset_path", help="folder per fashion category (or train/ + val/)")
+    p_train.add_argument("--validation-split", type=float, default=0.2, help="when there are no train/ + val/ folders")
+    p_train.add_argument("--l2", type=float, default=1e-3)
+    p_train.add_argument("--epochs", type=int, default=100)
+    p_train.add_argument("--learning-rate", type=float, default=0.01)
+    p_train.add_argument("--seed", type=int, default=42)
+    p_train.add_argument("--dry-run", action="store_true", help="report only, don't save the head")
+
+    p_eval = sub.add_parser("evaluate", help="the saved head vs. ImageNet label matching on labelled photos")
+    p_eval.add_argument("dataset_path", help="folder per fashion category")
+
+    for p in (p_train, p_eval):
+        p.add_argument("--version", help="model version (default: the serving one)")
+        p.add_argument("--workers", type=int, default=0, help="inference worker processes (0 = in-process)")
+        p.add_argument("--features-cache", help="file (without .npz) to keep embeddings in between runs")
+
+    args = parser.parse_args()
+    asyncio.run({"train": train, "evaluate": evaluate}[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# backend/jobs/fine_tune.py
+"""
+Fine-tune MobileNetV2 on a folder-per-class dataset (see fine_tuning.py).
+
+    cd backend
+    python -m jobs.fine_tune /data/afrifashion1600 --epochs 10 --batch-size 32
+    python -m jobs.fine_tune /data/afrifashion1600 --precision mixed_bfloat16   # CPUs with AMX / AVX512-BF16
+    # interrupted? the same command resumes; --fresh starts over
+
+Prints a JSON report (per-epoch images/sec, input-pipeline images/sec,
+validation accuracy) and the saved model path for `python -m jobs.reembed`.
+"""
+import argparse
+import json
+import logging
+
+from fine_tuning import FINE_TUNE_CACHE_DIR, FINE_TUNE_CHECKPOINT_DIR, train
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune the classification / embedding model")
+    parser.add_argument("dataset_path")
+    parser.add_argument("--epochs", type=int, default=10, help="total over all stages (head → top → full)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--precision", default="auto", choices=["auto", "float32", "mixed_float16", "mixed_bfloat16"])
+    parser.add_argument("--cache-dir", default=FINE_TUNE_CACHE_DIR, help="on-disk cache of decoded images")
+    parser.add_argument("--no-cache", action="store_true", help="cache decoded images in memory instead")
+    parser.add_argument("--checkpoint-dir", default=FINE_TUNE_CHECKPOINT_DIR)
+    parser.add_argument("--fresh", action="store_true", help="ignore checkpoints from an earlier run")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    _, report = train(
+        args.dataset_path,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        precision=args.precision,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        checkpoint_dir=args.checkpoint_dir,
+        resume=not args.fresh,
+        seed=args.seed
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
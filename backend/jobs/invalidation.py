@@ -0,0 +1,58 @@
+# backend/jobs/invalidation.py
+"""
+See what the invalidation bus (services/invalidation.py) publishes, e.g.
+against a local single-node replica set while writing through the API:
+
+    cd backend
+    python -m jobs.invalidation tail                     # own resume token, doesn't move the API's
+    python -m jobs.invalidation tail --from-now
+    python -m jobs.invalidation reset invalidation:api-1:0 # forget a worker slot's resume token
+"""
+import argparse
+import asyncio
+import logging
+from typing import List
+
+from jobs.common import get_db
+from services.invalidation import Invalidation, WATCHED_COLLECTIONS, invalidation_loop, on_invalidation, save_token
+
+logging.basicConfig(level=logging.INFO)
+
+TAIL_STREAM_NAME = "invalidation:tail"
+
+
+async def tail(args):
+    db = get_db()
+
+    @on_invalidation(*WATCHED_COLLECTIONS)
+    async def show(db, events: List[Invalidation]):
+        for event in events:
+            print(f"{event.collection:<15} {event.operation:<8} {event.document_id}  user={event.user_id}")
+
+    if args.from_now:
+        await save_token(db, args.name, None)
+    await invalidation_loop(db, args.name)
+
+
+async def reset(args):
+    await save_token(get_db(), args.name, None)
+    print(f"Resume token for {args.name} removed – its next start begins at the current oplog position")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache invalidation change stream")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_tail = sub.add_parser("tail", help="print invalidation events as they are published")
+    p_tail.add_argument("--name", default=TAIL_STREAM_NAME, help="resume token to use / store")
+    p_tail.add_argument("--from-now", action="store_true", help="ignore the stored resume token")
+
+    p_reset = sub.add_parser("reset", help="delete a stored resume token")
+    p_reset.add_argument("name", help="invalidation:<host>:<slot>, or the process's INVALIDATION_STREAM_NAME")
+
+    args = parser.parse_args()
+    asyncio.run({"tail": tail, "reset": reset}[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
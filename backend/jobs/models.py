@@ -0,0 +1,119 @@
+# backend/jobs/models.py
+"""
+Model registry maintenance (models/<version>.h5 + manifest JSON).
+
+    cd backend
+    python -m jobs.models list
+    python -m jobs.models register models/finetuned-20261018-120000.h5
+    python -m jobs.models evaluate finetuned-20261018-120000 /data/eval    # eval/<category>/<image>
+    python -m jobs.models activate finetuned-20261018-120000               # running APIs switch to it
+
+`activate` (like POST /api/admin/models/<version>/activate) publishes the
+version in model_serving, which every running API process follows, and
+which processes started later load too. MODEL_PATH still pins a version
+at startup.
+
+`evaluate` classifies a folder-per-category set of labelled photos exactly
+like uploads are classified and stores top-1 category accuracy and
+latency percentiles in the version's manifest.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+
+from jobs.common import get_db
+from model_registry import ServingModel, model_registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("FashionAI")
+
+
+def list_models(args):
+    print(json.dumps(model_registry.describe(), indent=2, default=str))
+
+
+def register(args):
+    manifest = model_registry.register(args.artifact)
+    print(json.dumps({k: v for k, v in manifest.items() if k != "class_names"}, indent=2, default=str))
+
+
+async def evaluate(args):
+    from ai_utils import classify_image
+    from fine_tuning import list_images
+    from image_utils import DecodedImage
+
+    manifest = model_registry.get_manifest(args.version)
+    if manifest is None:
+        raise SystemExit(f"Unknown model version {args.version}")
+    paths, labels, categories = list_images(args.dataset_path)
+    if args.limit:
+        paths, labels = paths[:args.limit], labels[:args.limit]
+    model = ServingModel(manifest)
+    model.load(workers=0)
+
+    correct = 0
+    confusions = Counter()
+    for path, label in zip(paths, labels):
+        with open(path, "rb") as f:
+            result = await classify_image(DecodedImage(f.read()), model)
+        expected = categories[label]
+        if result["category"] == expected:
+            correct += 1
+        else:
+            confusions[f"{expected}→{result['category']}"] += 1
+
+    stats = model.stats()
+    metrics = {
+        "eval_accuracy": round(correct / len(paths), 4) if paths else None,
+        "eval_images": len(paths),
+        "eval_dataset": os.path.abspath(args.dataset_path),
+        "eval_latency_p50_ms": stats["latency_p50_ms"],
+        "eval_latency_p95_ms": stats["latency_p95_ms"],
+        "eval_other_rate": stats["other_rate"],
+        "evaluated_at": datetime.utcnow(),
+    }
+    if manifest["artifact"]:
+        model_registry.record_metrics(args.version, metrics)
+    print(json.dumps({
+        "version": args.version, **metrics, "top_confusions": dict(confusions.most_common(10))
+    }, indent=2, default=str))
+
+
+def activate(args):
+    if model_registry.get_manifest(args.version) is None:
+        raise SystemExit(f"Unknown model version {args.version}")
+    model_registry.save_serving(args.version)
+    asyncio.run(model_registry.publish_serving(get_db(), args.version))
+    print(f"{args.version} published – running API processes load it now, new ones start with it")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="registered versions with their manifests and metrics")
+
+    p_register = sub.add_parser("register", help="add / refresh the manifest of a model file in MODEL_DIR")
+    p_register.add_argument("artifact")
+
+    p_eval = sub.add_parser("evaluate", help="category accuracy + latency on a labelled folder")
+    p_eval.add_argument("version")
+    p_eval.add_argument("dataset_path", help="folder per fashion category (shirt/, dress/, traditional/, ...)")
+    p_eval.add_argument("--limit", type=int, help="only the first N images")
+
+    p_activate = sub.add_parser("activate", help="serve this version on every API process")
+    p_activate.add_argument("version")
+
+    args = parser.parse_args()
+    if args.command == "evaluate":
+        asyncio.run(evaluate(args))
+    else:
+        {"list": list_models, "register": register, "activate": activate}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# backend/jobs/reembed.py
+"""
+Re-embed (and re-classify) stored wardrobe items with a new model, e.g.
+after fine_tune_model. Old and new embeddings live in different spaces, so
+search only compares items tagged with the serving model version.
+
+    cd backend
+    python -m jobs.reembed status
+    python -m jobs.reembed run --model-path models/finetuned-20261018-120000.h5 --workers 4
+    # then POST /api/admin/models/finetuned-20261018-120000/activate and run
+    # the same command once more to pick up items enriched in between
+
+Items are streamed in _id order; images come from the storage backend (or
+--image-cache, filled on first fetch so re-runs don't download again), and
+inference runs batched in an InferencePool of worker processes. Progress is
+checkpointed per batch, so the job can be stopped and re-run.
+
+Embeddings are stored in the active codec (EMBEDDING_CODEC_ID). A PCA/PQ
+codec trained on the old model's vectors still works, but retraining it on
+the new ones (jobs.backfill_codec) usually recovers some recall.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pymongo import UpdateOne
+
+from ai_utils import categorize, classification_result
+from embedding_codec import get_active_codec
+from fashion_head import load_head
+from image_utils import DecodedImage
+from inference_pool import InferencePool
+from jobs.common import clear_checkpoint, get_db, load_checkpoint, save_checkpoint
+from model_version import DEFAULT_MODEL_VERSION, class_names_for, stale_filter, version_for_path
+from services.resource_versions import CLOSET, bump_versions
+from storage_utils import close_storage, get_storage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("FashionAI")
+
+FETCH_CONCURRENCY = 16
+PROJECTION = {"user_id": 1, "image_url": 1, "content_hash": 1, "color": 1, "colors_palette": 1}
+
+
+# ========== IMAGES ==========
+async def load_image(doc: Dict[str, Any], cache_dir: Optional[str]) -> bytes:
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, f"{doc.get('content_hash') or doc['_id']}.jpg")
+        if os.path.exists(path):
+            return await asyncio.to_thread(_read_file, path)
+    image_bytes = await get_storage().get(doc["image_url"])
+    if path:
+        await asyncio.to_thread(_write_file, path, image_bytes)
+    return image_bytes
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _decode(image_bytes: bytes) -> np.ndarray:
+    return DecodedImage(image_bytes).rgb224
+
+
+async def _prepare(doc: Dict[str, Any], cache_dir: Optional[str], semaphore: asyncio.Semaphore) -> np.ndarray:
+    async with semaphore:
+        image_bytes = await load_image(doc, cache_dir)
+    return await asyncio.to_thread(_decode, image_bytes)
+
+
+# ========== BATCHES ==========
+async def _process_batch(db, pool: InferencePool, docs: List[Dict], args, version: str, labels, head) -> Dict[str, int]:
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+    images = await asyncio.gather(*(_prepare(doc, args.image_cache, semaphore) for doc in docs), return_exceptions=True)
+    ready = [(doc, rgb) for doc, rgb in zip(docs, images) if not isinstance(rgb, Exception)]
+    for doc, rgb in zip(docs, images):
+        if isinstance(rgb, Exception):
+            logger.warning(f"Skipping {doc['_id']}: could not load image ({rgb})")
+
+    # All submitted at once – the workers run them as micro-batches
+    outputs = await asyncio.gather(*(pool.infer(rgb) for _, rgb in ready), return_exceptions=True)
+
+    codec = get_active_codec()
+    now = datetime.utcnow()
+    ops = []
+    for (doc, _), output in zip(ready, outputs):
+        if isinstance(output, Exception):
+            logger.warning(f"Skipping {doc['_id']}: inference failed ({output})")
+            continue
+        probs, embedding = output
+        update = {
+            "features": codec.encode_one(embedding),
+            "codec_id": codec.codec_id,
+            "model_version": version,
+            "updated_at": now,
+        }
+        if args.reclassify:
+            # Colors don't depend on the model – keep the stored palette, redo what follows from the category
+            color = doc.get("color") or "#95a5a6"
+            result = classification_result(*categorize(probs, labels, head, embedding), color,
+                                           doc.get("colors_palette") or [color], pattern_fallback=head is None)
+            update.update({k: result[k] for k in ("category", "style", "material", "seasonality")})
+        # Filter on the old version again so an item re-enriched meanwhile isn't overwritten
+        ops.append(UpdateOne({"_id": doc["_id"], **stale_filter(version)}, {"$set": update}))
+
+    written = 0
+    if ops:
+        written = (await db.wardrobe_items.bulk_write(ops, ordered=False)).modified_count
+        if args.reclassify:
+            # Categories / styles changed → their analytics and trend matches are stale
+            await bump_versions(db, {doc["user_id"] for doc, _ in ready if doc.get("user_id")}, CLOSET)
+    return {"done": written, "failed": len(docs) - len(ops)}
+
+
+async def run(db, args):
+    version = args.version or version_for_path(args.model_path)
+    labels = class_names_for(args.model_path)
+    head = load_head(version)   # trained with jobs.fashion_head, else ImageNet label matching
+    job_name = f"reembed:{version}"
+    checkpoint = None if args.restart else await load_checkpoint(db, job_name)
+
+    query = {"image_url": {"$exists": True}, "status": {"$ne": "pending"}, **stale_filter(version)}
+    stats = {"done": 0, "failed": 0}
+    if checkpoint:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+        stats = {"done": checkpoint.get("done", 0), "failed": checkpoint.get("failed", 0)}
+        logger.info(f"Resuming after {checkpoint['last_id']} ({stats['done']} done)")
+    if args.image_cache:
+        os.makedirs(args.image_cache, exist_ok=True)
+
+    total = await db.wardrobe_items.count_documents(query)
+    logger.info(f"Re-embedding {total} items with model {version} ({args.workers} workers)")
+    pool = InferencePool(workers=args.workers, slots=args.slots, model_path=args.model_path)
+    await asyncio.to_thread(pool.start)
+    started = datetime.utcnow()
+    try:
+        cursor = db.wardrobe_items.find(query, PROJECTION).sort("_id", 1).batch_size(args.batch)
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= args.batch:
+                await _finish_batch(db, pool, batch, args, version, labels, head, job_name, stats, started)
+                batch = []
+        if batch:
+            await _finish_batch(db, pool, batch, args, version, labels, head, job_name, stats, started)
+    finally:
+        pool.stop()
+        await close_storage()
+    await clear_checkpoint(db, job_name)
+    logger.info(f"Re-embedding complete: {stats['done']} items now on {version}, {stats['failed']} skipped")
+
+
+async def _finish_batch(db, pool, batch, args, version, labels, head, job_name, stats, started) -> None:
+    result = await _process_batch(db, pool, batch, args, version, labels, head)
+    stats["done"] += result["done"]
+    stats["failed"] += result["failed"]
+    await save_checkpoint(db, job_name, batch[-1]["_id"], **stats)
+    rate = stats["done"] / max((datetime.utcnow() - started).total_seconds(), 1e-6)
+    logger.info(f"{stats['done']} items re-embedded, {stats['failed']} skipped ({rate:.1f} items/s)")
+
+
+async def status(db, args):
+    counts = await db.wardrobe_items.aggregate([
+        {"$group": {"_id": {"$ifNull": ["$model_version", DEFAULT_MODEL_VERSION]}, "items": {"$sum": 1}}},
+        {"$sort": {"items": -1}}
+    ]).to_list(None)
+    checkpoints = await db.job_checkpoints.find({"_id": {"$regex": "^reembed:"}}).to_list(None)
+    print(json.dumps({
+        "items_by_model_version": {c["_id"]: c["items"] for c in counts},
+        "checkpoints": checkpoints
+    }, indent=2, default=str))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed / re-classify wardrobe items with a new model")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("status", help="item counts per model version and unfinished runs")
+
+    p_run = sub.add_parser("run", help="re-embed every item not yet on this model version")
+    p_run.add_argument("--model-path", help="fine-tuned model file (default: stock ImageNet MobileNetV2)")
+    p_run.add_argument("--version", help="version tag to store (default: from the model's metadata / file name)")
+    p_run.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    p_run.add_argument("--slots", type=int, default=16, help="shared-memory slots (max micro-batch) per worker")
+    p_run.add_argument("--batch", type=int, default=256, help="items per MongoDB batch / checkpoint")
+    p_run.add_argument("--no-reclassify", dest="reclassify", action="store_false",
+                       help="only replace embeddings, keep stored categories")
+    p_run.add_argument("--image-cache", help="directory for downloaded images, reused on re-runs")
+    p_run.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+
+    args = parser.parse_args()
+    db = get_db()
+    asyncio.run({"run": run, "status": status}[args.command](db, args))
+
+
+if __name__ == "__main__":
+    main()
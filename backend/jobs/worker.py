@@ -0,0 +1,35 @@
+# backend/jobs/worker.py
+"""
+Stand-alone enrichment worker process (instead of / in addition to the
+worker tasks inside the API process).
+
+    cd backend
+    JOB_WORKERS=0 uvicorn main:app --workers 4     # API only accepts uploads
+    python -m jobs.worker --concurrency 2          # one or more of these do the heavy lifting
+"""
+import argparse
+import asyncio
+import logging
+
+import services.enrichment  # registers the enrich_item job handler
+from jobs.common import get_db
+from services.job_queue import ensure_indexes, start_workers
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def run(concurrency: int):
+    db = get_db()
+    await ensure_indexes(db)
+    await asyncio.gather(*start_workers(db, concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background job worker")
+    parser.add_argument("--concurrency", type=int, default=2, help="worker tasks in this process")
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# backend/json_utils.py
+from datetime import date, datetime
+from typing import Any
+
+import numpy as np
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+# NumPy arrays (any dtype orjson supports), datetimes and non-str dict keys are
+# serialised natively in C; json_default only sees what orjson can't handle.
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def json_default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, np.generic):          # np.float16, np.bool_, ... not covered natively
+        return obj.item()
+    if isinstance(obj, np.ndarray):          # non-contiguous / unsupported dtype
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=json_default, option=ORJSON_OPTIONS)
+
+
+class NumpyJSONResponse(JSONResponse):
+    """
+    One-pass JSON response that understands NumPy, ObjectId and datetime.
+
+    Default response class of the app. Routes that build dicts holding NumPy
+    values should *return an instance* (`return NumpyJSONResponse({...})`):
+    a plain dict goes through FastAPI's jsonable_encoder first, which walks
+    the whole payload in Python again.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
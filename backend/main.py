@@ -1,17 +1,39 @@
 # backend/main.py
 import os
+import asyncio
+import time
 from datetime import datetime
 from typing import Optional
 
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.staticfiles import StaticFiles
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 
 # Import routes
 from routes.auth import router as auth_router
 from routes.wardrobe import router as wardrobe_router
+from routes.admin import router as admin_router
+from services.admission import Overloaded, inference_admission
+from services.catalog_search import get_catalog_index
+from services.index_snapshots import snapshot_loop
+from services.inference_cache import ensure_indexes as ensure_inference_cache_indexes, inference_cache
+from services.invalidation import (
+    INVALIDATION_ENABLED, ensure_indexes as ensure_invalidation_indexes, invalidation_loop, invalidation_stats
+)
+from services.job_queue import JOB_WORKERS, ensure_indexes as ensure_job_indexes, queue_stats, start_workers
+from services.shared_cache import shared_cache
+from services.enrichment import (  # also registers the enrich_item job handler
+    ensure_indexes as ensure_enrichment_indexes, stranded_items_loop
+)
+from json_utils import NumpyJSONResponse
+from profiling import PROFILING_ENABLED, ProfilingMiddleware
+from metrics import METRICS_ENABLED, http_request_duration, http_requests_in_flight, mongo_event_listeners, registry, route_label
+from services.metrics_collectors import register_collectors
+from model_registry import model_registry
+from storage_utils import IMMUTABLE_CACHE_CONTROL, LOCAL_STORAGE_DIR, STORAGE_BACKEND, close_storage
 
 load_dotenv()
 
@@ -22,6 +44,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
+    default_response_class=NumpyJSONResponse,
 )
 
 # ── CORS Configuration ───────────────────────────────────────────────────────
@@ -40,9 +63,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ── Request Metrics ──────────────────────────────────────────────────────────
+# Only installed when METRICS_ENABLED – otherwise requests don't pay for it at all
+if METRICS_ENABLED:
+    register_collectors()
+
+    @app.middleware("http")
+    async def record_request_metrics(request: Request, call_next):
+        start = time.perf_counter()
+        http_requests_in_flight.inc()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            http_requests_in_flight.dec()
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                method=request.method,
+                route=route_label(request.scope),
+                status=status_code
+            )
+
+# ── Request Profiling (opt-in) ───────────────────────────────────────────────
+# X-Profile: 1 + X-Admin-Token, or every PROFILE_SAMPLE_EVERY-th request → /api/admin/profiles
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # ── Global MongoDB Client ────────────────────────────────────────────────────
 client: Optional[AsyncIOMotorClient] = None
 DATABASE_NAME = "wardrobe_ai_kenya"
+background_tasks: list = []
 
 @app.on_event("startup")
 async def startup_db_client():
@@ -54,7 +106,7 @@ async def startup_db_client():
 
     try:
         print("Connecting to MongoDB...")
-        client = AsyncIOMotorClient(mongo_uri)
+        client = AsyncIOMotorClient(mongo_uri, event_listeners=mongo_event_listeners())
         # Test connection
         await client.admin.command("ping")
         app.state.db = client[DATABASE_NAME]
@@ -63,10 +115,39 @@ async def startup_db_client():
         print(f"Failed to connect to MongoDB: {str(e)}")
         raise
 
+    await ensure_inference_cache_indexes(app.state.db)
+    await ensure_job_indexes(app.state.db)
+    await ensure_enrichment_indexes(app.state.db)
+    await ensure_invalidation_indexes(app.state.db)
+
+    # Background enrichment workers (JOB_WORKERS=0 → run `python -m jobs.worker` separately)
+    background_tasks.extend(start_workers(app.state.db, JOB_WORKERS))
+    # Items whose enqueue never happened (process died right after insert) get queued again
+    background_tasks.append(asyncio.create_task(stranded_items_loop(app.state.db)))
+
+    # FAISS: warm the catalog index from its snapshot (+ delta replay) and keep snapshotting / compacting
+    background_tasks.append(asyncio.create_task(get_catalog_index(app.state.db)))
+    background_tasks.append(asyncio.create_task(snapshot_loop(app.state.db)))
+
+    # Writes from other workers/nodes → this process's caches (change stream, or polling on a standalone mongod)
+    if INVALIDATION_ENABLED:
+        background_tasks.append(asyncio.create_task(invalidation_loop(app.state.db)))
+
+    # Serving model from the registry, in worker processes if INFERENCE_WORKERS > 0
+    await model_registry.start(app.state.db)
+
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     global client
+    for task in background_tasks:
+        task.cancel()
+    if background_tasks:
+        # Let their cleanup (e.g. releasing the invalidation slot) run before the client closes
+        await asyncio.wait(background_tasks, timeout=5)
+    await close_storage()
+    await shared_cache.close()
+    model_registry.stop()
     if client:
         client.close()
         print("MongoDB connection closed gracefully.")
@@ -75,6 +156,18 @@ async def shutdown_db_client():
 # ── Include Routers ──────────────────────────────────────────────────────────
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(wardrobe_router, prefix="/api/wardrobe", tags=["Wardrobe"])
+app.include_router(admin_router, prefix="/api/admin", tags=["Admin"])
+
+# Local storage backend (dev / tests): serve stored images the way Cloudinary would
+class ImmutableStaticFiles(StaticFiles):
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+if STORAGE_BACKEND == "local":
+    os.makedirs(LOCAL_STORAGE_DIR, exist_ok=True)
+    app.mount("/media", ImmutableStaticFiles(directory=LOCAL_STORAGE_DIR), name="media")
 
 
 # ── Root & Health Check ──────────────────────────────────────────────────────
@@ -97,12 +190,39 @@ async def health_check():
         content={
             "status": "healthy",
             "database": db_status,
+            "inference_cache": inference_cache.stats(),
+            "job_queue": await queue_stats(app.state.db),
+            "admission": inference_admission.stats(),
+            "invalidation": invalidation_stats(),
+            "cache": shared_cache.stats(),
             "timestamp": datetime.utcnow().isoformat()
         },
         status_code=status.HTTP_200_OK
     )
 
 
+@app.get("/metrics", tags=["General"], include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition format (request latency, pipeline stages, MongoDB, cache, job queue)"""
+    if not METRICS_ENABLED:
+        return PlainTextResponse("# metrics disabled (METRICS_ENABLED=0)\n", status_code=status.HTTP_404_NOT_FOUND)
+    return PlainTextResponse(
+        await registry.render(getattr(app.state, "db", None)),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# ── Load Shedding ────────────────────────────────────────────────────────────
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Inference admission control said no – fail fast and tell the client when to come back"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, please retry shortly", "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # ── Global Exception Handler (optional – nice for production) ────────────────
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -0,0 +1,240 @@
+# backend/metrics.py
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+# ========== CONFIGURATION ==========
+# METRICS_ENABLED=0 → spans are a shared nullcontext, no middleware, no Mongo listener
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+LabelKey = Tuple[str, ...]
+
+
+# ========== METRIC TYPES ==========
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_str(self, key: LabelKey, extra: str = "") -> str:
+        parts = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, value: float, **labels) -> None:
+        """Mirror a count kept elsewhere (e.g. InferenceCache.stats())."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._label_str(k)} {_fmt(v)}" for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # key → [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][idx] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else _fmt(bound)
+                    le_label = f'le="{le}"'
+                    lines.append(f"{self.name}_bucket{self._label_str(key, le_label)} {cumulative}")
+                lines.append(f"{self.name}_sum{self._label_str(key)} {_fmt(total)}")
+                lines.append(f"{self.name}_count{self._label_str(key)} {count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# ========== REGISTRY ==========
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[Any], Awaitable[None]]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def register_collector(self, collector: Callable[[Any], Awaitable[None]]) -> None:
+        """`async def collector(db)` run on every scrape to refresh mirrored values."""
+        self._collectors.append(collector)
+
+    async def render(self, db=None) -> str:
+        for collector in self._collectors:
+            try:
+                await collector(db)
+            except Exception:
+                pass  # a failing collector shouldn't take /metrics down
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+http_requests_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being handled")
+stage_duration = registry.histogram(
+    "stage_duration_seconds", "Time spent in named pipeline stages", ("stage",), buckets=FAST_BUCKETS + (2.5, 5.0, 10.0)
+)
+stage_errors = registry.counter("stage_errors_total", "Exceptions raised inside named stages", ("stage",))
+mongo_command_duration = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ("command", "collection"), buckets=FAST_BUCKETS
+)
+mongo_command_errors = registry.counter("mongodb_command_errors_total", "Failed MongoDB commands", ("command",))
+
+
+# ========== SPANS ==========
+_NULL_SPAN = nullcontext()
+
+
+@contextmanager
+def _timed_span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        stage_duration.observe(time.perf_counter() - start, stage=stage)
+
+
+def span(stage: str):
+    """`with span("kmeans"): ...` – records into stage_duration_seconds{stage=...}."""
+    return _timed_span(stage) if METRICS_ENABLED else _NULL_SPAN
+
+
+def timed(stage: str):
+    """Decorator form of span() for sync and async functions. A no-op when metrics are disabled."""
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _timed_span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _timed_span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ========== MONGODB ==========
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener (motor uses pymongo underneath). Pass via event_listeners=[...]."""
+
+    def __init__(self):
+        self._collections: Dict[Tuple[int, int], str] = {}
+
+    def started(self, event):
+        command = event.command
+        collection = command.get(event.command_name)
+        self._collections[(event.request_id, event.operation_id)] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.request_id, event.operation_id), "")
+        mongo_command_duration.observe(event.duration_micros / 1e6, command=event.command_name, collection=collection)
+
+    def failed(self, event):
+        self._collections.pop((event.request_id, event.operation_id), None)
+        mongo_command_errors.inc(command=event.command_name)
+
+
+def mongo_event_listeners() -> List[monitoring.CommandListener]:
+    return [MongoCommandMetrics()] if METRICS_ENABLED else []
+
+
+def route_label(scope: Dict[str, Any]) -> str:
+    """Route template ("/api/wardrobe/{item_id}/status"), not the raw path – keeps label cardinality bounded."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -0,0 +1,401 @@
+# backend/model_registry.py
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter as CategoryCounter, deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from fashion_head import FashionHead, head_summary, load_head
+from inference_pool import EMBEDDING_DIM, INFERENCE_WORKERS, NUM_CLASSES, InferencePool, model_heads
+from metrics import FAST_BUCKETS, registry as metrics_registry
+from model_version import (
+    DEFAULT_MODEL_VERSION, MODEL_DIR, MODEL_PATH, MODEL_VERSION, load_model_metadata, save_model_metadata, version_for_path
+)
+from services.invalidation import Invalidation, on_invalidation
+
+logger = logging.getLogger(__name__)
+
+# ========== CONFIGURATION ==========
+# models/<version>.h5 + models/<version>.json (manifest) – registry.json remembers what's serving
+REGISTRY_FILE = "registry.json"
+# model_serving document every API process follows (registry.json is per node, this is per cluster)
+SERVING_DOC_ID = "serving"
+MODEL_EXTENSIONS = (".h5", ".keras")
+LATENCY_WINDOW = 1000           # recent forward passes kept per version for /api/admin/models
+RETIRE_TIMEOUT_SECONDS = 120    # how long a swapped-out model waits for in-flight requests
+
+model_inference_duration = metrics_registry.histogram(
+    "model_inference_seconds", "Forward pass latency by model version", ("version",),
+    buckets=FAST_BUCKETS + (2.5, 5.0)
+)
+model_predictions = metrics_registry.counter(
+    "model_predictions_total", "Classifications by model version and category", ("version", "category")
+)
+model_serving = metrics_registry.gauge("model_serving", "1 for the model version currently serving", ("version",))
+
+BUILTIN_MANIFEST = {
+    "version": DEFAULT_MODEL_VERSION,
+    "artifact": None,               # Keras ImageNet weights
+    "class_names": None,            # ImageNet labels via decode_predictions
+    "num_classes": NUM_CLASSES,
+    "embedding_dim": EMBEDDING_DIM,
+    "metrics": {},
+}
+
+
+# ========== SERVING MODEL ==========
+class ServingModel:
+    """
+    One loaded model version. Requests take a reference (ModelRegistry.use)
+    and keep it for their whole lifetime, so a swap never changes the model
+    under a running request – the old one is only released once it's idle.
+    """
+
+    def __init__(self, manifest: Dict[str, Any]):
+        self.manifest = manifest
+        self.version: str = manifest["version"]
+        self.class_names: Optional[List[str]] = manifest.get("class_names")
+        self.embedding_dim: int = manifest.get("embedding_dim", EMBEDDING_DIM)
+        self.pool: Optional[InferencePool] = None
+        self._model = None
+        self.head: Optional[FashionHead] = None
+        self.inflight = 0
+        self.loaded_at: Optional[datetime] = None
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.categories: CategoryCounter = CategoryCounter()
+
+    def load(self, workers: int = 0) -> None:
+        """Blocking: load the artifact (in-process or in a worker pool) and run a warm-up pass."""
+        artifact = self.manifest.get("artifact")
+        if workers > 0:
+            self.pool = InferencePool(workers=workers, model_path=artifact)
+            self.pool.start()   # workers warm up before reporting ready
+        else:
+            import tensorflow as tf
+            from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
+            base = tf.keras.models.load_model(artifact) if artifact else MobileNetV2(weights="imagenet")
+            # Probabilities and pooled embedding from one forward pass
+            self._model = tf.keras.Model(inputs=base.input, outputs=model_heads(base))
+            self._predict_local(np.zeros((224, 224, 3), dtype=np.uint8))
+        self.load_head()
+        self.loaded_at = datetime.utcnow()
+
+    def load_head(self) -> None:
+        """Fashion category head trained on this version's embeddings (jobs.fashion_head), if there is one."""
+        head = load_head(self.version)
+        if head is not None and head.dim != self.embedding_dim:
+            logger.warning(f"Fashion head for {self.version} expects {head.dim}-d embeddings, model gives "
+                           f"{self.embedding_dim}-d – ignoring it")
+            head = None
+        self.head = head
+
+    @property
+    def classification_key(self) -> str:
+        """Inference-cache field for classifications – a retrained head must not reuse the old ones."""
+        return f"classification-{self.head.head_id}" if self.head else "classification"
+
+    def _predict_local(self, rgb224: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+        # preprocess_input works in place on float arrays → fresh float copy per call
+        x = preprocess_input(np.expand_dims(rgb224.astype(np.float32), axis=0))
+        probs, embedding = self._model(x, training=False)
+        return probs.numpy()[0], embedding.numpy()[0]
+
+    async def predict(self, decoded) -> Tuple[np.ndarray, np.ndarray]:
+        """(probabilities, embedding) for a DecodedImage – computed once per image and version."""
+        cached = decoded.model_outputs
+        if cached is not None and cached[0] == self.version:
+            return cached[1], cached[2]
+        self.inflight += 1
+        start = time.perf_counter()
+        try:
+            if self.pool is not None:
+                probs, embedding = await self.pool.infer(decoded.rgb224)
+            else:
+                # Off the event loop – TF releases the GIL during the forward pass
+                probs, embedding = await asyncio.to_thread(self._predict_local, decoded.rgb224)
+        finally:
+            self.inflight -= 1
+        elapsed = time.perf_counter() - start
+        self.latencies.append(elapsed)
+        model_inference_duration.observe(elapsed, version=self.version)
+        decoded.model_outputs = (self.version, probs, embedding)
+        return probs, embedding
+
+    def record_category(self, category: str) -> None:
+        self.categories[category] += 1
+        model_predictions.inc(version=self.version, category=category)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = np.array(self.latencies) * 1000
+        total = sum(self.categories.values())
+        return {
+            "loaded_at": self.loaded_at,
+            "workers": self.pool.workers if self.pool else 0,
+            "pool": self.pool.stats() if self.pool else None,
+            "fashion_head": self.head.head_id if self.head else None,
+            "inflight": self.inflight,
+            "predictions": len(self.latencies),
+            "latency_p50_ms": round(float(np.percentile(latencies, 50)), 1) if len(latencies) else None,
+            "latency_p95_ms": round(float(np.percentile(latencies, 95)), 1) if len(latencies) else None,
+            # Share of items nothing matched – a cheap online proxy for classifier quality
+            "other_rate": round(self.categories["other"] / total, 3) if total else None,
+            "categories": dict(self.categories.most_common()),
+        }
+
+    async def retire(self, timeout: float = RETIRE_TIMEOUT_SECONDS) -> None:
+        deadline = time.monotonic() + timeout
+        while self.inflight > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self.inflight > 0:
+            logger.warning(f"Retiring model {self.version} with {self.inflight} requests still in flight")
+        if self.pool is not None:
+            await asyncio.to_thread(self.pool.stop)
+        self._model = None
+        logger.info(f"Model {self.version} retired")
+
+
+# ========== REGISTRY ==========
+class ModelRegistry:
+    """
+    Versioned models on local disk. Each version is an artifact plus a JSON
+    manifest (label map, embedding dimension, training/evaluation metrics) –
+    the sidecar fine_tuning.train already writes. The stock ImageNet model
+    is always available as DEFAULT_MODEL_VERSION.
+
+    A swap is published in the `model_serving` collection. Every other API
+    process sees it through the invalidation bus and follows: it loads the
+    same version, or reloads its fashion head when the serving version is
+    re-activated. Model files are expected on every node (shared MODEL_DIR).
+    """
+
+    def __init__(self, directory: str = MODEL_DIR, workers: int = INFERENCE_WORKERS):
+        self.directory = directory
+        self.workers = workers
+        self._serving: Optional[ServingModel] = None
+        self._swap_lock = asyncio.Lock()
+        self._listeners: List[Callable[[str], Any]] = []
+        self._activation: Optional[str] = None     # id of the last serving document applied here
+        self._follow_task: Optional[asyncio.Task] = None
+
+    # ---- manifests ----
+    def _artifacts(self) -> List[str]:
+        return sorted(p for p in glob.glob(os.path.join(self.directory, "*")) if p.endswith(MODEL_EXTENSIONS))
+
+    def list_manifests(self) -> List[Dict[str, Any]]:
+        manifests = [{**BUILTIN_MANIFEST, "fashion_head": head_summary(DEFAULT_MODEL_VERSION)}]
+        for path in self._artifacts():
+            meta = load_model_metadata(path)
+            manifests.append({
+                **BUILTIN_MANIFEST,
+                "metrics": {},
+                **meta,
+                "version": version_for_path(path),
+                "artifact": path,
+                "num_classes": len(meta["class_names"]) if meta.get("class_names") else NUM_CLASSES,
+                "fashion_head": head_summary(version_for_path(path)),
+            })
+        return manifests
+
+    def get_manifest(self, version: str) -> Optional[Dict[str, Any]]:
+        return next((m for m in self.list_manifests() if m["version"] == version), None)
+
+    def register(self, artifact: str, metrics: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Add (or update) the manifest of a model file that is already in the registry directory."""
+        meta = load_model_metadata(artifact)
+        meta.setdefault("version", version_for_path(artifact))
+        meta.setdefault("embedding_dim", EMBEDDING_DIM)
+        meta.setdefault("registered_at", datetime.utcnow())
+        meta["metrics"] = {**meta.get("metrics", {}), **(metrics or {})}
+        save_model_metadata(artifact, meta)
+        return self.get_manifest(meta["version"])
+
+    def record_metrics(self, version: str, metrics: Dict[str, Any]) -> None:
+        manifest = self.get_manifest(version)
+        if manifest is None or manifest["artifact"] is None:
+            raise KeyError(version)
+        self.register(manifest["artifact"], metrics)
+
+    # ---- serving ----
+    def _registry_path(self) -> str:
+        return os.path.join(self.directory, REGISTRY_FILE)
+
+    def _initial_version(self, shared: Optional[str] = None) -> str:
+        """MODEL_PATH wins, then the cluster's serving version, then the last one activated here, then stock ImageNet."""
+        if MODEL_PATH:
+            return MODEL_VERSION
+        if shared:
+            return shared
+        try:
+            with open(self._registry_path()) as f:
+                return json.load(f).get("serving") or DEFAULT_MODEL_VERSION
+        except FileNotFoundError:
+            return DEFAULT_MODEL_VERSION
+
+    def save_serving(self, version: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._registry_path(), "w") as f:
+            json.dump({"serving": version, "activated_at": datetime.utcnow().isoformat()}, f, indent=2)
+
+    def _resolve(self, version: str) -> Dict[str, Any]:
+        manifest = self.get_manifest(version)
+        if manifest is None and MODEL_PATH and version == MODEL_VERSION:
+            manifest = {**BUILTIN_MANIFEST, **load_model_metadata(MODEL_PATH), "version": version, "artifact": MODEL_PATH}
+        if manifest is None:
+            logger.error(f"Model version '{version}' not found in {self.directory}, serving {DEFAULT_MODEL_VERSION}")
+            manifest = dict(BUILTIN_MANIFEST)
+        return manifest
+
+    def current(self) -> ServingModel:
+        """Model for new requests. Loads in-process on first use if start() hasn't run (CLIs, benchmarks)."""
+        if self._serving is None:
+            model = ServingModel(self._resolve(self._initial_version()))
+            model.load(workers=0)
+            self._activate(model)
+        return self._serving
+
+    def current_version(self) -> str:
+        return self._serving.version if self._serving else self._initial_version()
+
+    @asynccontextmanager
+    async def use(self):
+        """`async with model_registry.use() as model:` – pins one version for a whole request."""
+        model = self.current()
+        model.inflight += 1
+        try:
+            yield model
+        finally:
+            model.inflight -= 1
+
+    def on_swap(self, listener: Callable[[str], Any]) -> None:
+        """`listener(version)` runs (on the event loop) whenever a different version starts serving."""
+        self._listeners.append(listener)
+
+    def _activate(self, model: ServingModel) -> None:
+        previous = self._serving
+        self._serving = model   # single reference swap – new requests see the new model from here
+        if previous is not None:
+            model_serving.set(0, version=previous.version)
+        model_serving.set(1, version=model.version)
+        if previous is None or previous.version != model.version:
+            for listener in self._listeners:
+                try:
+                    listener(model.version)
+                except Exception as e:
+                    logger.warning(f"Model swap listener failed: {e}")
+
+    async def start(self, db=None) -> None:
+        """App startup: load the initial version (worker pool if INFERENCE_WORKERS) off the event loop."""
+        if self._serving is not None and (self._serving.pool is not None or self.workers == 0):
+            return
+        shared = await db.model_serving.find_one({"_id": SERVING_DOC_ID}) if db is not None else None
+        if shared is not None:
+            self._activation = shared["activation_id"]
+        model = ServingModel(self._resolve(self._initial_version(shared and shared["version"])))
+        await asyncio.to_thread(model.load, self.workers)
+        previous = self._serving
+        self._activate(model)
+        if previous is not None:
+            asyncio.create_task(previous.retire())
+
+    async def publish_serving(self, db, version: str) -> None:
+        """Make every API process serve `version` (or reload its fashion head, if it already does)."""
+        self._activation = uuid.uuid4().hex     # applied here already – our own change is skipped
+        await db.model_serving.update_one(
+            {"_id": SERVING_DOC_ID},
+            {"$set": {"version": version, "activation_id": self._activation, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def follow(self, db) -> None:
+        """Apply the published serving document if it's newer than what this process runs."""
+        doc = await db.model_serving.find_one({"_id": SERVING_DOC_ID})
+        if doc is None or doc["activation_id"] == self._activation:
+            return
+        self._activation = doc["activation_id"]
+        try:
+            result = await self.swap(doc["version"])
+        except KeyError:
+            logger.error(f"Model {doc['version']} was activated elsewhere but isn't in {self.directory} here")
+            return
+        except Exception as e:
+            logger.error(f"Could not follow activation of model {doc['version']}: {e}")
+            return
+        logger.info(f"Following model activation: serving {result['serving']}, "
+                    f"fashion head {result['fashion_head']}")
+
+    async def swap(self, version: str, db=None) -> Dict[str, Any]:
+        """
+        Load + warm up `version` next to the serving model, switch new requests
+        over atomically, and retire the old one once its requests are done.
+        With `db` the activation is published to the other API processes.
+        """
+        result = await self._swap(version)
+        if db is not None:
+            await self.publish_serving(db, version)
+        return result
+
+    async def _swap(self, version: str) -> Dict[str, Any]:
+        async with self._swap_lock:
+            manifest = self.get_manifest(version)
+            if manifest is None:
+                raise KeyError(version)
+            previous = self.current()
+            if previous.version == version:
+                # Re-activating the serving version picks up a newly trained fashion head
+                await asyncio.to_thread(previous.load_head)
+                return {"serving": version, "previous": version, "warmup_ms": 0.0,
+                        "fashion_head": previous.head.head_id if previous.head else None}
+            candidate = ServingModel(manifest)
+            start = time.perf_counter()
+            await asyncio.to_thread(candidate.load, self.workers)
+            warmup_ms = (time.perf_counter() - start) * 1000
+            self._activate(candidate)
+            self.save_serving(version)
+            asyncio.create_task(self._retire(previous))
+            logger.info(f"Serving model {version} (was {previous.version}), loaded in {warmup_ms:.0f} ms")
+            return {"serving": version, "previous": previous.version, "warmup_ms": round(warmup_ms, 1),
+                    "fashion_head": candidate.head.head_id if candidate.head else None}
+
+    async def _retire(self, model: ServingModel) -> None:
+        await model.retire()
+        # Keep what the version did while it was serving in its manifest
+        if model.manifest.get("artifact") and model.latencies:
+            stats = model.stats()
+            self.record_metrics(model.version, {"last_serving": {
+                **{k: stats[k] for k in ("predictions", "latency_p50_ms", "latency_p95_ms", "other_rate")},
+                "retired_at": datetime.utcnow(),
+            }})
+
+    def stop(self) -> None:
+        if self._serving is not None and self._serving.pool is not None:
+            self._serving.pool.stop()
+
+    def describe(self) -> Dict[str, Any]:
+        serving = self._serving
+        versions = []
+        for manifest in self.list_manifests():
+            entry = {k: v for k, v in manifest.items() if k != "class_names"}
+            entry["labels"] = len(manifest["class_names"]) if manifest.get("class_names") else "imagenet"
+            entry["serving"] = serving is not None and serving.version == manifest["version"]
+            if entry["serving"]:
+                entry["live"] = serving.stats()
+            versions.append(entry)
+        return {"serving": self.current_version(), "versions": versions}
+
+
+model_registry = ModelRegistry()
+
+
+@on_invalidation("model_serving")
+async def _follow_activation(db, events: List[Invalidation]) -> None:
+    # Loading a model takes a while – don't hold up the other caches' invalidations
+    model_registry._follow_task = asyncio.create_task(model_registry.follow(db))
@@ -0,0 +1,66 @@
+# backend/model_version.py
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+# ========== CONFIGURATION ==========
+# Stored embeddings/classifications are tagged with the model that produced them;
+# untagged items predate this and came from the stock ImageNet MobileNetV2.
+DEFAULT_MODEL_VERSION = "mobilenetv2-imagenet"
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+MODEL_PATH = os.getenv("MODEL_PATH")            # fine-tuned model file, unset → ImageNet weights
+
+
+def version_for_path(path: Optional[str]) -> str:
+    """`models/finetuned-20261018-120000.h5` → `finetuned-20261018-120000` (metadata wins if present)."""
+    if not path:
+        return DEFAULT_MODEL_VERSION
+    meta = load_model_metadata(path)
+    if meta.get("version"):
+        return meta["version"]
+    stem = os.path.splitext(os.path.basename(path.rstrip("/")))[0]
+    # Used inside MongoDB field paths (inference cache) → no dots
+    return re.sub(r"[^A-Za-z0-9_-]", "_", stem)
+
+
+def metadata_path(model_path: str) -> str:
+    return f"{os.path.splitext(model_path.rstrip('/'))[0]}.json"
+
+
+def load_model_metadata(model_path: str) -> Dict[str, Any]:
+    """Sidecar JSON written by fine_tune_model: version, class_names, training info."""
+    try:
+        with open(metadata_path(model_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_model_metadata(model_path: str, meta: Dict[str, Any]) -> None:
+    with open(metadata_path(model_path), "w") as f:
+        json.dump(meta, f, indent=2, default=str)
+
+
+def class_names_for(model_path: Optional[str]) -> Optional[List[str]]:
+    """Output labels of a fine-tuned head; None → ImageNet (decode_predictions)."""
+    if not model_path:
+        return None
+    return load_model_metadata(model_path).get("class_names")
+
+
+def model_version_filter(version: str) -> Dict[str, Any]:
+    """MongoDB filter for items embedded by `version` (untagged items count as the default model)."""
+    if version == DEFAULT_MODEL_VERSION:
+        return {"model_version": {"$in": [None, DEFAULT_MODEL_VERSION]}}
+    return {"model_version": version}
+
+
+def stale_filter(version: str) -> Dict[str, Any]:
+    """The complement: items still embedded by some other model."""
+    if version == DEFAULT_MODEL_VERSION:
+        return {"model_version": {"$nin": [None, DEFAULT_MODEL_VERSION]}}
+    return {"model_version": {"$ne": version}}
+
+
+MODEL_VERSION = os.getenv("MODEL_VERSION") or version_for_path(MODEL_PATH)
@@ -1,6 +1,6 @@
 # backend/models.py
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 from bson import ObjectId
 from datetime import datetime
 
@@ -62,6 +62,11 @@ class WardrobeItem(BaseModel):
     material: str = "unknown"
     seasonality: str = "all-season"
     features: List[float] = Field(default_factory=list)  # FAISS vector as list
+    codec_id: Optional[str] = None    # embedding codec of `features` (None = raw 1280-d)
+    model_version: Optional[str] = None  # model that produced `features` / `category` (None = stock ImageNet)
+    content_hash: Optional[str] = None  # sha256 of the uploaded bytes
+    phash: Optional[str] = None         # 64-bit dHash (hex) for near-duplicate detection
+    phash_bands: List[str] = Field(default_factory=list)  # indexed dHash bands (inference_cache.phash_bands)
     wear_count: int = 0
     last_worn: Optional[datetime] = None
 
@@ -96,6 +101,19 @@ class WardrobeItem(BaseModel):
         None,
         description="Name/contact of recommended local tailor/fundi"
     )
+    is_public: bool = Field(
+        default=False,
+        description="Shared in the public catalog / mitumba listings (catalog-wide visual search)"
+    )
+
+    thumbnails: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Resized copies keyed by longest side in px, e.g. {'128': url, '256': url, '512': url}"
+    )
+
+    # Background enrichment: pending → enriched (or failed)
+    status: str = "enriched"
+    enriched_at: Optional[datetime] = None
 
     # Analytics helper fields
     times_suggested: int = Field(default=0, ge=0)
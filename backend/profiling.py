@@ -0,0 +1,234 @@
+# backend/profiling.py
+import asyncio
+import cProfile
+import glob
+import hmac
+import io
+import itertools
+import json
+import logging
+import os
+import pstats
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:  # optional – falls back to cProfile
+    PyinstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+
+# ========== CONFIGURATION ==========
+# PROFILING_ENABLED=0 (default) → the middleware isn't installed at all
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))   # 1-in-N requests, 0 = header only
+PROFILE_HEADER = "x-profile"
+ADMIN_TOKEN_HEADER = "x-admin-token"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_STORE = os.getenv("PROFILE_STORE", "directory")              # directory | mongo
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "200"))
+PROFILE_TTL_DAYS = int(os.getenv("PROFILE_TTL_DAYS", "7"))
+PYINSTRUMENT_INTERVAL = 0.001
+CPROFILE_TOP_N = 80
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+# ========== TRACE STORES ==========
+class DirectoryTraceStore:
+    """<id>.json metadata + <id>.html / <id>.txt trace, oldest pruned beyond PROFILE_MAX_STORED."""
+
+    def __init__(self, directory: str = PROFILE_DIR, max_stored: int = PROFILE_MAX_STORED):
+        self.directory = directory
+        self.max_stored = max_stored
+
+    def _save(self, trace: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        meta = {k: v for k, v in trace.items() if k != "body"}
+        with open(os.path.join(self.directory, f"{trace['id']}.{trace['extension']}"), "w") as f:
+            f.write(trace["body"])
+        with open(os.path.join(self.directory, f"{trace['id']}.json"), "w") as f:
+            json.dump(meta, f, default=str)
+        for old in self._meta_files()[self.max_stored:]:
+            stem = old[:-len(".json")]
+            for path in glob.glob(f"{stem}.*"):
+                os.remove(path)
+
+    def _meta_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "*.json")), key=os.path.getmtime, reverse=True)
+
+    def _list(self, limit: int) -> List[Dict[str, Any]]:
+        traces = []
+        for path in self._meta_files()[:limit]:
+            with open(path) as f:
+                traces.append(json.load(f))
+        return traces
+
+    def _get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        meta_path = os.path.join(self.directory, f"{os.path.basename(trace_id)}.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            trace = json.load(f)
+        with open(os.path.join(self.directory, f"{trace['id']}.{trace['extension']}")) as f:
+            trace["body"] = f.read()
+        return trace
+
+    async def save(self, db, trace: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._save, trace)
+
+    async def list(self, db, limit: int = 50) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._list, limit)
+
+    async def get(self, db, trace_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, trace_id)
+
+
+class MongoTraceStore:
+    """`profiles` collection, expired after PROFILE_TTL_DAYS."""
+
+    def __init__(self):
+        self._indexed = False
+
+    async def save(self, db, trace: Dict[str, Any]) -> None:
+        if not self._indexed:
+            await db.profiles.create_index("started_at", expireAfterSeconds=PROFILE_TTL_DAYS * 24 * 3600)
+            self._indexed = True
+        await db.profiles.insert_one({"_id": trace["id"], **trace})
+
+    async def list(self, db, limit: int = 50) -> List[Dict[str, Any]]:
+        docs = await db.profiles.find({}, {"body": 0}).sort("started_at", -1).limit(limit).to_list(limit)
+        for doc in docs:
+            doc.pop("_id", None)
+        return docs
+
+    async def get(self, db, trace_id: str) -> Optional[Dict[str, Any]]:
+        doc = await db.profiles.find_one({"_id": trace_id})
+        if doc:
+            doc.pop("_id", None)
+        return doc
+
+
+trace_store = MongoTraceStore() if PROFILE_STORE == "mongo" else DirectoryTraceStore()
+
+
+# ========== PROFILERS ==========
+class _Capture:
+    """
+    pyinstrument (async_mode="enabled") when installed: wall-clock samples,
+    time spent awaiting motor shows up under the awaiting frame. cProfile
+    otherwise: deterministic, but only what runs on the event loop thread
+    (model.predict and cv2.kmeans do; awaits don't).
+    """
+
+    def __init__(self):
+        if PyinstrumentProfiler is not None:
+            self.kind = "pyinstrument"
+            self._profiler = PyinstrumentProfiler(interval=PYINSTRUMENT_INTERVAL, async_mode="enabled")
+        else:
+            self.kind = "cprofile"
+            self._profiler = cProfile.Profile()
+
+    def start(self) -> None:
+        if self.kind == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self) -> None:
+        if self.kind == "pyinstrument":
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def render(self) -> Dict[str, str]:
+        if self.kind == "pyinstrument":
+            return {"format": "html", "extension": "html", "body": self._profiler.output_html()}
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(CPROFILE_TOP_N)
+        return {"format": "text", "extension": "txt", "body": out.getvalue()}
+
+
+# ========== ASGI MIDDLEWARE ==========
+class ProfilingMiddleware:
+    """
+    Profiles a request when it carries `X-Profile: 1` plus a valid
+    `X-Admin-Token`, or when it's the Nth request (PROFILE_SAMPLE_EVERY).
+    One profile at a time per process – a request that would overlap is
+    simply not profiled, which bounds the overhead. The trace id is returned
+    in `X-Profile-Id`; traces are listed under /api/admin/profiles.
+
+    Plain ASGI (not BaseHTTPMiddleware) so the endpoint runs in the same task
+    the profiler is attached to.
+    """
+
+    def __init__(self, app, sample_every: int = PROFILE_SAMPLE_EVERY):
+        self.app = app
+        self.sample_every = sample_every
+        self._counter = itertools.count(1)
+        self._busy = False
+
+    def _trigger(self, scope) -> Optional[str]:
+        headers = dict(scope.get("headers") or [])
+        if headers.get(PROFILE_HEADER.encode()) == b"1":
+            token = headers.get(ADMIN_TOKEN_HEADER.encode())
+            if is_admin_token(token.decode() if token else None):
+                return "header"
+        if self.sample_every and next(self._counter) % self.sample_every == 0:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._busy:
+            return await self.app(scope, receive, send)
+        trigger = self._trigger(scope)
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        self._busy = True
+        trace_id = uuid.uuid4().hex
+        status_code = 500
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", trace_id.encode())]
+            await send(message)
+
+        capture = _Capture()
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        capture.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            capture.stop()
+            duration_ms = (time.perf_counter() - start) * 1000
+            self._busy = False
+            asyncio.create_task(self._store(scope, capture, {
+                "id": trace_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(scope.get("route"), "path", None),
+                "status": status_code,
+                "duration_ms": round(duration_ms, 1),
+                "trigger": trigger,
+                "profiler": capture.kind,
+                "started_at": started_at,
+            }))
+
+    async def _store(self, scope, capture: _Capture, meta: Dict[str, Any]) -> None:
+        """Rendering and storing happens after the response, off the request path."""
+        try:
+            rendered = await asyncio.to_thread(capture.render)
+            db = getattr(scope["app"].state, "db", None)
+            await trace_store.save(db, {**meta, **rendered})
+        except Exception as e:
+            logger.warning(f"Could not store profile {meta['id']}: {e}")
@@ -0,0 +1,75 @@
+# backend/routes/admin.py
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from typing import Optional
+import traceback
+
+from model_registry import model_registry
+from profiling import PROFILING_ENABLED, is_admin_token, trace_store
+
+router = APIRouter(tags=["Admin"])
+
+
+def get_db(request: Request):
+    return request.app.state.db
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Operator endpoints: `X-Admin-Token` must match ADMIN_TOKEN (disabled when it isn't set)"""
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles(
+    limit: int = Query(default=50, ge=1, le=500),
+    db = Depends(get_db)
+):
+    """
+    Recently captured request profiles (newest first), without the trace bodies
+    """
+    return {
+        "success": True,
+        "profiling_enabled": PROFILING_ENABLED,
+        "profiles": await trace_store.list(db, limit)
+    }
+
+
+@router.get("/profiles/{trace_id}", dependencies=[Depends(require_admin)])
+async def get_profile(trace_id: str, db = Depends(get_db)):
+    """
+    One trace: pyinstrument HTML (open in a browser) or cProfile text
+    """
+    trace = await trace_store.get(db, trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if trace["format"] == "html":
+        return HTMLResponse(trace["body"])
+    return PlainTextResponse(trace["body"])
+
+
+@router.get("/models", dependencies=[Depends(require_admin)])
+async def list_models():
+    """
+    Registered model versions (manifest + training/evaluation metrics) and
+    live latency / category stats of the serving one
+    """
+    return {"success": True, **model_registry.describe()}
+
+
+@router.post("/models/{version}/activate", dependencies=[Depends(require_admin)])
+async def activate_model(version: str, db = Depends(get_db)):
+    """
+    Load and warm up `version`, then switch new requests to it. Requests
+    already running finish on the previous model, which is released after.
+    The other API processes follow within seconds (through model_serving).
+    """
+    try:
+        result = await model_registry.swap(version, db=db)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model version '{version}' is not registered")
+    except Exception as e:
+        # The previous model keeps serving
+        print("Model activation error:\n", traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Could not load model {version}: {str(e)}")
+    return {"success": True, **result}
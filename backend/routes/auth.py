@@ -5,12 +5,15 @@ from pydantic import BaseModel, EmailStr, Field
 from motor.motor_asyncio import AsyncIOMotorClient
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+from bson import ObjectId
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import List, Optional
 import os
 import logging
 
-from models import UserCreate, UserInDB, UserOut, Token, TokenData
+from models import UserCreate, UserOut, Token, TokenData
+from services.invalidation import FLUSH, Invalidation, on_invalidation
+from services.shared_cache import shared_cache
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +30,18 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Profile fields (never the password hash) by id for get_current_user – dropped when the user document changes
+USER_CACHE_FIELDS = {"email": 1, "full_name": 1}
+users_cache = shared_cache.namespace("users", ttl=int(os.getenv("USER_CACHE_TTL_SECONDS", "600")), local_ttl=60)
+
+
+@on_invalidation("users")
+async def _drop_cached_users(db, events: List[Invalidation]) -> None:
+    if any(e.operation == FLUSH for e in events):
+        users_cache.clear_local()   # shared entries run out within USER_CACHE_TTL_SECONDS
+        return
+    await users_cache.delete(*{e.user_id for e in events if e.user_id})
+
 def get_db(request: Request):
     """Dependency to get MongoDB database from app state"""
     return request.app.state.db
@@ -62,11 +77,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get
     except JWTError as e:
         raise credentials_exception from e
 
-    user = await db.users.find_one({"_id": ObjectId(token_data.user_id)})
+    user = await users_cache.get_or_compute(
+        token_data.user_id, lambda: db.users.find_one({"_id": ObjectId(token_data.user_id)}, USER_CACHE_FIELDS)
+    )
     if user is None:
         raise credentials_exception
 
-    return UserInDB(**user)
+    return UserOut(id=str(user["_id"]), email=user["email"], full_name=user.get("full_name"))
 
 
 # ── REGISTER ────────────────────────────────────────────────────────────────
@@ -93,7 +110,8 @@ async def register(user: UserCreate, db = Depends(get_db)):
         "email": user.email,
         "hashed_password": hashed_password,
         "full_name": user.full_name,
-        "created_at": datetime.utcnow()
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
     }
 
     result = await db.users.insert_one(user_dict)
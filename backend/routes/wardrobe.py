@@ -1,82 +1,80 @@
 # backend/routes/wardrobe.py
-from fastapi import APIRouter, Depends, Request, UploadFile, File, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Request, Response, UploadFile, File, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, List, Optional
 from bson import ObjectId
 from datetime import datetime
-import numpy as np
+import asyncio
+import hashlib
 import traceback
 from services.gamification import award_wear_points, get_user_rewards_summary
 # Models & utils
-from models import WardrobeItem
-from ai_utils import classify_image, extract_features, search_user_closet, safe_convert
+from ai_utils import search_user_closet
 from cloudinary_utils import upload_to_cloudinary
+from image_utils import DecodedImage, read_upload
+from json_utils import NumpyJSONResponse, dumps
+from model_registry import model_registry
 from middleware.auth import get_current_user
-from services.analytics import get_analytics_summary
-from services.social_scouting import get_current_trends, match_trends_to_user_closet
+from services.admission import Overloaded
+from services.analytics import cached_analytics_summary
+from services.resource_versions import CLOSET, REWARDS, bump_version, get_versions
+from services.social_scouting import (
+    cached_trend_matches, get_current_trends, match_trends_to_user_closet, trends_updated_at
+)
+from services.catalog_search import search_catalog
+from services.enrichment import (
+    ASYNC_ENRICHMENT, PENDING_FIELDS, cached_features, enrich_item, queue_enrichment
+)
+from services.thumbnails import cached_thumbnails
+from services.inference_cache import content_hash, find_near_duplicates, inference_cache, perceptual_hash, phash_bands
+from storage_utils import get_storage, image_key
 
 router = APIRouter(tags=["Wardrobe"])
 
+# Cache-Control for the conditional GETs – rewards change on every wear, so always revalidate
+REWARDS_CACHE_CONTROL = "private, no-cache"
+ANALYTICS_CACHE_CONTROL = "private, max-age=60"
+TRENDS_CACHE_CONTROL = "private, max-age=300"
+
 def get_db(request: Request):
     return request.app.state.db
 
-def generate_mitumba_upcycle_ideas(
-    category: str,
-    material: str,
-    color: str,
-    style: str = "casual"
-) -> List[str]:
-    """
-    Simple rule-based upcycling suggestions tailored for Kenyan mitumba context
-    """
-    ideas: List[str] = []
-
-    material_lower = material.lower()
-    if "cotton" in material_lower or "kitenge" in material_lower or "ankara" in material_lower:
-        ideas.extend([
-            "Add contrasting kitenge or ankara patches for cultural flair",
-            "Tie-dye or re-dye to refresh faded areas",
-            "Turn into a tote bag, headwrap or cushion cover if heavily worn"
-        ])
-    if "denim" in material_lower or "jeans" in category.lower():
-        ideas.extend([
-            "Distress knees and hems for modern streetwear vibe",
-            "Patch with colorful African fabric prints",
-            "Cut into high-waist shorts, denim skirt or bag"
-        ])
-    if "wool" in material_lower or "sweater" in category.lower():
-        ideas.append("Felt and reshape into warm slippers, hat or bag")
-
-    color_lower = color.lower()
-    if "faded" in color_lower or "worn" in color_lower or "discolored" in color_lower:
-        ideas.append("Re-dye with vibrant kitenge-inspired colors")
-
-    if "traditional" in style.lower() or any(x in category.lower() for x in ["kitenge", "kanga", "shuka"]):
-        ideas.extend([
-            "Layer with modern accessories for fusion look",
-            "Add beads, cowrie shells or Maasai-inspired embroidery"
-        ])
-    if category in ["shirt", "blouse", "dress"]:
-        ideas.extend([
-            "Shorten into crop top or tunic style",
-            "Add decorative buttons, zips or lace details"
-        ])
-
-    ideas.extend([
-        "Take to local fundi for resizing, zipper replacement or reinforcement",
-        "Combine with other mitumba pieces for a unique layered outfit",
-        "Sell or donate if upcycling isn't viable"
-    ])
-
-    unique_ideas = []
-    seen = set()
-    for idea in ideas:
-        if idea not in seen:
-            unique_ideas.append(idea)
-            seen.add(idea)
-        if len(unique_ideas) >= 6:
-            break
-
-    return unique_ideas
+def _etag(*parts) -> str:
+    """Weak validator – the JSON is equivalent, not byte-identical (key order, float formatting)."""
+    return 'W/"' + hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:16] + '"'
+
+def _not_modified(request: Request, etag: str, cache_control: str) -> Optional[Response]:
+    """304 if If-None-Match names this ETag (weak comparison, lists and * allowed), else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                            headers={"ETag": etag, "Cache-Control": cache_control})
+    return None
+
+def _set_cache_headers(response: Response, etag: str, cache_control: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+def _queued_response(item_id: str, image_url: str, is_mitumba: bool, near_duplicates: List[Dict]) -> NumpyJSONResponse:
+    return NumpyJSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "success": True,
+            "message": "Item uploaded! Classifying in the background...",
+            "item_id": item_id,
+            "image_url": image_url,
+            "status": "pending",
+            "status_url": f"/api/wardrobe/{item_id}/status",
+            "events_url": f"/api/wardrobe/{item_id}/events",
+            "is_mitumba": is_mitumba,
+            "near_duplicates": near_duplicates
+        }
+    )
 
 @router.post("/upload")
 
@@ -85,43 +83,39 @@ async def upload_wardrobe_item(
     is_mitumba: bool = Query(default=False, description="Mark this item as second-hand / mitumba"),
     purchase_price_kes: Optional[float] = Query(default=None, ge=0, description="Optional purchase price in KES"),
     source_platform: Optional[str] = Query(default=None, description="Where was it bought? e.g. Gikomba, Toi Market, Jumia, Instagram shop, Kilimall"),
+    is_public: bool = Query(default=False, description="Share this item in the public catalog / mitumba listings"),
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
     if not file.content_type.startswith("image/"):
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Only image files allowed")
 
-    image_bytes = await file.read()
+    image_bytes = await read_upload(file)
     if len(image_bytes) == 0:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Empty file uploaded")
 
     try:
-        image_url = await upload_to_cloudinary(image_bytes)
-        classification = await classify_image(image_bytes)
-        features = await extract_features(image_bytes)
-
-        classification_clean = safe_convert(classification)
-        features_clean = safe_convert(features)
-
-        upcycle_suggestions = []
-        if is_mitumba:
-            upcycle_suggestions = generate_mitumba_upcycle_ideas(
-                classification_clean["category"],
-                classification_clean["material"],
-                classification_clean["color"],
-                classification_clean["style"]
-            )
+        # Re-uploads / retries of the same bytes skip inference and the Cloudinary upload
+        digest = content_hash(image_bytes)
+        # Decoded lazily, at most once (reduced-size JPEG decode), shared by classification, embedding and dHash
+        image = DecodedImage(image_bytes)
+        # Per uploader: users share inference results for the same bytes, never a stored asset
+        image_url, _ = await inference_cache.get_or_compute(
+            db, digest, "image_urls", lambda: upload_to_cloudinary(image_bytes, image_key(digest, owner=current_user["_id"])),
+            versioned=False, owner=current_user["_id"]
+        )
+        # Only decoded for bytes the cache hasn't hashed before
+        phash, _ = await inference_cache.get_or_compute(
+            db, digest, "phash", lambda: asyncio.to_thread(perceptual_hash, image), versioned=False
+        )
+        near_duplicates = await find_near_duplicates(db, current_user["_id"], digest, phash)
 
+        # Only the stored image is needed right away; the rest is filled in by enrich_item
         item_data = {
             "user_id": current_user["_id"],
             "image_url": image_url,
-            "category": classification_clean["category"],
-            "color": classification_clean["color"],
-            "colors_palette": classification_clean.get("colors_palette", []),
-            "style": classification_clean["style"],
-            "material": classification_clean["material"],
-            "seasonality": classification_clean["seasonality"],
-            "features": features_clean,
+            **PENDING_FIELDS,
+            "status": "pending",
             "wear_count": 0,
             "last_worn": None,
             "created_at": datetime.utcnow(),
@@ -130,33 +124,174 @@ async def upload_wardrobe_item(
             "purchase_price_kes": purchase_price_kes,
             "purchase_date": datetime.utcnow() if is_mitumba and purchase_price_kes else None,
             "source_platform": source_platform,
-            "upcycle_suggestions": upcycle_suggestions,
             "times_suggested": 0,
+            "is_public": is_public,
+            "content_hash": digest,
+            "phash": phash,
+            "phash_bands": phash_bands(phash),
         }
 
         result = await db.wardrobe_items.insert_one(item_data)
         item_id = str(result.inserted_id)
+        await bump_version(db, current_user["_id"], CLOSET)
+
+        if ASYNC_ENRICHMENT:
+            await queue_enrichment(db, item_id, image_url, digest)
+            return _queued_response(item_id, image_url, is_mitumba, near_duplicates)
+
+        try:
+            enriched = await enrich_item(db, item_id, image, digest)
+        except Overloaded:
+            # Inference is saturated – the image is stored, so classify it in the background instead
+            await queue_enrichment(db, item_id, image_url, digest)
+            return _queued_response(item_id, image_url, is_mitumba, near_duplicates)
 
         safe_response = {
             "success": True,
-            "message": f"{classification_clean['category'].capitalize()} item uploaded and classified!",
+            "message": f"{enriched['category'].capitalize()} item uploaded and classified!",
             "item_id": item_id,
             "image_url": image_url,
-            "category": classification_clean["category"],
-            "color": classification_clean["color"],
-            "style": classification_clean["style"],
-            "confidence": classification_clean.get("confidence", 0.0),
+            "status": enriched["status"],
+            "category": enriched["category"],
+            "color": enriched["color"],
+            "style": enriched["style"],
+            "confidence": enriched.get("confidence", 0.0),
             "is_mitumba": is_mitumba,
-            "upcycle_suggestions": upcycle_suggestions if is_mitumba else []
+            "upcycle_suggestions": enriched["upcycle_suggestions"] if is_mitumba else [],
+            "thumbnails": enriched["thumbnails"],
+            "near_duplicates": near_duplicates,
+            "inference_cached": enriched["inference_cached"]
         }
 
-        return safe_convert(safe_response)
+        return NumpyJSONResponse(safe_response)
 
     except Exception as e:
         print("Upload error:\n", traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Upload processing failed: {str(e)}")
 
 
+STATUS_FIELDS = {
+    "status": 1, "category": 1, "color": 1, "colors_palette": 1, "style": 1, "material": 1,
+    "seasonality": 1, "upcycle_suggestions": 1, "enrichment_error": 1, "image_url": 1,
+    "thumbnails": 1
+}
+EVENTS_POLL_SECONDS = 1.0
+EVENTS_TIMEOUT_SECONDS = 120
+
+
+async def _item_status(db, item_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    if not ObjectId.is_valid(item_id):
+        return None
+    item = await db.wardrobe_items.find_one({"_id": ObjectId(item_id), "user_id": user_id}, STATUS_FIELDS)
+    if item is None:
+        return None
+    item["item_id"] = str(item.pop("_id"))
+    item.setdefault("status", "enriched")  # items from before the job queue
+    return item
+
+
+@router.get("/{item_id}/status")
+async def get_item_status(
+    item_id: str,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Poll enrichment progress of an uploaded item: pending → enriched (or failed)
+    """
+    item = await _item_status(db, item_id, current_user["_id"])
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found or not owned by user")
+    return {"success": True, **item}
+
+
+@router.get("/{item_id}/events")
+async def stream_item_status(
+    item_id: str,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Server-Sent Events: emits the item status whenever it changes, closes once enriched/failed
+    """
+    first = await _item_status(db, item_id, current_user["_id"])
+    if first is None:
+        raise HTTPException(status_code=404, detail="Item not found or not owned by user")
+
+    async def events():
+        item, last_status = first, None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + EVENTS_TIMEOUT_SECONDS
+        while item is not None:
+            if item["status"] != last_status:
+                yield f"event: status\ndata: {dumps(item).decode()}\n\n"
+                last_status = item["status"]
+            if last_status in ("enriched", "failed") or loop.time() > deadline:
+                break
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+            item = await _item_status(db, item_id, current_user["_id"])
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/my-items")
+async def list_my_items(
+    limit: int = Query(default=200, ge=1, le=1000),
+    skip: int = Query(default=0, ge=0),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    The user's closet, newest first. Cards should use `thumbnails` (128/256/512 px)
+    rather than the full-size `image_url`.
+    """
+    items = await db.wardrobe_items.find(
+        {"user_id": current_user["_id"]}, {"features": 0}
+    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+
+    for item in items:
+        item["id"] = str(item.pop("_id"))
+        item.setdefault("thumbnails", {})
+        item.setdefault("status", "enriched")
+    return NumpyJSONResponse({"success": True, "count": len(items), "items": items})
+
+
+@router.get("/{item_id}/thumbnails")
+async def get_item_thumbnails(
+    item_id: str,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Thumbnail URLs for an item, generating them on first request for items
+    uploaded before thumbnails existed (or whose generation failed).
+    """
+    if not ObjectId.is_valid(item_id):
+        raise HTTPException(status_code=404, detail="Item not found or not owned by user")
+    item = await db.wardrobe_items.find_one(
+        {"_id": ObjectId(item_id), "user_id": current_user["_id"]},
+        {"image_url": 1, "content_hash": 1, "thumbnails": 1}
+    )
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found or not owned by user")
+
+    thumbnails = item.get("thumbnails")
+    if not thumbnails:
+        try:
+            image_bytes = await get_storage().get(item["image_url"])
+            digest = item.get("content_hash") or content_hash(image_bytes)
+            thumbnails = await cached_thumbnails(db, image_bytes, digest, current_user["_id"])
+            await db.wardrobe_items.update_one(
+                {"_id": item["_id"]},
+                {"$set": {"thumbnails": thumbnails, "content_hash": digest}}
+            )
+        except Exception as e:
+            print("Thumbnail error:\n", traceback.format_exc())
+            raise HTTPException(status_code=500, detail=f"Thumbnail generation failed: {str(e)}")
+
+    return {"success": True, "item_id": item_id, "thumbnails": thumbnails}
+
+
 @router.post("/visual-search")
 async def visual_search_inspiration(
     file: UploadFile = File(...),
@@ -170,21 +305,24 @@ async def visual_search_inspiration(
     if not file.content_type.startswith("image/"):
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Only image files allowed")
 
-    image_bytes = await file.read()
+    image_bytes = await read_upload(file)
     if len(image_bytes) == 0:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Empty file")
 
     try:
-        # Extract features from the uploaded inspiration image
-        query_features_np = await extract_features(image_bytes)
-
-        # Search the user's closet using FAISS similarity
-        similar_items = await search_user_closet(
-            query_features_np,
-            current_user["_id"],
-            db,
-            top_k=10
-        )
+        # Query and closet vectors must come from the same model version, even mid-swap
+        async with model_registry.use() as model:
+            # Extract features from the uploaded inspiration image
+            query_features_np = await cached_features(db, DecodedImage(image_bytes), model=model)
+
+            # Search the user's closet using FAISS similarity
+            similar_items = await search_user_closet(
+                query_features_np,
+                current_user["_id"],
+                db,
+                top_k=10,
+                model_version=model.version
+            )
 
         # Basic "what might be missing" hint
         missing_hint = None
@@ -203,12 +341,59 @@ async def visual_search_inspiration(
             "query_processed": True
         }
 
-        return safe_convert(response)
+        return NumpyJSONResponse(response)
 
+    except Overloaded:
+        raise  # → 503 + Retry-After (main.py)
     except Exception as e:
         print("Visual search error:\n", traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Visual search failed: {str(e)}")
     
+@router.post("/catalog-search")
+async def catalog_visual_search(
+    file: UploadFile = File(...),
+    top_k: int = Query(default=20, ge=1, le=100),
+    mitumba_only: bool = Query(default=False, description="Only search mitumba listings"),
+    nprobe: Optional[int] = Query(default=None, ge=1, le=4096, description="IVF lists to probe (IVF backends only)"),
+    ef_search: Optional[int] = Query(default=None, ge=1, le=4096, description="HNSW search depth (HNSW backends only)"),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Upload an inspiration image → find similar items across all public items / mitumba listings
+    """
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Only image files allowed")
+
+    image_bytes = await read_upload(file)
+    if len(image_bytes) == 0:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Empty file")
+
+    try:
+        # The catalog is indexed for one model version – pin the query to a model, then compare
+        async with model_registry.use() as model:
+            query_features_np = await cached_features(db, DecodedImage(image_bytes), model=model)
+            similar_items = await search_catalog(
+                db,
+                query_features_np,
+                top_k=top_k,
+                mitumba_only=mitumba_only,
+                nprobe=nprobe,
+                ef_search=ef_search,
+                model_version=model.version
+            )
+        return NumpyJSONResponse({
+            "success": True,
+            "message": f"Found {len(similar_items)} similar items in the catalog",
+            "similar_items": similar_items
+        })
+
+    except Overloaded:
+        raise  # → 503 + Retry-After (main.py)
+    except Exception as e:
+        print("Catalog search error:\n", traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Catalog search failed: {str(e)}")
+
 @router.post("/{item_id}/mark-worn")
 async def mark_item_as_worn(
     item_id: str,
@@ -222,13 +407,14 @@ async def mark_item_as_worn(
         {"_id": ObjectId(item_id), "user_id": current_user["_id"]},
         {
             "$inc": {"wear_count": 1},
-            "$set": {"last_worn": datetime.utcnow()}
+            "$set": {"last_worn": datetime.utcnow(), "updated_at": datetime.utcnow()}
         },
         return_document=True
     )
 
     if not item:
         raise HTTPException(status_code=404, detail="Item not found or not owned by user")
+    await bump_version(db, current_user["_id"], CLOSET)
 
     # Award points via gamification service
     reward_result = await award_wear_points(
@@ -248,13 +434,24 @@ async def mark_item_as_worn(
 
 @router.get("/rewards")
 async def get_rewards_summary(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
     """
     Get user's current points, badges, and gamification stats
+    (ETag from the user's rewards version – send If-None-Match to get 304)
     """
+    # Version read before the data: a write in between gives an old tag on new data, never the reverse
+    versions = await get_versions(db, current_user["_id"])
+    etag = _etag("rewards", current_user["_id"], versions[REWARDS])
+    not_modified = _not_modified(request, etag, REWARDS_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
+
     summary = await get_user_rewards_summary(db, current_user["_id"])
+    _set_cache_headers(response, etag, REWARDS_CACHE_CONTROL)
     return {
         "success": True,
         **summary
@@ -262,6 +459,8 @@ async def get_rewards_summary(
 
 @router.get("/analytics")
 async def get_analytics_dashboard(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
@@ -271,9 +470,17 @@ async def get_analytics_dashboard(
     - Cost-per-wear
     - Seasonal patterns
     - Carbon footprint estimate of unused clothes
+    (ETag from the user's closet version and the date – the windows are relative to today)
     """
     try:
-        summary = await get_analytics_summary(db, current_user["_id"])
+        versions = await get_versions(db, current_user["_id"])
+        etag = _etag("analytics", current_user["_id"], versions[CLOSET], datetime.utcnow().date())
+        not_modified = _not_modified(request, etag, ANALYTICS_CACHE_CONTROL)
+        if not_modified:
+            return not_modified
+
+        summary = await cached_analytics_summary(db, current_user["_id"], versions[CLOSET])
+        _set_cache_headers(response, etag, ANALYTICS_CACHE_CONTROL)
         return {
             "success": True,
             "analytics": summary
@@ -287,22 +494,42 @@ async def get_analytics_dashboard(
     
 @router.get("/trends")
 async def get_fashion_trends(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
     """
     Get current Kenyan fashion trends scouted from social media (X/Twitter)
     + how they match your wardrobe + suggestions for missing pieces
+    (ETag from the user's closet version and when the trends were fetched)
     """
     try:
+        versions = await get_versions(db, current_user["_id"])
+        updated_at = await trends_updated_at(db)
+        if updated_at:
+            etag = _etag("trends", current_user["_id"], versions[CLOSET], updated_at.isoformat())
+            not_modified = _not_modified(request, etag, TRENDS_CACHE_CONTROL)
+            if not_modified:
+                return not_modified
+
         trends = await get_current_trends(db)
-        wardrobe_matches = await match_trends_to_user_closet(db, current_user["_id"], trends)
+        if updated_at:
+            wardrobe_matches = await cached_trend_matches(db, current_user["_id"], trends, versions[CLOSET], updated_at)
+        else:
+            wardrobe_matches = await match_trends_to_user_closet(db, current_user["_id"], trends)
+
+        if updated_at:
+            _set_cache_headers(response, etag, TRENDS_CACHE_CONTROL)
+        else:
+            # Cache expired and refreshed by this request – the next one gets a validator
+            response.headers["Cache-Control"] = "no-store"
 
         return {
             "success": True,
             "current_trends": trends,
             "wardrobe_matches": wardrobe_matches,
-            "last_updated": datetime.utcnow().isoformat(),
+            "last_updated": (updated_at or datetime.utcnow()).isoformat(),
             "source_note": "Trends from recent public X (Twitter) posts with #KenyanFashion, #NairobiStyle, #Kitenge, etc. Refreshes daily."
         }
 
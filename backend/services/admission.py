@@ -0,0 +1,187 @@
+# backend/services/admission.py
+"""
+Admission control for the inference stage (MobileNetV2 forward passes).
+
+A fixed number of requests run inference at once; the rest wait in a
+priority queue – interactive searches first, then synchronous uploads,
+then background enrichment jobs. Waiting is bounded per class (queue
+length and time), and a request that doesn't fit is shed right away with
+Overloaded → 503 + Retry-After instead of timing out after everyone's
+latency has gone up together.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Tuple
+
+from inference_pool import INFERENCE_SLOTS_PER_WORKER, INFERENCE_WORKERS
+from metrics import registry
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0     # visual / catalog search – someone is looking at a spinner
+    UPLOAD = 1          # upload with synchronous enrichment (ASYNC_ENRICHMENT=0)
+    BACKGROUND = 2      # enrichment jobs – never shed, they just wait their turn
+
+
+@dataclass(frozen=True)
+class ClassLimits:
+    max_queue: Optional[int]        # waiting requests of this class, None = unbounded
+    timeout: Optional[float]        # seconds a request may wait, None = forever
+
+
+# ========== CONFIGURATION ==========
+# Default: what the worker pool can run at once (in-process inference: 2 – the forward pass runs in a
+# thread (ServingModel.predict), so one request can be on the CPU while the other awaits I/O)
+ADMISSION_CONCURRENCY = int(os.getenv(
+    "ADMISSION_INFERENCE_CONCURRENCY", str(max(2, INFERENCE_WORKERS * INFERENCE_SLOTS_PER_WORKER))
+))
+ADMISSION_LIMITS = {
+    Priority.INTERACTIVE: ClassLimits(
+        int(os.getenv("ADMISSION_INTERACTIVE_QUEUE", "32")), float(os.getenv("ADMISSION_INTERACTIVE_TIMEOUT", "2.0"))
+    ),
+    Priority.UPLOAD: ClassLimits(
+        int(os.getenv("ADMISSION_UPLOAD_QUEUE", "16")), float(os.getenv("ADMISSION_UPLOAD_TIMEOUT", "5.0"))
+    ),
+    # Jobs may wait as long as it takes – the job queue heartbeat keeps them claimed meanwhile
+    Priority.BACKGROUND: ClassLimits(None, None),
+}
+MAX_RETRY_AFTER_SECONDS = 30
+
+admission_requests = registry.counter(
+    "admission_requests_total", "Inference admission decisions by priority class",
+    ("limiter", "priority", "outcome")
+)
+admission_wait = registry.histogram(
+    "admission_queue_wait_seconds", "Time spent queued before inference", ("limiter", "priority"),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+)
+admission_active = registry.gauge("admission_active", "Requests currently running inference", ("limiter",))
+admission_queued = registry.gauge("admission_queued", "Requests waiting for inference", ("limiter", "priority"))
+
+
+class Overloaded(Exception):
+    """Shed by admission control – the API answers 503 with Retry-After."""
+
+    def __init__(self, limiter: str, priority: Priority, reason: str, retry_after: int):
+        super().__init__(f"{limiter} overloaded ({reason}), retry in {retry_after}s")
+        self.limiter = limiter
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# ========== LIMITER ==========
+class PriorityLimiter:
+    """
+    Semaphore with a priority queue. A released slot goes straight to the
+    best waiting request (lowest Priority, then arrival order), so there's
+    no thundering herd and bulk work can't starve interactive requests.
+    """
+
+    def __init__(self, name: str, concurrency: int, limits: Dict[Priority, ClassLimits]):
+        self.name = name
+        self.concurrency = concurrency
+        self.limits = limits
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._queued: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._seq = itertools.count()
+        self._service_time = 0.1        # EWMA of slot hold time, for Retry-After
+        self._shed: Dict[Tuple[Priority, str], int] = {}
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has probably drained."""
+        backlog = sum(self._queued.values()) + 1
+        estimate = math.ceil(backlog * self._service_time / max(self.concurrency, 1))
+        return min(max(estimate, 1), MAX_RETRY_AFTER_SECONDS)
+
+    def _record(self, priority: Priority, outcome: str) -> None:
+        admission_requests.inc(limiter=self.name, priority=priority.name.lower(), outcome=outcome)
+        if outcome != "admitted":
+            self._shed[(priority, outcome)] = self._shed.get((priority, outcome), 0) + 1
+
+    def _shed_now(self, priority: Priority, reason: str) -> Overloaded:
+        self._record(priority, reason)
+        return Overloaded(self.name, priority, reason, self.retry_after())
+
+    def _set_gauges(self) -> None:
+        admission_active.set(self._active, limiter=self.name)
+        for p, n in self._queued.items():
+            admission_queued.set(n, limiter=self.name, priority=p.name.lower())
+
+    async def acquire(self, priority: Priority) -> None:
+        """Wait for a slot (raises Overloaded if the class's queue is full or the wait times out)."""
+        label = priority.name.lower()
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self._active < self.concurrency and not self._waiters:
+            self._active += 1
+            self._record(priority, "admitted")
+            admission_wait.observe(0.0, limiter=self.name, priority=label)
+            self._set_gauges()
+            return
+
+        limits = self.limits[priority]
+        if limits.max_queue is not None and self._queued[priority] >= limits.max_queue:
+            raise self._shed_now(priority, "queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), future))
+        self._queued[priority] += 1
+        self._set_gauges()
+        start = time.perf_counter()
+        try:
+            done, _ = await asyncio.wait({future}, timeout=limits.timeout)
+        except asyncio.CancelledError:
+            if not future.cancel():
+                self.release()      # the slot arrived as we were cancelled – pass it on
+            raise
+        finally:
+            self._queued[priority] -= 1
+            self._set_gauges()
+
+        # cancel() fails if release() handed us the slot in the meantime – then it's ours
+        if not done and future.cancel():
+            raise self._shed_now(priority, "timeout")
+        self._record(priority, "admitted")
+        admission_wait.observe(time.perf_counter() - start, limiter=self.name, priority=label)
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():       # skip waiters that timed out / were cancelled
+                future.set_result(None)  # slot handed over, _active unchanged
+                return
+        self._active -= 1
+        self._set_gauges()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority):
+        """`async with inference_admission.slot(Priority.INTERACTIVE): ...`"""
+        await self.acquire(priority)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.perf_counter() - start)
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "active": self._active,
+            "queued": {p.name.lower(): n for p, n in self._queued.items()},
+            "service_time_ms": round(self._service_time * 1000, 1),
+            "retry_after_s": self.retry_after(),
+            "shed": {f"{p.name.lower()}:{reason}": n for (p, reason), n in self._shed.items()},
+        }
+
+
+inference_admission = PriorityLimiter("inference", ADMISSION_CONCURRENCY, ADMISSION_LIMITS)
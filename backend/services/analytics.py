@@ -3,12 +3,26 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from bson import ObjectId
 import asyncio
+import os
+
+from services.shared_cache import shared_cache
 
 # Basic carbon footprint constants (grams CO₂e)
 # These are rough averages – in real app you'd want better data/sources
 CO2_PER_ITEM_PER_YEAR_UNUSED = 5000      # ~5 kg CO₂e/year per unused garment (textile production + waste)
 CO2_PER_WEAR_SAVED = 20                  # rough savings per time an item is worn instead of buying new
 
+# Keyed by closet version + day, so a write or midnight makes a new key instead of invalidating one
+analytics_cache = shared_cache.namespace(
+    "analytics", ttl=int(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", str(6 * 3600))), local_ttl=60
+)
+
+
+async def cached_analytics_summary(db, user_id: str, closet_version: int) -> Dict[str, Any]:
+    """get_analytics_summary, computed once per closet version and day across all workers"""
+    key = f"{user_id}:{closet_version}:{datetime.utcnow().date().isoformat()}"
+    return await analytics_cache.get_or_compute(key, lambda: get_analytics_summary(db, user_id))
+
 async def get_analytics_summary(
     db,
     user_id: str,
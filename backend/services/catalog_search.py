@@ -0,0 +1,234 @@
+# backend/services/catalog_search.py
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from bson import ObjectId
+
+from embedding_codec import codec_filter, get_active_codec
+from faiss_utils import CATALOG_INDEX_TYPE, SharedFaissIndex, index_type_for_size
+from metrics import span, timed
+from model_registry import model_registry
+from model_version import model_version_filter
+from services.index_snapshots import (
+    SnapshotSpec, advance_watermark, apply_changes, current_resume_token, load_snapshot, register_snapshot,
+    replay_delta, sync_point
+)
+from services.invalidation import FLUSH, Invalidation, on_invalidation
+
+logger = logging.getLogger(__name__)
+
+# Items shared to the public catalog (incl. mitumba listings), stored with the active codec and model
+codec = get_active_codec()
+catalog_model_version = model_registry.current_version()
+CATALOG_FILTER = {
+    "is_public": True, "features.0": {"$exists": True},
+    **codec_filter(codec.codec_id), **model_version_filter(catalog_model_version)
+}
+CATALOG_DIMENSION = codec.search_dim
+TRAIN_SAMPLE_SIZE = 100_000
+BUILD_BATCH_SIZE = 5000
+
+# Catalog entries are grouped by listing type instead of by owner,
+# so "mitumba only" searches use the same IDSelector path as per-user searches.
+GROUP_MITUMBA = "mitumba"
+GROUP_PUBLIC = "public"
+
+catalog_index: Optional[SharedFaissIndex] = None
+_build_lock = asyncio.Lock()
+
+
+def _group_for(item: Dict) -> str:
+    return GROUP_MITUMBA if item.get("is_mitumba") else GROUP_PUBLIC
+
+
+def _set_catalog_index(index: SharedFaissIndex) -> None:
+    global catalog_index
+    catalog_index = index
+
+
+snapshot_spec = register_snapshot(SnapshotSpec(
+    name="catalog",
+    filter=CATALOG_FILTER,
+    group_fn=_group_for,
+    get_index=lambda: catalog_index,
+    to_vectors=codec.to_search_space,
+    version=f"{codec.codec_id}:{catalog_model_version}",
+    rebuild=lambda db: build_catalog_index(db),
+    set_index=_set_catalog_index
+))
+
+
+def _on_model_swap(version: str) -> None:
+    """Another model version is serving: the catalog is rebuilt (or loaded from its snapshot) for it."""
+    global catalog_index, catalog_model_version
+    if version == catalog_model_version:
+        return
+    catalog_model_version = version
+    # Mutated in place – the snapshot spec and build query share this dict
+    CATALOG_FILTER.update(model_version_filter(version))
+    snapshot_spec.version = f"{codec.codec_id}:{version}"
+    catalog_index = None
+    logger.info(f"Catalog index dropped for model {version}, rebuilt on next search")
+
+
+model_registry.on_swap(_on_model_swap)
+
+
+@on_invalidation("wardrobe_items")
+async def _sync_catalog(db, events: List[Invalidation]) -> None:
+    """Public items added / changed / deleted through another worker: re-read them into this one's index."""
+    global catalog_index
+    index = catalog_index
+    if index is None or not index.is_trained:
+        return  # not loaded yet – it's built from the current data when it is
+    if any(e.operation == FLUSH for e in events):
+        catalog_index = None
+        logger.info("Catalog index dropped (invalidation history lost), reloaded on next search")
+        return
+    await apply_changes(db, snapshot_spec, index, list(dict.fromkeys(e.document_id for e in events)))
+    if catalog_index is index:
+        advance_watermark(snapshot_spec, events)
+
+
+async def sample_catalog_vectors(db, sample_size: int = TRAIN_SAMPLE_SIZE) -> np.ndarray:
+    """Random sample of catalog embeddings for offline IVF/PQ training."""
+    docs = await db.wardrobe_items.aggregate([
+        {"$match": CATALOG_FILTER},
+        {"$sample": {"size": sample_size}},
+        {"$project": {"_id": 0, "features": 1}}
+    ]).to_list(sample_size)
+    if not docs:
+        return np.empty((0, CATALOG_DIMENSION), dtype=np.float32)
+    return codec.to_search_space([doc["features"] for doc in docs])
+
+
+@timed("faiss_build_catalog")
+async def build_catalog_index(
+    db,
+    index_type: str = CATALOG_INDEX_TYPE,
+    sample_size: int = TRAIN_SAMPLE_SIZE,
+    batch_size: int = BUILD_BATCH_SIZE
+) -> SharedFaissIndex:
+    """
+    Build the catalog-wide index: train on a sample (IVF only), then stream
+    all public items from MongoDB in batches.
+    """
+    # Sync point is taken *before* reading, so a snapshot never claims more than it has
+    resume_token = await current_resume_token(db)
+    started_at = datetime.utcnow()
+
+    total = await db.wardrobe_items.count_documents(CATALOG_FILTER)
+    index_type = index_type_for_size(index_type, total)
+    index = SharedFaissIndex(CATALOG_DIMENSION, index_type=index_type)
+
+    if not index.is_trained:
+        sample = await sample_catalog_vectors(db, sample_size)
+        logger.info(f"Training {index_type} catalog index on {len(sample)} vectors")
+        await asyncio.to_thread(index.train, sample)
+
+    entries, vectors = [], []
+    cursor = db.wardrobe_items.find(CATALOG_FILTER, {"features": 1, "is_mitumba": 1}).batch_size(batch_size)
+    async for item in cursor:
+        entries.append((_group_for(item), str(item["_id"])))
+        vectors.append(item["features"])
+        if len(entries) >= batch_size:
+            await asyncio.to_thread(index.add_many, entries, codec.to_search_space(vectors))
+            entries, vectors = [], []
+    if entries:
+        await asyncio.to_thread(index.add_many, entries, codec.to_search_space(vectors))
+
+    snapshot_spec.synced_at = started_at
+    snapshot_spec.resume_token = resume_token
+    logger.info(f"Catalog index ready: {len(index)} items ({index_type})")
+    return index
+
+
+async def get_catalog_index(db) -> SharedFaissIndex:
+    """Load the catalog index from the latest snapshot (or build it) once per process."""
+    global catalog_index
+    if catalog_index is None:
+        async with _build_lock:
+            if catalog_index is None:
+                index = await load_snapshot(db, snapshot_spec)
+                if index is None:
+                    index = await build_catalog_index(db)
+                    catalog_index = index
+                    # Changes made during the build reached no index – the bus skips them until it's set
+                    await replay_delta(db, snapshot_spec, index, sync_point(snapshot_spec))
+                catalog_index = index
+    return catalog_index
+
+
+def add_to_catalog(
+    item_id: str, features: np.ndarray, is_mitumba: bool = False, model_version: Optional[str] = None
+) -> None:
+    """Keep an already-built catalog index in sync with new public uploads (raw embedding in)."""
+    if model_version is not None and model_version != catalog_model_version:
+        return  # embedded by a model that was swapped out meanwhile
+    if catalog_index is not None and catalog_index.is_trained:
+        catalog_index.add(GROUP_MITUMBA if is_mitumba else GROUP_PUBLIC, item_id, codec.index_vector(features))
+
+
+def remove_from_catalog(item_id: str, is_mitumba: bool = False) -> None:
+    if catalog_index is not None:
+        catalog_index.remove(GROUP_MITUMBA if is_mitumba else GROUP_PUBLIC, item_id)
+
+
+async def search_catalog(
+    db,
+    query_features: np.ndarray,
+    top_k: int = 20,
+    mitumba_only: bool = False,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    model_version: Optional[str] = None
+) -> List[Dict]:
+    """
+    Find similar items across all public items / mitumba listings
+    model_version: the version query_features came from – nothing is returned
+    if the catalog is indexed for another one (a swap happened meanwhile).
+    """
+    if model_version is not None and model_version != catalog_model_version:
+        logger.info(f"Catalog search with a {model_version} embedding, catalog is on {catalog_model_version}")
+        return []
+    index = await get_catalog_index(db)
+    with span("faiss_search_catalog"):
+        hits = await asyncio.to_thread(
+            index.search,
+            codec.query(query_features),
+            top_k,
+            GROUP_MITUMBA if mitumba_only else None,
+            nprobe,
+            ef_search
+        )
+    if not hits:
+        return []
+
+    docs = await db.wardrobe_items.find(
+        {"_id": {"$in": [ObjectId(hit["item_id"]) for hit in hits]}},
+        {"image_url": 1, "category": 1, "color": 1, "style": 1, "is_mitumba": 1,
+         "purchase_price_kes": 1, "source_platform": 1}
+    ).to_list(len(hits))
+    docs_by_id = {str(doc["_id"]): doc for doc in docs}
+
+    results = []
+    for rank, hit in enumerate(hits):
+        item = docs_by_id.get(hit["item_id"])
+        if not item:
+            continue
+        results.append({
+            "item_id": hit["item_id"],
+            "image_url": item["image_url"],
+            "category": item["category"],
+            "color": item["color"],
+            "style": item.get("style", "casual"),
+            "is_mitumba": item.get("is_mitumba", False),
+            "price_kes": item.get("purchase_price_kes"),
+            "source_platform": item.get("source_platform"),
+            "similarity_score": hit["similarity_score"],
+            "rank": rank + 1
+        })
+    return results
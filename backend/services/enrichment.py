@@ -0,0 +1,287 @@
+# backend/services/enrichment.py
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from bson import ObjectId
+
+from ai_utils import classify_image, extract_features, safe_convert
+from attribute_rules import attribute_rules
+from embedding_codec import get_active_codec
+from image_utils import DecodedImage
+from model_registry import ServingModel, model_registry
+from services.admission import Priority, inference_admission
+from services.catalog_search import add_to_catalog
+from services.inference_cache import content_hash, features_from_list, features_to_list, inference_cache
+from services.job_queue import enqueue, register_handler
+from services.resource_versions import CLOSET, bump_version
+from services.thumbnails import cached_thumbnails
+from storage_utils import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Upload returns right after storing the image; classification etc. run in the job queue
+ASYNC_ENRICHMENT = os.getenv("ASYNC_ENRICHMENT", "1") == "1"
+ENRICH_JOB = "enrich_item"
+# Pending this long without a live job → the process died between insert and enqueue
+STRANDED_AFTER = timedelta(minutes=int(os.getenv("ENRICHMENT_STRANDED_MINUTES", "10")))
+SWEEP_INTERVAL_SECONDS = 60
+
+# Shown until the enrichment job has run
+PENDING_FIELDS = {
+    "category": "pending",
+    "color": "#95a5a6",
+    "colors_palette": [],
+    "style": "casual",
+    "material": "unknown",
+    "seasonality": "all-season",
+    "features": [],
+    "upcycle_suggestions": [],
+    "thumbnails": {},
+}
+
+
+def generate_mitumba_upcycle_ideas(
+    category: str,
+    material: str,
+    color: str,
+    style: str = "casual"
+) -> List[str]:
+    """
+    Simple rule-based upcycling suggestions tailored for Kenyan mitumba context
+    """
+    ideas: List[str] = []
+
+    material_lower = material.lower()
+    if "cotton" in material_lower or "kitenge" in material_lower or "ankara" in material_lower:
+        ideas.extend([
+            "Add contrasting kitenge or ankara patches for cultural flair",
+            "Tie-dye or re-dye to refresh faded areas",
+            "Turn into a tote bag, headwrap or cushion cover if heavily worn"
+        ])
+    if "denim" in material_lower or "jeans" in category.lower():
+        ideas.extend([
+            "Distress knees and hems for modern streetwear vibe",
+            "Patch with colorful African fabric prints",
+            "Cut into high-waist shorts, denim skirt or bag"
+        ])
+    if "wool" in material_lower or "sweater" in category.lower():
+        ideas.append("Felt and reshape into warm slippers, hat or bag")
+
+    color_lower = color.lower()
+    if "faded" in color_lower or "worn" in color_lower or "discolored" in color_lower:
+        ideas.append("Re-dye with vibrant kitenge-inspired colors")
+
+    if "traditional" in style.lower() or any(x in category.lower() for x in ["kitenge", "kanga", "shuka"]):
+        ideas.extend([
+            "Layer with modern accessories for fusion look",
+            "Add beads, cowrie shells or Maasai-inspired embroidery"
+        ])
+    if category in ["shirt", "blouse", "dress"]:
+        ideas.extend([
+            "Shorten into crop top or tunic style",
+            "Add decorative buttons, zips or lace details"
+        ])
+
+    ideas.extend([
+        "Take to local fundi for resizing, zipper replacement or reinforcement",
+        "Combine with other mitumba pieces for a unique layered outfit",
+        "Sell or donate if upcycling isn't viable"
+    ])
+
+    unique_ideas = []
+    seen = set()
+    for idea in ideas:
+        if idea not in seen:
+            unique_ideas.append(idea)
+            seen.add(idea)
+        if len(unique_ideas) >= 6:
+            break
+
+    return unique_ideas
+
+
+def _admitted(image: DecodedImage, model: ServingModel, priority: Priority, compute):
+    """compute() under an inference admission slot – unless this image already went through the model."""
+    async def run():
+        outputs = image.model_outputs
+        if outputs is not None and outputs[0] == model.version:
+            return await compute()
+        async with inference_admission.slot(priority):
+            return await compute()
+    return run
+
+
+async def cached_features(
+    db,
+    image: DecodedImage,
+    digest: Optional[str] = None,
+    model: Optional[ServingModel] = None,
+    priority: Priority = Priority.INTERACTIVE
+) -> np.ndarray:
+    """
+    Embedding for these image bytes, reusing the result of an earlier identical upload.
+    A cache miss waits for admission (services.admission) and may raise Overloaded.
+    """
+    model = model or model_registry.current()
+    features, _ = await inference_cache.get_or_compute(
+        db,
+        digest or content_hash(image.image_bytes),
+        "features",
+        _admitted(image, model, priority, lambda: extract_features(image, model)),
+        encode=features_to_list,
+        decode=features_from_list,
+        model_version=model.version
+    )
+    return features
+
+
+async def enrich_item(
+    db, item_id: str, image: DecodedImage, digest: str, priority: Priority = Priority.UPLOAD
+) -> Dict[str, Any]:
+    """
+    Classification, embedding, palette and upcycle ideas for a stored item.
+    Sets status → "enriched". Returns the fields written (minus the embedding).
+    One model version is pinned for the whole item, even if a swap happens meanwhile.
+    """
+    async with model_registry.use() as model:
+        return await _enrich_item(db, item_id, image, digest, model, priority)
+
+
+async def _enrich_item(
+    db, item_id: str, image: DecodedImage, digest: str, model: ServingModel, priority: Priority
+) -> Dict[str, Any]:
+    oid = ObjectId(item_id)
+    item = await db.wardrobe_items.find_one({"_id": oid}, {"is_mitumba": 1, "is_public": 1, "user_id": 1})
+    if item is None:
+        logger.info(f"Item {item_id} was deleted before enrichment")
+        return {}
+
+    classification, classification_cached = await inference_cache.get_or_compute(
+        db, digest, f"{model.classification_key}-{attribute_rules.version}",
+        _admitted(image, model, priority, lambda: classify_image(image, model)),
+        encode=safe_convert,
+        model_version=model.version
+    )
+    features = await cached_features(db, image, digest, model, priority)
+    image.release()
+
+    try:
+        thumbnails = await cached_thumbnails(db, image.image_bytes, digest, str(item["user_id"]))
+    except Exception as e:
+        # Cards fall back to image_url; GET /{item_id}/thumbnails retries later
+        logger.warning(f"Thumbnail generation failed for {item_id}: {e}")
+        thumbnails = {}
+
+    classification_clean = safe_convert(classification)
+    # Stored in the active codec's space (e.g. 256-d PCA) – tagged so search only compares like with like
+    codec = get_active_codec()
+
+    upcycle_suggestions = []
+    if item.get("is_mitumba"):
+        upcycle_suggestions = generate_mitumba_upcycle_ideas(
+            classification_clean["category"],
+            classification_clean["material"],
+            classification_clean["color"],
+            classification_clean["style"]
+        )
+
+    now = datetime.utcnow()
+    update = {
+        "category": classification_clean["category"],
+        "color": classification_clean["color"],
+        "colors_palette": classification_clean.get("colors_palette", []),
+        "style": classification_clean["style"],
+        "material": classification_clean["material"],
+        "seasonality": classification_clean["seasonality"],
+        "features": codec.encode_one(features),
+        "codec_id": codec.codec_id,
+        "model_version": model.version,
+        "upcycle_suggestions": upcycle_suggestions,
+        "thumbnails": thumbnails,
+        "status": "enriched",
+        "enriched_at": now,
+        "updated_at": now,
+    }
+    await db.wardrobe_items.update_one({"_id": oid}, {"$set": update})
+    await bump_version(db, item["user_id"], CLOSET)
+
+    if item.get("is_public"):
+        add_to_catalog(item_id, features, is_mitumba=item.get("is_mitumba", False), model_version=model.version)
+
+    result = {k: v for k, v in update.items() if k != "features"}
+    result["confidence"] = classification_clean.get("confidence", 0.0)
+    result["inference_cached"] = classification_cached
+    return result
+
+
+async def fetch_image_bytes(url: str) -> bytes:
+    """Through the storage backend's pooled client (or straight from disk for local storage)."""
+    return await get_storage().get(url)
+
+
+async def _mark_failed(db, payload: Dict[str, Any], error: str) -> None:
+    await db.wardrobe_items.update_one(
+        {"_id": ObjectId(payload["item_id"])},
+        {"$set": {"status": "failed", "enrichment_error": error, "updated_at": datetime.utcnow()}}
+    )
+
+
+@register_handler(ENRICH_JOB, on_failure=_mark_failed)
+async def enrich_item_job(db, payload: Dict[str, Any]) -> None:
+    image_bytes = await fetch_image_bytes(payload["image_url"])
+    # Behind interactive requests for inference, never shed
+    await enrich_item(db, payload["item_id"], DecodedImage(image_bytes), payload["content_hash"], Priority.BACKGROUND)
+
+
+async def queue_enrichment(db, item_id: str, image_url: str, digest: Optional[str]) -> str:
+    return await enqueue(db, ENRICH_JOB, {"item_id": item_id, "image_url": image_url, "content_hash": digest})
+
+
+async def requeue_stranded(db, older_than: timedelta = STRANDED_AFTER) -> int:
+    """
+    Queue enrichment again for items left pending without a queued / running
+    job – the upload stored the item but its process died before (or while)
+    enqueueing, or inline enrichment crashed. Returns how many were queued.
+    """
+    cutoff = datetime.utcnow() - older_than
+    requeued = 0
+    cursor = db.wardrobe_items.find(
+        {"status": "pending", "updated_at": {"$lt": cutoff}}, {"image_url": 1, "content_hash": 1, "updated_at": 1}
+    )
+    async for item in cursor:
+        item_id = str(item["_id"])
+        live = await db.jobs.find_one(
+            {"kind": ENRICH_JOB, "payload.item_id": item_id, "status": {"$in": ["queued", "running"]}}, {"_id": 1}
+        )
+        if live is not None:
+            continue
+        # Touching updated_at claims the item – another process sweeping at the same time skips it
+        claimed = await db.wardrobe_items.update_one(
+            {"_id": item["_id"], "status": "pending", "updated_at": item["updated_at"]},
+            {"$set": {"updated_at": datetime.utcnow()}}
+        )
+        if claimed.modified_count:
+            await queue_enrichment(db, item_id, item["image_url"], item.get("content_hash"))
+            requeued += 1
+    if requeued:
+        logger.warning(f"Re-queued enrichment for {requeued} stranded pending items")
+    return requeued
+
+
+async def stranded_items_loop(db, interval: float = SWEEP_INTERVAL_SECONDS):
+    """requeue_stranded() every interval (started from main.startup_db_client)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await requeue_stranded(db)
+        except Exception as e:
+            logger.error(f"Stranded item sweep failed: {e}")
+
+
+async def ensure_indexes(db) -> None:
+    await db.wardrobe_items.create_index([("status", 1), ("updated_at", 1)])
+    await db.jobs.create_index([("payload.item_id", 1)], sparse=True)
@@ -4,6 +4,8 @@ from typing import List, Dict, Any, Optional
 from bson import ObjectId
 import asyncio
 
+from services.resource_versions import REWARDS, bump_version
+
 # Constants
 POINTS_BASE = 5               # points for any wear
 POINTS_LEAST_WORN_BONUS = 10  # extra if item worn < 3 times
@@ -59,6 +61,7 @@ async def award_wear_points(
     )
 
     new_badges = await check_and_award_badges(db, user_id, reward_doc)
+    await bump_version(db, user_id, REWARDS)
 
     return {
         "points_awarded": points,
@@ -103,7 +106,7 @@ async def check_and_award_badges(
     if new_badges:
         await db.user_rewards.update_one(
             {"user_id": user_id},
-            {"$set": {"badges": list(current_badges)}}
+            {"$set": {"badges": list(current_badges), "updated_at": datetime.utcnow()}}
         )
 
     return new_badges
@@ -0,0 +1,287 @@
+# backend/services/index_snapshots.py
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from bson import ObjectId, Timestamp
+from pymongo.errors import PyMongoError
+
+from faiss_utils import SharedFaissIndex
+from services.invalidation import Invalidation
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv("FAISS_SNAPSHOT_DIR", "faiss_snapshots")
+SNAPSHOT_INTERVAL_MINUTES = int(os.getenv("FAISS_SNAPSHOT_INTERVAL_MINUTES", "30"))
+# Only ivfpq snapshots are actually shared through mmap (see SharedFaissIndex.load)
+SNAPSHOT_MMAP = os.getenv("FAISS_SNAPSHOT_MMAP", "1") == "1"
+SNAPSHOTS_TO_KEEP = 2
+REPLAY_BATCH_SIZE = 1000
+# Items changed within this window before the watermark are replayed again (clock skew)
+WATERMARK_SKEW = timedelta(seconds=30)
+
+
+@dataclass
+class SnapshotSpec:
+    """
+    How to snapshot + catch up one index.
+    filter:   which wardrobe_items belong in the index
+    group_fn: item doc → group key used in the SharedFaissIndex (user id, listing type, ...)
+    get_index: access the live index owned by another module
+    rebuild / set_index: build a fresh single-layer index from MongoDB and
+               install it in place of the live one (compaction); without
+               them the index is snapshotted but never compacted
+    """
+    name: str
+    filter: Dict[str, Any]
+    group_fn: Callable[[Dict], str]
+    get_index: Callable[[], Optional[SharedFaissIndex]]
+    # Stored `features` values → float32 search vectors (embedding codec)
+    to_vectors: Callable[[List], np.ndarray] = lambda features: np.array(features, dtype=np.float32)
+    # Snapshots written under another version (e.g. embedding codec id) are ignored
+    version: str = ""
+    rebuild: Optional[Callable[[Any], Awaitable[SharedFaissIndex]]] = None
+    set_index: Optional[Callable[[SharedFaissIndex], None]] = None
+    # Sync state of the live index: everything up to here is in it. The token
+    # is only kept while synced_at is still the build / replay start it belongs to
+    synced_at: Optional[datetime] = None
+    resume_token: Optional[Dict] = None
+
+
+snapshot_specs: Dict[str, SnapshotSpec] = {}
+
+
+def register_snapshot(spec: SnapshotSpec) -> SnapshotSpec:
+    snapshot_specs[spec.name] = spec
+    return spec
+
+
+def _manifest_path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}.manifest.json")
+
+
+def read_manifest(name: str) -> Optional[Dict]:
+    try:
+        with open(_manifest_path(name)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+async def current_resume_token(db) -> Optional[Dict]:
+    """
+    Resume token for "now" on wardrobe_items. None on a standalone mongod
+    (no change streams) → callers fall back to the updated_at watermark.
+    """
+    try:
+        async with db.wardrobe_items.watch() as stream:
+            await stream.try_next()
+            return stream.resume_token
+    except PyMongoError:
+        return None
+
+
+def _write_files(index: SharedFaissIndex, name: str, manifest: Dict) -> None:
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    directory = os.path.join(SNAPSHOT_DIR, f"{name}-{stamp}")
+    index.save(directory)
+
+    manifest["directory"] = directory
+    tmp = _manifest_path(name) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, default=str)
+    os.replace(tmp, _manifest_path(name))  # atomic switch for readers
+
+    # Old snapshot dirs can go; workers that mmapped them keep their pages until they reload
+    old = sorted(d for d in os.listdir(SNAPSHOT_DIR) if d.startswith(f"{name}-") and os.path.isdir(os.path.join(SNAPSHOT_DIR, d)))
+    for d in old[:-SNAPSHOTS_TO_KEEP]:
+        shutil.rmtree(os.path.join(SNAPSHOT_DIR, d), ignore_errors=True)
+
+
+async def write_snapshot(spec: SnapshotSpec) -> Optional[Dict]:
+    index = spec.get_index()
+    if index is None or spec.synced_at is None:
+        return None
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    manifest = {
+        "name": spec.name,
+        "created_at": datetime.utcnow().isoformat(),
+        "watermark": spec.synced_at.isoformat(),
+        "resume_token": spec.resume_token,
+        "items": len(index),
+        "index_type": index.index_type,
+        "version": spec.version,
+    }
+    await asyncio.to_thread(_write_files, index, spec.name, manifest)
+    logger.info(f"FAISS snapshot '{spec.name}' written ({manifest['items']} items)")
+    return manifest
+
+
+async def apply_changes(db, spec: SnapshotSpec, index: SharedFaissIndex, item_ids: List[ObjectId]) -> None:
+    """Re-read changed items; ones still matching the filter are (re)added, the rest removed."""
+    for start in range(0, len(item_ids), REPLAY_BATCH_SIZE):
+        batch = item_ids[start:start + REPLAY_BATCH_SIZE]
+        docs = await db.wardrobe_items.find(
+            {"_id": {"$in": batch}, **spec.filter},
+            {"features": 1, "user_id": 1, "is_mitumba": 1}
+        ).to_list(len(batch))
+        live = {doc["_id"]: spec.group_fn(doc) for doc in docs}
+        for oid in batch:
+            # Deleted / no longer matching: out of every group. Still live: out of
+            # any group it has left (e.g. is_mitumba flipped), re-added below
+            for group in list(index.user_ids):
+                if group != live.get(oid):
+                    index.remove(group, str(oid))
+        if docs:
+            await asyncio.to_thread(
+                index.add_many,
+                [(live[doc["_id"]], str(doc["_id"])) for doc in docs],
+                spec.to_vectors([doc["features"] for doc in docs])
+            )
+
+
+def advance_watermark(spec: SnapshotSpec, events: List[Invalidation]) -> None:
+    """
+    Changes from the invalidation bus were applied to the live index: later
+    snapshots replay from the newest of them instead of from the build.
+    """
+    times = [event.changed_at for event in events if event.changed_at is not None]
+    if spec.synced_at is None or not times or max(times) <= spec.synced_at:
+        return
+    spec.synced_at = max(times)
+    spec.resume_token = None  # belongs to the old sync point; replay starts at the watermark instead
+
+
+def sync_point(spec: SnapshotSpec) -> Dict:
+    """Where the live index is synced up to, in the manifest shape replay_delta reads."""
+    return {"resume_token": spec.resume_token, "watermark": spec.synced_at.isoformat()}
+
+
+async def replay_delta(db, spec: SnapshotSpec, index: SharedFaissIndex, manifest: Dict) -> int:
+    """
+    Bring a freshly loaded snapshot up to date.
+    Prefers the change stream (sees deletes too), resumed from the manifest's
+    token or started at its watermark; falls back to updated_at > watermark.
+    """
+    new_token = await current_resume_token(db)
+    started_at = datetime.utcnow()
+    changed: Dict[ObjectId, None] = {}
+
+    since = datetime.fromisoformat(manifest["watermark"]) - WATERMARK_SKEW
+    token = manifest.get("resume_token")
+    streamed = False
+    if new_token is not None:  # None: no change streams here
+        start = (
+            {"resume_after": token} if token
+            else {"start_at_operation_time": Timestamp(int(since.replace(tzinfo=timezone.utc).timestamp()), 0)}
+        )
+        try:
+            async with db.wardrobe_items.watch(**start) as stream:
+                while True:
+                    change = await stream.try_next()
+                    if change is None:
+                        break
+                    if "documentKey" in change:
+                        changed[change["documentKey"]["_id"]] = None
+            streamed = True
+        except PyMongoError as e:
+            logger.warning(f"Change stream resume failed for '{spec.name}' ({e}), using updated_at watermark")
+
+    if not streamed:
+        async for doc in db.wardrobe_items.find({"updated_at": {"$gt": since}}, {"_id": 1}):
+            changed[doc["_id"]] = None
+
+    await apply_changes(db, spec, index, list(changed))
+    spec.synced_at = started_at
+    spec.resume_token = new_token
+    return len(changed)
+
+
+async def load_snapshot(db, spec: SnapshotSpec) -> Optional[SharedFaissIndex]:
+    """Load the latest snapshot and replay only the delta since it was taken."""
+    manifest = read_manifest(spec.name)
+    if not manifest or not os.path.isdir(manifest.get("directory", "")):
+        return None
+    if manifest.get("version", "") != spec.version:
+        logger.info(f"FAISS snapshot '{spec.name}' is for version '{manifest.get('version')}', rebuilding")
+        return None
+    try:
+        index = await asyncio.to_thread(SharedFaissIndex.load, manifest["directory"], SNAPSHOT_MMAP)
+    except Exception as e:
+        logger.warning(f"Could not load FAISS snapshot '{spec.name}': {e}")
+        return None
+    replayed = await replay_delta(db, spec, index, manifest)
+    logger.info(f"Loaded FAISS snapshot '{spec.name}' ({len(index)} items, {replayed} changes replayed)")
+    return index
+
+
+async def compact_index(db, spec: SnapshotSpec) -> Optional[SharedFaissIndex]:
+    """
+    Fold the live index's delta layer and tombstones into a new base: rebuild
+    it from MongoDB, replay what changed during the build, then swap it in.
+    """
+    old = spec.get_index()
+    index = await spec.rebuild(db)
+    await replay_delta(db, spec, index, sync_point(spec))
+    if spec.get_index() is not old:
+        return None  # dropped or replaced meanwhile (e.g. model swap) – don't resurrect a stale build
+    spec.set_index(index)
+    logger.info(f"FAISS index '{spec.name}' compacted ({len(index)} items)")
+    return index
+
+
+async def reload_compacted(db, spec: SnapshotSpec) -> Optional[SharedFaissIndex]:
+    """Another worker wrote a compacted snapshot: swap it in for our layered index."""
+    old = spec.get_index()
+    index = await load_snapshot(db, spec)
+    if index is None or index.needs_compaction() or spec.get_index() is not old:
+        return None
+    spec.set_index(index)
+    return index
+
+
+async def _acquire_lease(db, name: str, ttl: timedelta) -> bool:
+    """Only one worker writes a given snapshot per interval."""
+    now = datetime.utcnow()
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    try:
+        await db.locks.update_one(
+            {"_id": f"snapshot:{name}", "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expires_at": now + ttl}},
+            upsert=True
+        )
+        return True
+    except PyMongoError:
+        # Duplicate key on upsert → someone else holds the lease
+        return False
+
+
+async def snapshot_loop(db, interval_minutes: int = SNAPSHOT_INTERVAL_MINUTES):
+    """
+    Periodically snapshot every registered index (started from main.startup_db_client).
+    The worker holding the lease compacts its index first if it needs it, so
+    the snapshot is a single base again; the others pick that snapshot up
+    once their own index needs compacting.
+    """
+    interval = timedelta(minutes=interval_minutes)
+    while True:
+        await asyncio.sleep(interval.total_seconds())
+        for spec in list(snapshot_specs.values()):
+            try:
+                index = spec.get_index()
+                compactable = spec.rebuild is not None and index is not None and index.needs_compaction()
+                if await _acquire_lease(db, spec.name, interval):
+                    if compactable:
+                        await compact_index(db, spec)
+                    await write_snapshot(spec)
+                elif compactable:
+                    await reload_compacted(db, spec)
+            except Exception as e:
+                logger.error(f"FAISS snapshot '{spec.name}' failed: {e}")
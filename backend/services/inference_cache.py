@@ -0,0 +1,274 @@
+# backend/services/inference_cache.py
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from pymongo import UpdateOne
+
+from image_utils import DecodedImage, as_decoded
+from model_registry import model_registry
+from model_version import DEFAULT_MODEL_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Bump when the inference code changes so cached classifications/embeddings aren't reused
+# (each model version gets its own namespace automatically)
+INFERENCE_CACHE_VERSION = os.getenv("INFERENCE_CACHE_VERSION", "v1")
+MEMORY_CACHE_SIZE = int(os.getenv("INFERENCE_CACHE_MEMORY_ITEMS", "2048"))
+CACHE_TTL_DAYS = int(os.getenv("INFERENCE_CACHE_TTL_DAYS", "90"))
+# Hits push last_used_at (the TTL field) forward at most this often per image
+LAST_USED_REFRESH = timedelta(days=1)
+# dHash bits that may differ for two photos to count as near-duplicates
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "6"))
+# The dHash is indexed as 8 one-byte bands: hashes ≤ 7 bits apart share at least one band
+PHASH_BANDS = 8
+if NEAR_DUPLICATE_MAX_DISTANCE >= PHASH_BANDS:
+    raise ValueError(f"NEAR_DUPLICATE_MAX_DISTANCE must be below {PHASH_BANDS} (one dHash band per allowed bit)")
+
+
+# ========== HASHING ==========
+def content_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image: Union[bytes, DecodedImage]) -> Optional[str]:
+    """
+    64-bit difference hash (dHash) as 16 hex chars.
+    Survives re-encoding, resizing and small crops, unlike the content hash.
+    """
+    try:
+        pixels = as_decoded(image).gray_hash_input
+    except Exception:
+        return None
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return "%016x" % int("".join("1" if b else "0" for b in bits), 2)
+
+
+def phash_bands(phash: Optional[str]) -> List[str]:
+    """"<band>:<byte>" keys stored in wardrobe_items.phash_bands, so candidates come from an index lookup."""
+    if not phash:
+        return []
+    width = len(phash) // PHASH_BANDS
+    return [f"{i}:{phash[i * width:(i + 1) * width]}" for i in range(PHASH_BANDS)]
+
+
+def hamming_distance(hash_a: str, hash_b: str) -> int:
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+def cache_version(model_version: str) -> str:
+    # Stock model keeps the plain version, so entries cached before model versioning stay valid
+    if model_version == DEFAULT_MODEL_VERSION:
+        return INFERENCE_CACHE_VERSION
+    return f"{INFERENCE_CACHE_VERSION}-{model_version}"
+
+
+# ========== CACHE ==========
+class InferenceCache:
+    """
+    Content-addressed cache (sha256 of the uploaded bytes) for classification,
+    embedding and storage URL, so re-uploads and frontend retries skip
+    MobileNetV2, k-means and the Cloudinary upload.
+
+    In-memory LRU in front of the `inference_cache` MongoDB collection.
+    Model outputs are stored per cache_version() (INFERENCE_CACHE_VERSION +
+    model version, the serving one unless the caller pinned another).
+    Unversioned fields that belong to an uploader (the storage URL) are
+    stored per `owner`, so one user never gets a URL to another user's asset.
+    """
+
+    def __init__(self, max_items: int = MEMORY_CACHE_SIZE, version: Optional[str] = None):
+        self.max_items = max_items
+        self.version = version
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        # field → {"memory": n, "mongo": n, "miss": n}
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"memory": 0, "mongo": 0, "miss": 0})
+
+    def _remember(self, digest: str, entry: Dict[str, Any]) -> None:
+        self._memory[digest] = entry
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _version(self, model_version: Optional[str] = None) -> str:
+        return self.version or cache_version(model_version or model_registry.current_version())
+
+    def _field_path(
+        self, field: str, versioned: bool, model_version: Optional[str] = None, owner: Optional[str] = None
+    ) -> str:
+        path = f"inference.{self._version(model_version)}.{field}" if versioned else field
+        return f"{path}.{owner}" if owner else path
+
+    @staticmethod
+    def _get_path(entry: Dict[str, Any], path: str) -> Any:
+        value: Any = entry
+        for part in path.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
+    async def _entry(self, db, digest: str) -> Tuple[Dict[str, Any], str]:
+        entry = self._memory.get(digest)
+        if entry is not None:
+            self._memory.move_to_end(digest)
+            return entry, "memory"
+        entry = await db.inference_cache.find_one({"_id": digest}) or {}
+        self._remember(digest, entry)
+        return entry, "mongo"
+
+    async def _touch(self, db, digest: str, entry: Dict[str, Any]) -> None:
+        """Keep reused entries alive past the TTL – at most one write per digest per LAST_USED_REFRESH."""
+        now = datetime.utcnow()
+        last_used = entry.get("last_used_at")
+        if last_used is not None and now - last_used < LAST_USED_REFRESH:
+            return
+        entry["last_used_at"] = now
+        await db.inference_cache.update_one({"_id": digest}, {"$set": {"last_used_at": now}})
+
+    async def get_or_compute(
+        self,
+        db,
+        digest: str,
+        field: str,
+        compute: Callable[[], Awaitable[Any]],
+        versioned: bool = True,
+        encode: Callable[[Any], Any] = lambda v: v,
+        decode: Callable[[Any], Any] = lambda v: v,
+        model_version: Optional[str] = None,
+        owner: Optional[str] = None
+    ) -> Tuple[Any, bool]:
+        """
+        Cached value of `field` for these image bytes, computing it on a miss.
+        Concurrent requests for the same bytes share one computation.
+        With `owner` the value is cached for that user only.
+        Returns (value, cache_hit).
+        """
+        path = self._field_path(field, versioned, model_version, owner)
+        entry, source = await self._entry(db, digest)
+        stored = self._get_path(entry, path)
+        if stored is not None:
+            self._stats[field][source] += 1
+            await self._touch(db, digest, entry)
+            return decode(stored), True
+
+        key = (digest, path)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._stats[field]["memory"] += 1
+            return await asyncio.shield(pending), True
+
+        self._stats[field]["miss"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            future.set_result(value)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved – waiters (if any) re-raise it themselves
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        stored = encode(value)
+        # Mirror the nested Mongo document in the memory entry
+        node = entry
+        parts = path.split(".")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = stored
+        now = datetime.utcnow()
+        entry["last_used_at"] = now
+        self._remember(digest, entry)
+
+        await db.inference_cache.update_one(
+            {"_id": digest},
+            {"$set": {path: stored, "last_used_at": now}, "$setOnInsert": {"created_at": now}},
+            upsert=True
+        )
+        return value, False
+
+    def stats(self) -> Dict[str, Any]:
+        fields = {}
+        for field, counts in self._stats.items():
+            total = sum(counts.values())
+            hits = counts["memory"] + counts["mongo"]
+            fields[field] = {**counts, "hit_rate": round(hits / total, 3) if total else 0.0}
+        return {"memory_items": len(self._memory), "version": self._version(), "fields": fields}
+
+
+inference_cache = InferenceCache()
+
+
+async def ensure_indexes(db) -> None:
+    """TTL on last_used_at (refreshed by hits), so entries for images nobody re-uploads eventually go away."""
+    await db.inference_cache.create_index("last_used_at", expireAfterSeconds=CACHE_TTL_DAYS * 24 * 3600)
+    await db.wardrobe_items.create_index([("user_id", 1), ("content_hash", 1)])
+    await db.wardrobe_items.create_index([("user_id", 1), ("phash_bands", 1)])
+
+
+def features_to_list(features: np.ndarray) -> List[float]:
+    return np.asarray(features, dtype=np.float32).tolist()
+
+
+def features_from_list(values: List[float]) -> np.ndarray:
+    return np.asarray(values, dtype=np.float32)
+
+
+async def find_near_duplicates(
+    db,
+    user_id: str,
+    digest: str,
+    phash: Optional[str],
+    max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE,
+    limit: int = 5
+) -> List[Dict]:
+    """
+    Items in the user's closet that are the same photo (content hash) or look
+    almost identical (dHash within max_distance bits).
+
+    Candidates share at least one dHash band with the upload, which the
+    (user_id, phash_bands) index finds without reading the whole closet.
+    Items stored before bands existed are read once and get theirs here.
+    """
+    bands = phash_bands(phash)
+    items = await db.wardrobe_items.find(
+        {"user_id": user_id, "$or": [
+            {"content_hash": digest},
+            {"phash_bands": {"$in": bands}},
+            {"phash_bands": None, "phash": {"$exists": True}},
+        ]},
+        {"image_url": 1, "category": 1, "content_hash": 1, "phash": 1, "phash_bands": 1}
+    ).to_list(None)
+
+    legacy = [item for item in items if "phash_bands" not in item]
+    if legacy:
+        await db.wardrobe_items.bulk_write(
+            [UpdateOne({"_id": item["_id"]}, {"$set": {"phash_bands": phash_bands(item.get("phash"))}}) for item in legacy],
+            ordered=False
+        )
+
+    matches = []
+    for item in items:
+        if item.get("content_hash") == digest:
+            distance = 0
+        elif phash and item.get("phash"):
+            distance = hamming_distance(phash, item["phash"])
+        else:
+            continue
+        if distance <= max_distance:
+            matches.append({
+                "item_id": str(item["_id"]),
+                "image_url": item.get("image_url"),
+                "category": item.get("category"),
+                "distance": distance,
+                "exact_duplicate": item.get("content_hash") == digest
+            })
+    return sorted(matches, key=lambda m: m["distance"])[:limit]
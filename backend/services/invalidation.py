@@ -0,0 +1,333 @@
+# backend/services/invalidation.py
+"""
+Cross-worker invalidation for process-local caches.
+
+Every API process runs invalidation_loop (started from
+main.startup_db_client). It watches wardrobe_items, users and model_serving
+with one database-level change stream and hands each batch of changes to
+the listeners registered for that collection:
+
+    @on_invalidation("wardrobe_items")
+    async def _drop_closet_entries(db, events: List[Invalidation]): ...
+
+so a write made by another uvicorn worker or node reaches this process's
+caches within about a second. Only collections something listens to are
+watched (rewards are revalidated through user_versions, not cached).
+
+The resume token is stored in `change_stream_tokens`, one per process:
+workers sharing one would overwrite each other's position. By default
+each process leases the lowest free `invalidation:<host>:<n>` slot
+(claim_stream_slot), renewed with every token save and released on
+shutdown, so a restarted worker takes over its predecessor's slot and
+resumes its stream. Set INVALIDATION_STREAM_NAME to pin a name instead.
+Slots nobody has written for TOKEN_EXPIRE_DAYS are dropped. If the
+token has fallen off the oplog, listeners get a FLUSH event instead.
+
+A standalone mongod has no change streams. Then the loop polls
+`updated_at` every INVALIDATION_POLL_SECONDS, which misses deletes. To test
+the real thing locally, run a single-node replica set:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+    MONGO_URI="mongodb://localhost:27017/?replicaSet=rs0" python -m jobs.invalidation tail
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# ========== CONFIGURATION ==========
+INVALIDATION_ENABLED = os.getenv("INVALIDATION_ENABLED", "1") == "1"
+# Unset: a leased per-host worker slot (claim_stream_slot)
+INVALIDATION_STREAM_NAME = os.getenv("INVALIDATION_STREAM_NAME")
+HOST = socket.gethostname()
+PROCESS_OWNER = f"{HOST}:{os.getpid()}"
+WATCHED_COLLECTIONS = ("wardrobe_items", "users", "model_serving")
+INVALIDATION_POLL_SECONDS = float(os.getenv("INVALIDATION_POLL_SECONDS", "2"))
+# Documents changed this long before the last poll are looked at again (clock skew between nodes)
+POLL_SKEW = timedelta(seconds=float(os.getenv("INVALIDATION_POLL_SKEW_SECONDS", "5")))
+MAX_AWAIT_MS = 1000             # a quiet stream still yields (and publishes a partial batch) every second
+BATCH_SIZE = 500
+TOKEN_SAVE_SECONDS = 5          # resume token is written at most this often
+TOKEN_EXPIRE_DAYS = 7           # slots nobody has saved a token to for this long
+SLOT_LEASE = timedelta(seconds=30)  # a worker that stopped without releasing its slot frees it after this
+MAX_SLOTS = 64
+RETRY_BACKOFF_SECONDS = 5
+
+# Server error codes
+NOT_A_REPLICA_SET = 40573       # $changeStream on a standalone mongod
+HISTORY_LOST = (280, 286)       # ChangeStreamFatalError, ChangeStreamHistoryLost – token is unusable
+
+# operationType values passed through; drop/rename/invalidate become FLUSH
+OPERATIONS = ("insert", "update", "replace", "delete")
+FLUSH = "flush"
+
+invalidation_events = registry.counter(
+    "invalidation_events_total", "Changes published to process-local caches", ("collection", "operation")
+)
+invalidation_lag = registry.gauge("invalidation_lag_seconds", "Age of the newest change when it was published")
+invalidation_listener_errors = registry.counter(
+    "invalidation_listener_errors_total", "Invalidation listeners that raised", ("collection",)
+)
+
+
+@dataclass(frozen=True)
+class Invalidation:
+    collection: str
+    operation: str                      # insert / update / replace / delete, or FLUSH (forget everything)
+    document_id: Any = None             # _id of the changed document (None for FLUSH)
+    user_id: Optional[str] = None       # owner, when known (not for deletes)
+    changed_at: Optional[datetime] = None   # clusterTime of a streamed change, updated_at of a polled one
+
+
+Listener = Callable[[Any, List[Invalidation]], Awaitable[None]]
+
+_listeners: Dict[str, List[Listener]] = {}
+_state: Dict[str, Any] = {
+    "mode": "stopped", "stream": INVALIDATION_STREAM_NAME, "published": 0, "last_event_at": None, "resumed": False
+}
+
+
+def on_invalidation(*collections: str):
+    """Decorator: `@on_invalidation("wardrobe_items")` on an `async def listener(db, events)`."""
+    unknown = set(collections) - set(WATCHED_COLLECTIONS)
+    if unknown:
+        raise ValueError(f"Not watched for invalidation: {sorted(unknown)}")
+
+    def decorator(func: Listener) -> Listener:
+        for collection in collections:
+            _listeners.setdefault(collection, []).append(func)
+        return func
+    return decorator
+
+
+def _user_of(collection: str, doc: Optional[Dict]) -> Optional[str]:
+    if not doc:
+        return None
+    if collection == "users":
+        return str(doc["_id"])
+    user_id = doc.get("user_id")
+    return str(user_id) if user_id is not None else None
+
+
+async def publish(db, events: List[Invalidation]) -> None:
+    """Hand a batch to the listeners of each collection (one failing listener doesn't stop the rest)."""
+    by_collection: Dict[str, List[Invalidation]] = {}
+    for event in events:
+        by_collection.setdefault(event.collection, []).append(event)
+        invalidation_events.inc(collection=event.collection, operation=event.operation)
+    for collection, batch in by_collection.items():
+        for listener in _listeners.get(collection, ()):
+            try:
+                await listener(db, batch)
+            except Exception:
+                invalidation_listener_errors.inc(collection=collection)
+                logger.exception(f"Invalidation listener {listener.__qualname__} failed on {collection}")
+    _state["published"] += len(events)
+
+
+async def flush_all(db) -> None:
+    await publish(db, [Invalidation(collection, FLUSH) for collection in WATCHED_COLLECTIONS])
+
+
+# ========== RESUME TOKEN ==========
+async def claim_stream_slot(db, host: str = HOST, owner: str = PROCESS_OWNER) -> str:
+    """
+    Lease the lowest `invalidation:<host>:<n>` slot no live process holds. Its
+    stored token is the one the previous holder (e.g. this worker before a
+    restart) left, so the stream resumes instead of starting from "now".
+    """
+    for n in range(MAX_SLOTS):
+        name = f"invalidation:{host}:{n}"
+        now = datetime.utcnow()
+        try:
+            await db.change_stream_tokens.update_one(
+                {"_id": name, "$or": [
+                    {"owner": owner}, {"lease_until": {"$lt": now}}, {"lease_until": {"$exists": False}}
+                ]},
+                {"$set": {"owner": owner, "lease_until": now + SLOT_LEASE, "updated_at": now}},
+                upsert=True
+            )
+            return name
+        except DuplicateKeyError:
+            continue    # held by another worker
+    logger.warning(f"All {MAX_SLOTS} invalidation slots on {host} are leased, using a one-off stream")
+    return f"invalidation:{owner}"
+
+
+async def release_stream_slot(db, name: str, owner: str = PROCESS_OWNER) -> None:
+    await db.change_stream_tokens.update_one(
+        {"_id": name, "owner": owner}, {"$unset": {"lease_until": ""}}
+    )
+
+
+async def load_token(db, name: str) -> Optional[Dict]:
+    doc = await db.change_stream_tokens.find_one({"_id": name})
+    return doc.get("token") if doc else None
+
+
+async def save_token(db, name: str, token: Optional[Dict], owner: str = PROCESS_OWNER) -> None:
+    """Store the token, renewing the slot lease – or with None, forget it (the lease stays as it is)."""
+    if token is None:
+        await db.change_stream_tokens.update_one({"_id": name}, {"$unset": {"token": ""}})
+        return
+    now = datetime.utcnow()
+    await db.change_stream_tokens.update_one(
+        {"_id": name},
+        {"$set": {"token": token, "owner": owner, "lease_until": now + SLOT_LEASE, "updated_at": now}},
+        upsert=True
+    )
+
+
+# ========== CHANGE STREAM ==========
+def _pipeline() -> List[Dict]:
+    return [
+        {"$match": {"ns.coll": {"$in": list(WATCHED_COLLECTIONS)}}},
+        # Post-image only for its owner – updates of wardrobe_items carry whole embeddings
+        {"$project": {"operationType": 1, "ns": 1, "documentKey": 1, "clusterTime": 1, "fullDocument.user_id": 1}},
+    ]
+
+
+def _events(change: Dict) -> List[Invalidation]:
+    collection = change.get("ns", {}).get("coll")
+    operation = change["operationType"]
+    if operation not in OPERATIONS:
+        # drop / rename of one collection, or the whole database (no ns.coll)
+        return [Invalidation(c, FLUSH) for c in ([collection] if collection else WATCHED_COLLECTIONS)]
+    document_id = change["documentKey"]["_id"]
+    changed_at = datetime.utcfromtimestamp(change["clusterTime"].time) if "clusterTime" in change else None
+    if collection == "users":
+        return [Invalidation(collection, operation, document_id, str(document_id), changed_at)]
+    owner = _user_of(collection, change.get("fullDocument"))
+    return [Invalidation(collection, operation, document_id, owner, changed_at)]
+
+
+async def _watch(db, name: str, token: Optional[Dict]) -> None:
+    """Stream changes until an error; the token is saved as batches are published."""
+    saved_at = time.monotonic()
+    _state["resumed"] = token is not None
+    async with db.watch(
+        _pipeline(), full_document="updateLookup", resume_after=token,
+        max_await_time_ms=MAX_AWAIT_MS, batch_size=BATCH_SIZE
+    ) as stream:
+        _state["mode"] = "change_stream"
+        batch: List[Invalidation] = []
+        newest = None
+        while True:
+            change = await stream.try_next()
+            if change is not None:
+                batch.extend(_events(change))
+                newest = change.get("clusterTime") or newest
+                if len(batch) < BATCH_SIZE:
+                    continue
+            if batch:
+                await publish(db, batch)
+                batch = []
+                _state["last_event_at"] = datetime.utcnow()
+                if newest is not None:
+                    invalidation_lag.set(max(time.time() - newest.time, 0))
+            if time.monotonic() - saved_at >= TOKEN_SAVE_SECONDS and stream.resume_token is not None:
+                await save_token(db, name, stream.resume_token)
+                saved_at = time.monotonic()
+
+
+# ========== POLLING FALLBACK ==========
+async def _poll(db) -> None:
+    """Standalone mongod: changed documents by updated_at (no deletes)."""
+    _state["mode"] = "polling"
+    since = datetime.utcnow() - POLL_SKEW
+    seen: Dict[Tuple[str, Any], datetime] = {}
+    while True:
+        started = datetime.utcnow()
+        events = []
+        try:
+            for collection in WATCHED_COLLECTIONS:
+                async for doc in db[collection].find({"updated_at": {"$gt": since}}, {"user_id": 1, "updated_at": 1}):
+                    key = (collection, doc["_id"])
+                    if seen.get(key) == doc["updated_at"]:
+                        continue        # already published in an earlier, overlapping poll
+                    seen[key] = doc["updated_at"]
+                    events.append(
+                        Invalidation(collection, "update", doc["_id"], _user_of(collection, doc), doc["updated_at"])
+                    )
+        except PyMongoError as e:
+            # Nothing is lost: `since` stays put, so the next poll covers this window too
+            logger.warning(f"Invalidation poll failed ({e})")
+            await asyncio.sleep(RETRY_BACKOFF_SECONDS)
+            continue
+        if events:
+            await publish(db, events)
+            _state["last_event_at"] = started
+        since = started - POLL_SKEW
+        seen = {key: at for key, at in seen.items() if at > since}
+        await asyncio.sleep(INVALIDATION_POLL_SECONDS)
+
+
+async def invalidation_loop(db, name: Optional[str] = INVALIDATION_STREAM_NAME) -> None:
+    """
+    Change stream with resume, falling back to polling on a standalone mongod. Runs until cancelled.
+    Without a name the process leases a worker slot (claim_stream_slot) and releases it when it stops.
+    """
+    leased = name is None
+    if leased:
+        name = await claim_stream_slot(db)
+    _state["stream"] = name
+    try:
+        await _stream_or_poll(db, name)
+    finally:
+        if leased:
+            try:
+                await release_stream_slot(db, name)
+            except PyMongoError:
+                pass    # the lease runs out on its own
+
+
+async def _stream_or_poll(db, name: str) -> None:
+    while True:
+        try:
+            # After an error: resume from the last saved token – changes since then are published again, which is harmless
+            await _watch(db, name, await load_token(db, name))
+        except OperationFailure as e:
+            if e.code == NOT_A_REPLICA_SET:
+                logger.info("MongoDB has no change streams (standalone) – polling updated_at for invalidation")
+                await _poll(db)
+                return
+            if e.code in HISTORY_LOST:
+                logger.warning(f"Invalidation resume token for '{name}' is no longer in the oplog – flushing caches")
+                await save_token(db, name, None)
+                await flush_all(db)
+                continue
+            logger.warning(f"Invalidation change stream failed ({e}), retrying in {RETRY_BACKOFF_SECONDS}s")
+        except PyMongoError as e:
+            logger.warning(f"Invalidation change stream failed ({e}), retrying in {RETRY_BACKOFF_SECONDS}s")
+        _state["mode"] = "reconnecting"
+        await asyncio.sleep(RETRY_BACKOFF_SECONDS)
+
+
+async def ensure_indexes(db) -> None:
+    """updated_at on the watched collections (only the polling fallback queries it) + token expiry."""
+    for collection in WATCHED_COLLECTIONS:
+        await db[collection].create_index("updated_at")
+    await db.change_stream_tokens.create_index("updated_at", expireAfterSeconds=TOKEN_EXPIRE_DAYS * 24 * 3600)
+
+
+def invalidation_stats() -> Dict[str, Any]:
+    return {
+        "enabled": INVALIDATION_ENABLED,
+        "stream": _state["stream"],
+        "listeners": {collection: len(listeners) for collection, listeners in _listeners.items()},
+        "mode": _state["mode"],
+        "resumed": _state["resumed"],
+        "published": _state["published"],
+        "last_event_at": _state["last_event_at"].isoformat() if _state["last_event_at"] else None,
+    }
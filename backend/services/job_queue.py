@@ -0,0 +1,258 @@
+# backend/services/job_queue.py
+import asyncio
+import logging
+import os
+import socket
+import traceback
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# ========== CONFIGURATION ==========
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))          # worker tasks per API process (0 = separate worker process)
+VISIBILITY_TIMEOUT = timedelta(seconds=int(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "120")))
+POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "0.5"))
+# A running job's visibility is pushed out this often, so slow handlers (or ones waiting for
+# inference admission) aren't re-claimed by another worker halfway through
+HEARTBEAT_SECONDS = VISIBILITY_TIMEOUT.total_seconds() / 3
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 5       # 5s, 10s, 20s, ...
+
+JobHandler = Callable[[Any, Dict[str, Any]], Awaitable[None]]
+FailureHandler = Callable[[Any, Dict[str, Any], str], Awaitable[None]]
+
+_handlers: Dict[str, JobHandler] = {}
+_failure_handlers: Dict[str, FailureHandler] = {}
+
+# Recent wait (queued → started) and run times in seconds, for /health and metrics
+_recent_wait: Deque[float] = deque(maxlen=500)
+_recent_run: Deque[float] = deque(maxlen=500)
+_counters: Dict[str, int] = {"completed": 0, "retried": 0, "failed": 0}
+
+
+def register_handler(kind: str, on_failure: Optional[FailureHandler] = None):
+    """Decorator: `@register_handler("enrich_item")` on an `async def handler(db, payload)`."""
+    def decorator(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        if on_failure is not None:
+            _failure_handlers[kind] = on_failure
+        return func
+    return decorator
+
+
+async def ensure_indexes(db) -> None:
+    await db.jobs.create_index([("status", 1), ("visible_at", 1)])
+
+
+async def enqueue(db, kind: str, payload: Dict[str, Any], max_attempts: int = MAX_ATTEMPTS) -> str:
+    now = datetime.utcnow()
+    result = await db.jobs.insert_one({
+        "kind": kind,
+        "payload": payload,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "visible_at": now,
+        "created_at": now,
+        "updated_at": now,
+    })
+    return str(result.inserted_id)
+
+
+async def claim(db, worker_id: str, kinds: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Atomically take the next visible job. A running job whose visibility
+    timeout expired (worker crashed / hung) is visible again and gets re-claimed,
+    unless that was its last attempt – reap_exhausted() fails those.
+    """
+    now = datetime.utcnow()
+    query: Dict[str, Any] = {
+        "status": {"$in": ["queued", "running"]},
+        "visible_at": {"$lte": now},
+        "$expr": {"$lt": ["$attempts", "$max_attempts"]},
+    }
+    if kinds:
+        query["kind"] = {"$in": kinds}
+    return await db.jobs.find_one_and_update(
+        query,
+        {
+            "$set": {
+                "status": "running",
+                "worker": worker_id,
+                "started_at": now,
+                "visible_at": now + VISIBILITY_TIMEOUT,
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("visible_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _warn_if_lost(job: Dict[str, Any], result, action: str) -> None:
+    if not result.matched_count:
+        logger.warning(f"Job {job['_id']} ({job['kind']}) was re-claimed by another worker, not {action}")
+
+
+async def complete(db, job: Dict[str, Any]) -> None:
+    now = datetime.utcnow()
+    result = await db.jobs.update_one(
+        {"_id": job["_id"], "worker": job["worker"]},
+        {"$set": {"status": "done", "finished_at": now, "updated_at": now}}
+    )
+    if not result.matched_count:
+        _warn_if_lost(job, result, "marking it done")
+        return      # counted by the worker that has it now
+    _counters["completed"] += 1
+
+
+async def fail(db, job: Dict[str, Any], error: str) -> None:
+    now = datetime.utcnow()
+    if job["attempts"] < job.get("max_attempts", MAX_ATTEMPTS):
+        delay = RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1)
+        result = await db.jobs.update_one(
+            {"_id": job["_id"], "worker": job["worker"]},
+            {"$set": {"status": "queued", "visible_at": now + timedelta(seconds=delay),
+                      "last_error": error, "updated_at": now}}
+        )
+        if not result.matched_count:
+            _warn_if_lost(job, result, "retrying it")
+            return
+        _counters["retried"] += 1
+        return
+
+    result = await db.jobs.update_one(
+        {"_id": job["_id"], "worker": job["worker"]},
+        {"$set": {"status": "failed", "finished_at": now, "last_error": error, "updated_at": now}}
+    )
+    if not result.matched_count:
+        _warn_if_lost(job, result, "failing it")
+        return      # the worker that has it now decides
+    await _failed(db, job, error)
+
+
+async def _failed(db, job: Dict[str, Any], error: str) -> None:
+    _counters["failed"] += 1
+    on_failure = _failure_handlers.get(job["kind"])
+    if on_failure is not None:
+        await on_failure(db, job["payload"], error)
+
+
+async def reap_exhausted(db, kinds: Optional[List[str]] = None) -> int:
+    """
+    Fail running jobs whose visibility timeout expired on their last attempt
+    (the worker died or hung) – claim() no longer hands them out.
+    """
+    query: Dict[str, Any] = {"status": "running", "$expr": {"$gte": ["$attempts", "$max_attempts"]}}
+    if kinds:
+        query["kind"] = {"$in": kinds}
+    error = "visibility timeout expired on the last attempt"
+    reaped = 0
+    while True:
+        now = datetime.utcnow()
+        job = await db.jobs.find_one_and_update(
+            {**query, "visible_at": {"$lte": now}},
+            {"$set": {"status": "failed", "finished_at": now, "last_error": error, "updated_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            return reaped
+        logger.error(f"Job {job['_id']} ({job['kind']}) timed out on attempt {job['attempts']}, giving up")
+        reaped += 1
+        await _failed(db, job, error)
+
+
+async def _heartbeat(db, job: Dict[str, Any], interval: float) -> None:
+    """Keep extending the job's visibility while its handler runs."""
+    while True:
+        await asyncio.sleep(interval)
+        now = datetime.utcnow()
+        try:
+            result = await db.jobs.update_one(
+                {"_id": job["_id"], "worker": job["worker"], "status": "running"},
+                {"$set": {"visible_at": now + VISIBILITY_TIMEOUT, "updated_at": now}}
+            )
+        except PyMongoError as e:
+            logger.warning(f"Heartbeat for job {job['_id']} failed ({e})")
+            continue
+        if not result.matched_count:
+            logger.warning(f"Job {job['_id']} ({job['kind']}) was re-claimed by another worker while running")
+            return
+
+
+async def _run_handler(db, job: Dict[str, Any]) -> None:
+    heartbeat = asyncio.create_task(_heartbeat(db, job, HEARTBEAT_SECONDS))
+    try:
+        await _handlers[job["kind"]](db, job["payload"])
+    finally:
+        heartbeat.cancel()
+
+
+async def run_one(db, worker_id: str) -> bool:
+    """Claim and run a single job. Returns False when the queue was empty."""
+    job = await claim(db, worker_id, kinds=list(_handlers))
+    if job is None:
+        await reap_exhausted(db, kinds=list(_handlers))
+        return False
+
+    _recent_wait.append((job["started_at"] - job["created_at"]).total_seconds())
+    started = datetime.utcnow()
+    try:
+        await _run_handler(db, job)
+    except Exception as e:
+        logger.error(f"Job {job['_id']} ({job['kind']}) attempt {job['attempts']} failed:\n{traceback.format_exc()}")
+        await fail(db, job, str(e))
+    else:
+        await complete(db, job)
+    finally:
+        _recent_run.append((datetime.utcnow() - started).total_seconds())
+    return True
+
+
+async def worker_loop(db, worker_id: str, poll_interval: float = POLL_INTERVAL_SECONDS):
+    logger.info(f"Job worker {worker_id} started ({', '.join(_handlers) or 'no handlers'})")
+    while True:
+        try:
+            if not await run_one(db, worker_id):
+                await asyncio.sleep(poll_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job worker {worker_id} error: {e}")
+            await asyncio.sleep(poll_interval)
+
+
+def start_workers(db, count: int = JOB_WORKERS) -> List[asyncio.Task]:
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    return [asyncio.create_task(worker_loop(db, f"{prefix}:{i}")) for i in range(count)]
+
+
+def _percentile(values: Deque[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 3)
+
+
+async def queue_stats(db) -> Dict[str, Any]:
+    """Queue depth per status + recent wait/run latency (this process only)."""
+    counts = await db.jobs.aggregate([
+        {"$match": {"status": {"$in": ["queued", "running", "failed"]}}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]).to_list(10)
+    oldest = await db.jobs.find_one({"status": "queued"}, {"created_at": 1}, sort=[("created_at", 1)])
+    return {
+        "depth": {doc["_id"]: doc["count"] for doc in counts},
+        "oldest_queued_seconds": round((datetime.utcnow() - oldest["created_at"]).total_seconds(), 1) if oldest else 0,
+        "wait_seconds_p50": _percentile(_recent_wait, 0.5),
+        "wait_seconds_p95": _percentile(_recent_wait, 0.95),
+        "run_seconds_p50": _percentile(_recent_run, 0.5),
+        "run_seconds_p95": _percentile(_recent_run, 0.95),
+        **_counters,
+    }
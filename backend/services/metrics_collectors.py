@@ -0,0 +1,64 @@
+# backend/services/metrics_collectors.py
+"""
+Scrape-time collectors: mirror stats that other services already keep
+(inference cache hit/miss counts, job queue depth and latency, shared
+cache hit rates) into the /metrics registry instead of counting twice on
+the hot path.
+"""
+from metrics import registry
+from services.inference_cache import inference_cache
+from services.job_queue import queue_stats
+from services.shared_cache import shared_cache
+
+inference_cache_lookups = registry.counter(
+    "inference_cache_lookups_total", "Inference cache lookups by field and where they were served from",
+    ("field", "source")
+)
+inference_cache_memory_items = registry.gauge("inference_cache_memory_items", "Entries in the in-process LRU")
+job_queue_depth = registry.gauge("job_queue_depth", "Jobs by status", ("status",))
+job_queue_oldest_queued = registry.gauge("job_queue_oldest_queued_seconds", "Age of the oldest queued job")
+job_queue_latency = registry.gauge(
+    "job_queue_latency_seconds", "Recent job wait/run time percentiles (this process)", ("phase", "quantile")
+)
+job_queue_outcomes = registry.counter("job_queue_jobs_total", "Jobs finished by this process", ("outcome",))
+cache_hit_ratio = registry.gauge(
+    "cache_hit_ratio", "Share of two-tier cache lookups answered without computing (this process)", ("namespace",)
+)
+cache_local_items = registry.gauge("cache_local_items", "Entries in the process tier", ("namespace",))
+
+
+async def collect_inference_cache(db) -> None:
+    stats = inference_cache.stats()
+    inference_cache_memory_items.set(stats["memory_items"])
+    for field, counts in stats["fields"].items():
+        for source in ("memory", "mongo", "miss"):
+            inference_cache_lookups.set(counts[source], field=field, source=source)
+
+
+async def collect_job_queue(db) -> None:
+    if db is None:
+        return
+    stats = await queue_stats(db)
+    for job_status in ("queued", "running", "failed"):
+        job_queue_depth.set(stats["depth"].get(job_status, 0), status=job_status)
+    job_queue_oldest_queued.set(stats["oldest_queued_seconds"])
+    for phase in ("wait", "run"):
+        for suffix, quantile in (("p50", "0.5"), ("p95", "0.95")):
+            value = stats[f"{phase}_seconds_{suffix}"]
+            if value is not None:
+                job_queue_latency.set(value, phase=phase, quantile=quantile)
+    for outcome in ("completed", "retried", "failed"):
+        job_queue_outcomes.set(stats[outcome], outcome=outcome)
+
+
+async def collect_shared_cache(db) -> None:
+    for name, stats in shared_cache.stats()["namespaces"].items():
+        cache_local_items.set(stats["local_items"], namespace=name)
+        if stats["hit_rate"] is not None:
+            cache_hit_ratio.set(stats["hit_rate"], namespace=name)
+
+
+def register_collectors() -> None:
+    registry.register_collector(collect_inference_cache)
+    registry.register_collector(collect_job_queue)
+    registry.register_collector(collect_shared_cache)
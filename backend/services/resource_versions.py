@@ -0,0 +1,43 @@
+# backend/services/resource_versions.py
+"""
+Per-user version counters for conditional GETs.
+
+Every write that changes what a user's /analytics or /trends (scope
+"closet") or /rewards (scope "rewards") would return bumps the matching
+counter in `user_versions`. The endpoints build their ETag from it, so
+answering a revalidation with 304 costs one find_one by _id instead of
+the aggregations behind the response.
+"""
+from datetime import datetime
+from typing import Dict, Iterable
+
+from pymongo import UpdateOne
+
+CLOSET = "closet"       # wardrobe items: uploads, enrichment, wears, reclassification
+REWARDS = "rewards"     # points and badges
+SCOPES = (CLOSET, REWARDS)
+
+
+async def bump_version(db, user_id: str, *scopes: str) -> None:
+    await db.user_versions.update_one(
+        {"_id": user_id},
+        {"$inc": {scope: 1 for scope in scopes}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+async def bump_versions(db, user_ids: Iterable[str], *scopes: str) -> None:
+    """Same for many users at once (batch jobs)."""
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne({"_id": user_id}, {"$inc": {scope: 1 for scope in scopes}, "$set": {"updated_at": now}}, upsert=True)
+        for user_id in set(user_ids)
+    ]
+    if ops:
+        await db.user_versions.bulk_write(ops, ordered=False)
+
+
+async def get_versions(db, user_id: str) -> Dict[str, int]:
+    """Current counters – 0 for a user nothing has been written for since versions were introduced."""
+    doc = await db.user_versions.find_one({"_id": user_id}) or {}
+    return {scope: doc.get(scope, 0) for scope in SCOPES}
@@ -0,0 +1,333 @@
+# backend/services/shared_cache.py
+"""
+Two-tier cache: a small LRU in each process in front of a shared
+Redis-protocol store. N workers on M nodes then compute a value once
+instead of N×M times, and they all see the same hit rate.
+
+    analytics_cache = shared_cache.namespace("analytics", ttl=6 * 3600, local_ttl=60)
+    summary = await analytics_cache.get_or_compute(key, lambda: get_analytics_summary(db, user_id))
+
+CACHE_REDIS_URL can be:
+  - redis://host:6379/0 for redis-server, Valkey, KeyDB and the like;
+  - "fakeredis://", an in-process stand-in for tests and single-process dev
+    (fakeredis, in requirements-dev.txt);
+  - empty, for the process tier only.
+
+Values are msgpack. datetime and ObjectId survive the round trip; tuples
+come back as lists. Keys are "<CACHE_KEY_PREFIX>:<namespace>:<key>".
+Shared entries expire after the namespace TTL (or a shorter one that
+get_or_compute's ttl_for picks per value), ±10% so entries written
+together don't all expire together. Process entries expire after
+local_ttl, which bounds how stale a worker can be when nobody invalidates
+it (see services/invalidation.py).
+
+Stampedes: concurrent misses in one process share one computation. Across
+processes, the first to take a short Redis lock computes. The others poll
+the shared tier for its result, and compute themselves if it doesn't show
+up in time. None is never cached.
+
+The shared tier is best effort. While Redis is unreachable, lookups count
+as misses and values are computed as if it weren't configured.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import msgpack
+from bson import ObjectId
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# ========== CONFIGURATION ==========
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "wardrobe")
+# A computation holding the lock longer than this is presumed dead and others go ahead
+CACHE_LOCK_SECONDS = float(os.getenv("CACHE_LOCK_SECONDS", "10"))
+REDIS_TIMEOUT_SECONDS = float(os.getenv("CACHE_REDIS_TIMEOUT_SECONDS", "0.25"))
+LOCK_POLL_SECONDS = 0.05
+TTL_JITTER = 0.1
+ERROR_LOG_INTERVAL_SECONDS = 60
+
+_UNAVAILABLE = object()     # the shared tier failed (vs. a miss)
+_EXT_DATETIME = 1
+_EXT_OBJECTID = 2
+
+cache_requests = registry.counter(
+    "cache_requests_total", "Two-tier cache lookups by namespace, tier and outcome", ("namespace", "tier", "outcome")
+)
+cache_computations = registry.counter("cache_computations_total", "Values computed after a miss", ("namespace",))
+cache_errors = registry.counter("cache_shared_errors_total", "Failed calls to the shared tier", ("namespace",))
+
+ComputeFn = Callable[[], Awaitable[Any]]
+TtlFn = Callable[[Any], Optional[float]]     # computed value → its TTL (None = the namespace's)
+
+
+# ========== SERIALIZATION ==========
+def _default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode())
+    if isinstance(obj, ObjectId):
+        return msgpack.ExtType(_EXT_OBJECTID, obj.binary)
+    if hasattr(obj, "tolist"):      # NumPy arrays and scalars
+        return obj.tolist()
+    raise TypeError(f"Can't cache {type(obj).__name__}")
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == _EXT_OBJECTID:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+def packb(value: Any) -> bytes:
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+def unpackb(data: bytes) -> Any:
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+# ========== TIERS ==========
+class _LocalTier:
+    """LRU of packed values with per-entry expiry (unpacked on every hit, so callers can't share a mutable object)."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, data: bytes, ttl: float) -> None:
+        self._items[key] = (time.monotonic() + ttl, data)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+def _connect(url: str):
+    if not url:
+        return None
+    if url.startswith("fakeredis://"):
+        import fakeredis     # test / dev dependency only
+        return fakeredis.FakeAsyncRedis()
+    import redis.asyncio as redis
+    return redis.from_url(url, socket_timeout=REDIS_TIMEOUT_SECONDS, socket_connect_timeout=REDIS_TIMEOUT_SECONDS)
+
+
+class CacheNamespace:
+    def __init__(self, cache: "TieredCache", name: str, ttl: float, local_ttl: float, local_items: int):
+        self.cache = cache
+        self.name = name
+        self.ttl = ttl
+        self.local_ttl = min(local_ttl, ttl)
+        self._local = _LocalTier(local_items)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # (tier, outcome) → count, mirrored in cache_requests_total
+        self._counts: Dict[Tuple[str, str], int] = {}
+        self._computed = 0
+
+    def _count(self, tier: str, outcome: str) -> None:
+        cache_requests.inc(namespace=self.name, tier=tier, outcome=outcome)
+        self._counts[(tier, outcome)] = self._counts.get((tier, outcome), 0) + 1
+
+    def _key(self, key: str) -> str:
+        return f"{CACHE_KEY_PREFIX}:{self.name}:{key}"
+
+    def _jittered_ttl(self, ttl: Optional[float] = None) -> int:
+        return max(1, int((ttl or self.ttl) * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER)))
+
+    def _local_ttl(self, ttl: Optional[float] = None) -> float:
+        return min(self.local_ttl, ttl) if ttl else self.local_ttl
+
+    async def _shared(self, op: str, *args, on_error: Any = None, **kwargs) -> Any:
+        """One call to the shared tier – None when there is none, `on_error` when it failed."""
+        if self.cache.redis is None:
+            return None
+        try:
+            return await getattr(self.cache.redis, op)(*args, **kwargs)
+        except Exception as e:
+            cache_errors.inc(namespace=self.name)
+            self.cache.log_error(e)
+            return on_error
+
+    async def get(self, key: str) -> Any:
+        """Cached value or None (no computation)."""
+        data = self._local.get(key)
+        if data is None:
+            data = await self._shared("get", self._key(key))
+            if data is not None:
+                self._local.set(key, data, self.local_ttl)
+        return unpackb(data) if data is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        data = packb(value)
+        self._local.set(key, data, self._local_ttl(ttl))
+        await self._shared("set", self._key(key), data, ex=self._jittered_ttl(ttl))
+
+    async def delete(self, *keys: str) -> None:
+        """Both tiers here; other processes' copies live until local_ttl unless they're told too."""
+        for key in keys:
+            self._local.delete(key)
+        if keys:
+            await self._shared("delete", *(self._key(k) for k in keys))
+
+    def clear_local(self) -> None:
+        self._local.clear()
+
+    async def get_or_compute(self, key: str, compute: ComputeFn, ttl_for: Optional[TtlFn] = None) -> Any:
+        """ttl_for: shorter lifetimes for some computed values (e.g. fallbacks after an upstream error)."""
+        data = self._local.get(key)
+        if data is not None:
+            self._count("local", "hit")
+            return unpackb(data)
+        self._count("local", "miss")
+
+        # Concurrent misses in this process share one lookup / computation
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._count("inflight", "hit")
+            data = await asyncio.shield(pending)
+            return unpackb(data) if data is not None else None
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value, data = await self._load_or_compute(key, compute, ttl_for)
+            future.set_result(data)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved – waiters re-raise it themselves
+            raise
+        finally:
+            if not future.done():
+                future.cancel()     # we were cancelled – so are the requests waiting on us
+            self._inflight.pop(key, None)
+        return value
+
+    async def _load_or_compute(
+        self, key: str, compute: ComputeFn, ttl_for: Optional[TtlFn] = None
+    ) -> Tuple[Any, Optional[bytes]]:
+        shared_key = self._key(key)
+        data = await self._shared("get", shared_key)
+        if data is not None:
+            self._count("shared", "hit")
+            self._local.set(key, data, self.local_ttl)
+            return unpackb(data), data
+
+        lock_key = f"{shared_key}:lock"
+        locked = False
+        if self.cache.redis is not None:
+            self._count("shared", "miss")
+            # Redis failing → compute right away rather than wait on a result that can't arrive
+            locked = await self._shared(
+                "set", lock_key, self.cache.owner, nx=True, px=int(CACHE_LOCK_SECONDS * 1000), on_error=_UNAVAILABLE
+            )
+            if locked is _UNAVAILABLE:
+                locked = False
+            elif not locked:
+                data = await self._wait_for(shared_key)
+                if data is not None:
+                    self._count("shared", "waited")
+                    self._local.set(key, data, self.local_ttl)
+                    return unpackb(data), data
+
+        try:
+            value = await compute()
+            self._computed += 1
+            cache_computations.inc(namespace=self.name)
+            if value is None:
+                return None, None
+            ttl = ttl_for(value) if ttl_for is not None else None
+            data = packb(value)
+            self._local.set(key, data, self._local_ttl(ttl))
+            await self._shared("set", shared_key, data, ex=self._jittered_ttl(ttl))
+            return value, data
+        finally:
+            if locked:
+                # Not compare-and-delete: if we overran the lock, someone else may hold it now –
+                # deleting it costs at most one extra computation
+                await self._shared("delete", lock_key)
+
+    async def _wait_for(self, shared_key: str) -> Optional[bytes]:
+        """Another process is computing: wait (up to the lock timeout) for its result."""
+        deadline = time.monotonic() + CACHE_LOCK_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+            data = await self._shared("get", shared_key, on_error=_UNAVAILABLE)
+            if data is _UNAVAILABLE:
+                return None
+            if data is not None:
+                return data
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        counts = self._counts
+        lookups = counts.get(("local", "hit"), 0) + counts.get(("local", "miss"), 0)
+        hits = sum(counts.get(c, 0) for c in (("local", "hit"), ("inflight", "hit"), ("shared", "hit"), ("shared", "waited")))
+        return {
+            "ttl_s": self.ttl,
+            "local_ttl_s": self.local_ttl,
+            "local_items": len(self._local),
+            "lookups": lookups,
+            **{f"{tier}_{outcome}": n for (tier, outcome), n in counts.items()},
+            "computed": self._computed,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+        }
+
+
+class TieredCache:
+    def __init__(self, url: str = CACHE_REDIS_URL):
+        self.url = url
+        self.redis = _connect(url)
+        self.owner = uuid.uuid4().hex      # lock value – tells whose lock it is when debugging
+        self.namespaces: Dict[str, CacheNamespace] = {}
+        self._last_error_log = 0.0
+
+    def namespace(self, name: str, ttl: float, local_ttl: float = 30, local_items: int = 1024) -> CacheNamespace:
+        if name in self.namespaces:
+            raise ValueError(f"Cache namespace {name} already exists")
+        self.namespaces[name] = CacheNamespace(self, name, ttl, local_ttl, local_items)
+        return self.namespaces[name]
+
+    def log_error(self, error: Exception) -> None:
+        now = time.monotonic()
+        if now - self._last_error_log >= ERROR_LOG_INTERVAL_SECONDS:
+            self._last_error_log = now
+            logger.warning(f"Shared cache unavailable ({error}) – computing values locally")
+
+    async def close(self) -> None:
+        if self.redis is not None:
+            await self.redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        backend = "none" if self.redis is None else self.url.split("://", 1)[0]
+        return {"shared": backend, "namespaces": {name: ns.stats() for name, ns in self.namespaces.items()}}
+
+
+shared_cache = TieredCache()
@@ -1,11 +1,18 @@
 # backend/services/social_scouting.py
+import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import traceback
 
+from services.shared_cache import shared_cache
+
 # Cache key in MongoDB
 TREND_CACHE_KEY = "kenyan_fashion_trends_current"
 
+# The trend_cache document and per-user matches, shared by all workers.
+# Matches are keyed by closet version + trends updated_at, so they never need invalidating.
+trends_cache = shared_cache.namespace("trends", ttl=int(os.getenv("TRENDS_CACHE_TTL_SECONDS", "3600")), local_ttl=30)
+
 # Hardcoded fallback trends (used if X fetch fails or rate-limited)
 FALLBACK_TRENDS = [
     {
@@ -68,6 +75,7 @@ async def refresh_trends_cache(db):
             },
             upsert=True
         )
+        await trends_cache.delete(TREND_CACHE_KEY)
         return trends
 
     except Exception as e:
@@ -77,17 +85,50 @@ async def refresh_trends_cache(db):
         return cache["data"] if cache else FALLBACK_TRENDS
 
 
+async def _trend_doc(db) -> Optional[Dict]:
+    """The unexpired trend_cache document, None if there is none"""
+    cache = await trends_cache.get_or_compute(
+        TREND_CACHE_KEY, lambda: db.trend_cache.find_one({"key": TREND_CACHE_KEY}, {"_id": 0})
+    )
+    if cache and cache.get("expires_at", datetime.min) <= datetime.utcnow():
+        # Our copy may predate another worker's refresh – ask MongoDB before refreshing ourselves
+        await trends_cache.delete(TREND_CACHE_KEY)
+        cache = await db.trend_cache.find_one({"key": TREND_CACHE_KEY}, {"_id": 0})
+    if cache and cache.get("expires_at", datetime.min) > datetime.utcnow():
+        return cache
+    return None
+
+
 async def get_current_trends(db) -> List[Dict]:
     """
     Get latest cached trends (refresh if expired)
     """
-    cache = await db.trend_cache.find_one({"key": TREND_CACHE_KEY})
-    if cache and cache.get("expires_at", datetime.min) > datetime.utcnow():
+    cache = await _trend_doc(db)
+    if cache:
         return cache["data"]
 
     return await refresh_trends_cache(db)
 
 
+async def trends_updated_at(db) -> Optional[datetime]:
+    """
+    When the cached trends were fetched, None if there is no unexpired cache
+    (the next get_current_trends call would refresh it)
+    """
+    cache = await _trend_doc(db)
+    return cache.get("updated_at") if cache else None
+
+
+async def cached_trend_matches(
+    db, user_id: str, trends: List[Dict], closet_version: int, updated_at: datetime
+) -> List[Dict]:
+    """match_trends_to_user_closet, computed once per closet version and trend refresh"""
+    return await trends_cache.get_or_compute(
+        f"matches:{user_id}:{closet_version}:{updated_at.isoformat()}",
+        lambda: match_trends_to_user_closet(db, user_id, trends)
+    )
+
+
 async def match_trends_to_user_closet(
     db,
     user_id: str,
@@ -0,0 +1,87 @@
+# backend/services/thumbnails.py
+import asyncio
+import logging
+import os
+from io import BytesIO
+from typing import Dict, Iterable, Optional, Tuple
+
+from PIL import Image, ImageOps, features
+
+from metrics import span
+from services.inference_cache import inference_cache
+from storage_utils import get_storage
+
+logger = logging.getLogger(__name__)
+
+# ========== CONFIGURATION ==========
+THUMBNAIL_SIZES = tuple(sorted(int(s) for s in os.getenv("THUMBNAIL_SIZES", "128,256,512").split(",")))
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "webp").lower()   # webp | jpeg
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_FOLDER = "thumbnails"
+
+
+def output_format() -> Tuple[str, str, str]:
+    """(PIL format, file extension, content type) – JPEG if this Pillow build lacks WebP."""
+    if THUMBNAIL_FORMAT == "webp" and features.check("webp"):
+        return "WEBP", "webp", "image/webp"
+    return "JPEG", "jpg", "image/jpeg"
+
+
+def thumbnail_key(digest: str, size: int, ext: str, owner: Optional[str] = None) -> str:
+    """Content-hashed (per owner, if given) like the original, so the URL can be cached forever."""
+    if owner:
+        return f"{THUMBNAIL_FOLDER}/{owner}/{digest}_{size}.{ext}"
+    return f"{THUMBNAIL_FOLDER}/{digest}_{size}.{ext}"
+
+
+def render_thumbnails(image_bytes: bytes, sizes: Iterable[int] = THUMBNAIL_SIZES) -> Dict[int, bytes]:
+    """
+    Encode a thumbnail per size (longest side, aspect ratio kept, never upscaled).
+    One draft-mode decode at the largest size; each smaller size is shrunk
+    from the previous one rather than from the full-resolution photo.
+    """
+    pil_format, _, _ = output_format()
+    save_kwargs = {"quality": THUMBNAIL_QUALITY}
+    if pil_format == "WEBP":
+        save_kwargs["method"] = 4
+    else:
+        save_kwargs.update(optimize=True, progressive=True)
+
+    sizes = sorted(set(sizes), reverse=True)
+    img = Image.open(BytesIO(image_bytes))
+    img.draft("RGB", (sizes[0], sizes[0]))
+    img = ImageOps.exif_transpose(img).convert("RGB")
+
+    rendered = {}
+    for size in sizes:
+        img.thumbnail((size, size), Image.LANCZOS)
+        buffer = BytesIO()
+        img.save(buffer, pil_format, **save_kwargs)
+        rendered[size] = buffer.getvalue()
+    return rendered
+
+
+async def generate_thumbnails(image_bytes: bytes, digest: str, owner: Optional[str] = None) -> Dict[str, str]:
+    """Render and store all sizes next to the original. Returns {"128": url, ...}."""
+    _, ext, content_type = output_format()
+    with span("thumbnails_render"):
+        rendered = await asyncio.to_thread(render_thumbnails, image_bytes)
+    storage = get_storage()
+    stored = await asyncio.gather(*(
+        storage.put(data, thumbnail_key(digest, size, ext, owner), content_type)
+        for size, data in rendered.items()
+    ))
+    return {str(size): obj.url for size, obj in sorted(zip(rendered, stored))}
+
+
+async def cached_thumbnails(db, image_bytes: bytes, digest: str, owner: str) -> Dict[str, str]:
+    """
+    Thumbnail URLs for these bytes – the owner's re-upload of the same photo
+    reuses them. Stored and cached per owner, like the original (image_key).
+    """
+    _, ext, _ = output_format()
+    thumbnails, _ = await inference_cache.get_or_compute(
+        db, digest, f"thumbnails_{ext}", lambda: generate_thumbnails(image_bytes, digest, owner),
+        versioned=False, owner=owner
+    )
+    return thumbnails
@@ -0,0 +1,288 @@
+# backend/storage_utils.py
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Optional, Union
+
+import aiohttp
+import cloudinary
+import cloudinary.utils
+from dotenv import load_dotenv
+
+from metrics import timed
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ========== CONFIGURATION ==========
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "cloudinary")   # cloudinary | local
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "media")
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "http://127.0.0.1:8000/media")
+WARDROBE_FOLDER = "wardrobe-items"
+
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=60, connect=10)
+HTTP_POOL_SIZE = int(os.getenv("STORAGE_HTTP_POOL_SIZE", "20"))
+MAX_RETRIES = 4
+RETRY_BASE_DELAY = 0.5
+# Above this size Cloudinary uploads are sent in chunks (each ≥ 5 MB except the last)
+CHUNKED_UPLOAD_THRESHOLD = 20 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 6 * 1024 * 1024
+FILE_READ_CHUNK = 256 * 1024
+# Keys are content-hashed, so an object never changes under the same URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+Payload = Union[bytes, BinaryIO]
+
+
+class StorageError(Exception):
+    pass
+
+
+@dataclass
+class StoredObject:
+    key: str
+    url: str
+    size: Optional[int] = None
+
+
+class StorageBackend(ABC):
+    """Where uploaded images (and later derivatives) live."""
+
+    @abstractmethod
+    async def put(self, data: Payload, key: str, content_type: str = "image/jpeg") -> StoredObject:
+        """Store bytes or a readable file object (e.g. UploadFile.file) under key."""
+
+    @abstractmethod
+    async def get(self, url_or_key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+# ========== LOCAL (tests / dev, no network) ==========
+class LocalStorage(StorageBackend):
+    """
+    Files under LOCAL_STORAGE_DIR, served by main.py at /media. Disk I/O runs
+    in a thread so the event loop is never blocked.
+    """
+
+    def __init__(self, root: str = LOCAL_STORAGE_DIR, base_url: str = LOCAL_STORAGE_URL):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise StorageError(f"Invalid storage key: {key}")
+        return path
+
+    def _key_from(self, url_or_key: str) -> str:
+        if url_or_key.startswith(self.base_url + "/"):
+            return url_or_key[len(self.base_url) + 1:]
+        return url_or_key
+
+    def _write(self, data: Payload, path: str) -> int:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        size = 0
+        with open(tmp, "wb") as f:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                size = f.write(data)
+            else:
+                while chunk := data.read(FILE_READ_CHUNK):
+                    size += f.write(chunk)
+        os.replace(tmp, path)
+        return size
+
+    def _read(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    @timed("local_storage_put")
+    async def put(self, data: Payload, key: str, content_type: str = "image/jpeg") -> StoredObject:
+        size = await asyncio.to_thread(self._write, data, self._path(key))
+        return StoredObject(key=key, url=f"{self.base_url}/{key}", size=size)
+
+    async def get(self, url_or_key: str) -> bytes:
+        return await asyncio.to_thread(self._read, self._path(self._key_from(url_or_key)))
+
+    async def delete(self, key: str) -> None:
+        try:
+            await asyncio.to_thread(os.remove, self._path(self._key_from(key)))
+        except FileNotFoundError:
+            pass
+
+
+# ========== CLOUDINARY ==========
+class CloudinaryStorage(StorageBackend):
+    """
+    Async Cloudinary client: one pooled aiohttp session, signed uploads,
+    retry with exponential backoff on 429/5xx/network errors, and chunked
+    upload for large files.
+    """
+
+    def __init__(self):
+        config = cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET")
+        )
+        self.cloud_name = config.cloud_name
+        self.api_key = config.api_key
+        self.api_secret = config.api_secret
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def upload_url(self) -> str:
+        return f"https://api.cloudinary.com/v1_1/{self.cloud_name}/image/upload"
+
+    @property
+    def destroy_url(self) -> str:
+        return f"https://api.cloudinary.com/v1_1/{self.cloud_name}/image/destroy"
+
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=HTTP_TIMEOUT,
+                connector=aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, keepalive_timeout=60)
+            )
+        return self._session
+
+    def _signed_params(self, **params) -> Dict[str, str]:
+        params["timestamp"] = str(int(time.time()))
+        params["signature"] = cloudinary.utils.api_sign_request(params, self.api_secret)
+        params["api_key"] = self.api_key
+        return params
+
+    async def _post_with_retry(self, url: str, build_form, headers: Optional[Dict[str, str]] = None) -> Dict:
+        """build_form() is called per attempt – a FormData body can only be sent once."""
+        for attempt in range(MAX_RETRIES):
+            try:
+                async with self.session().post(url, data=build_form(), headers=headers) as resp:
+                    if resp.status == 429 or resp.status >= 500:
+                        raise StorageError(f"Cloudinary {resp.status}: {await resp.text()}")
+                    body = await resp.json(content_type=None)
+                    if resp.status >= 400:
+                        # Client errors (bad signature, invalid image) won't succeed on retry
+                        raise ValueError(f"Cloudinary rejected upload ({resp.status}): {body.get('error', body)}")
+                    return body
+            except (aiohttp.ClientError, asyncio.TimeoutError, StorageError) as e:
+                if attempt == MAX_RETRIES - 1:
+                    raise StorageError(f"Cloudinary request failed after {MAX_RETRIES} attempts: {e}") from e
+                delay = RETRY_BASE_DELAY * 2 ** attempt + random.uniform(0, RETRY_BASE_DELAY)
+                logger.warning(f"Cloudinary request failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _public_id(self, key: str) -> Dict[str, str]:
+        folder, _, name = key.rpartition("/")
+        params = {"public_id": os.path.splitext(name)[0], "overwrite": "false"}
+        if folder:
+            params["folder"] = folder
+        return params
+
+    @timed("cloudinary_upload")
+    async def put(self, data: Payload, key: str, content_type: str = "image/jpeg") -> StoredObject:
+        params = self._signed_params(**self._public_id(key))
+        if isinstance(data, (bytes, bytearray, memoryview)) and len(data) > CHUNKED_UPLOAD_THRESHOLD:
+            body = await self._put_chunked(bytes(data), params, content_type)
+        elif isinstance(data, (bytes, bytearray, memoryview)):
+            def build_form():
+                form = aiohttp.FormData(params)
+                form.add_field("file", data, filename=os.path.basename(key), content_type=content_type)
+                return form
+            body = await self._post_with_retry(self.upload_url, build_form)
+        else:
+            # File object: aiohttp streams it from its current position, rewind before each retry
+            start = data.tell()
+            def build_form():
+                data.seek(start)
+                form = aiohttp.FormData(params)
+                form.add_field("file", data, filename=os.path.basename(key), content_type=content_type)
+                return form
+            body = await self._post_with_retry(self.upload_url, build_form)
+        return StoredObject(key=body["public_id"], url=body["secure_url"], size=body.get("bytes"))
+
+    async def _put_chunked(self, data: bytes, params: Dict[str, str], content_type: str) -> Dict:
+        upload_id = uuid.uuid4().hex
+        total = len(data)
+        body: Dict = {}
+        for start in range(0, total, UPLOAD_CHUNK_SIZE):
+            end = min(start + UPLOAD_CHUNK_SIZE, total) - 1
+            chunk = memoryview(data)[start:end + 1]
+            headers = {"X-Unique-Upload-Id": upload_id, "Content-Range": f"bytes {start}-{end}/{total}"}
+
+            def build_form(chunk=chunk):
+                form = aiohttp.FormData(params)
+                form.add_field("file", chunk.tobytes(), filename="upload", content_type=content_type)
+                return form
+            body = await self._post_with_retry(self.upload_url, build_form, headers=headers)
+        return body
+
+    async def get(self, url_or_key: str) -> bytes:
+        url = url_or_key
+        if not url.startswith("http"):
+            url = cloudinary.utils.cloudinary_url(url_or_key, secure=True)[0]
+        for attempt in range(MAX_RETRIES):
+            try:
+                async with self.session().get(url) as resp:
+                    if resp.status == 429 or resp.status >= 500:
+                        raise StorageError(f"Cloudinary {resp.status}")
+                    resp.raise_for_status()
+                    return await resp.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError, StorageError) as e:
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                await asyncio.sleep(RETRY_BASE_DELAY * 2 ** attempt)
+
+    async def delete(self, key: str) -> None:
+        params = self._signed_params(public_id=key)
+        await self._post_with_retry(self.destroy_url, lambda: aiohttp.FormData(params))
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+# ========== FACTORY ==========
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "local":
+            _storage = LocalStorage()
+        elif STORAGE_BACKEND == "cloudinary":
+            _storage = CloudinaryStorage()
+        else:
+            raise RuntimeError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}' (cloudinary | local)")
+    return _storage
+
+
+def set_storage(storage: Optional[StorageBackend]) -> None:
+    """Swap the backend (tests / benchmarks use LocalStorage)."""
+    global _storage
+    _storage = storage
+
+
+async def close_storage() -> None:
+    if _storage is not None:
+        await _storage.close()
+
+
+def image_key(digest: str, ext: str = "jpg", owner: Optional[str] = None) -> str:
+    """Content-addressed key: the same bytes always map to the same object (per owner, if given)."""
+    if owner:
+        return f"{WARDROBE_FOLDER}/{owner}/{digest}.{ext}"
+    return f"{WARDROBE_FOLDER}/{digest}.{ext}"
@@ -0,0 +1,15 @@
+# backend/tests/conftest.py
+"""
+Tests run against in-process stand-ins: mongomock-motor for MongoDB and
+fakeredis for the shared cache tier (pip install -r requirements-dev.txt).
+
+    cd backend
+    python -m pytest
+"""
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["wardrobe_ai_kenya_test"]
@@ -0,0 +1,86 @@
+# backend/tests/test_admission.py
+import asyncio
+
+import pytest
+
+from services.admission import ClassLimits, Overloaded, Priority, PriorityLimiter
+
+
+def _limiter(concurrency: int = 1, max_queue=None, timeout=None) -> PriorityLimiter:
+    return PriorityLimiter("test", concurrency, {p: ClassLimits(max_queue, timeout) for p in Priority})
+
+
+async def _queued(limiter: PriorityLimiter, n: int) -> None:
+    """Let waiters reach the queue."""
+    for _ in range(100):
+        if sum(limiter._queued.values()) >= n:
+            return
+        await asyncio.sleep(0)
+    raise AssertionError(f"expected {n} queued waiters, got {limiter.stats()['queued']}")
+
+
+async def test_admits_up_to_concurrency():
+    limiter = _limiter(concurrency=2)
+    await limiter.acquire(Priority.INTERACTIVE)
+    await limiter.acquire(Priority.UPLOAD)
+    assert limiter.stats()["active"] == 2
+    limiter.release()
+    limiter.release()
+    assert limiter.stats()["active"] == 0
+
+
+async def test_released_slot_goes_to_highest_priority_waiter():
+    limiter = _limiter()
+    await limiter.acquire(Priority.UPLOAD)
+    order = []
+
+    async def wait(priority):
+        await limiter.acquire(priority)
+        order.append(priority)
+
+    tasks = [asyncio.create_task(wait(p)) for p in (Priority.BACKGROUND, Priority.UPLOAD, Priority.INTERACTIVE)]
+    await _queued(limiter, 3)
+    for _ in tasks:
+        limiter.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    assert order == [Priority.INTERACTIVE, Priority.UPLOAD, Priority.BACKGROUND]
+
+
+async def test_full_queue_sheds_with_retry_after():
+    limiter = _limiter(max_queue=1)
+    await limiter.acquire(Priority.INTERACTIVE)
+    waiter = asyncio.create_task(limiter.acquire(Priority.INTERACTIVE))
+    await _queued(limiter, 1)
+    with pytest.raises(Overloaded) as shed:
+        await limiter.acquire(Priority.INTERACTIVE)
+    assert shed.value.reason == "queue_full" and shed.value.retry_after >= 1
+    limiter.release()
+    await waiter
+    limiter.release()
+
+
+async def test_wait_times_out():
+    limiter = _limiter(timeout=0.01)
+    await limiter.acquire(Priority.UPLOAD)
+    with pytest.raises(Overloaded) as shed:
+        await limiter.acquire(Priority.UPLOAD)
+    assert shed.value.reason == "timeout"
+    assert limiter.stats()["queued"]["upload"] == 0
+    limiter.release()
+    assert limiter.stats()["active"] == 0
+
+
+async def test_cancelled_waiter_does_not_leak_the_slot():
+    limiter = _limiter()
+    await limiter.acquire(Priority.INTERACTIVE)
+    waiter = asyncio.create_task(limiter.acquire(Priority.INTERACTIVE))
+    await _queued(limiter, 1)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    limiter.release()
+    assert limiter.stats()["active"] == 0
+    async with limiter.slot(Priority.INTERACTIVE):
+        assert limiter.stats()["active"] == 1
+    assert limiter.stats()["active"] == 0
@@ -0,0 +1,37 @@
+# backend/tests/test_faiss_utils.py
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from faiss_utils import FaissIdAllocator, SharedFaissIndex  # noqa: E402
+
+
+def test_allocator_never_goes_backwards():
+    allocator = FaissIdAllocator()
+    assert [allocator.allocate_local() for _ in range(3)] == [0, 1, 2]
+    allocator.advance_to(10)
+    allocator.advance_to(5)
+    assert allocator.allocate_local() == 10
+
+
+def test_replaced_vector_keeps_its_id_and_search_is_per_user():
+    index = SharedFaissIndex(4)
+    a = index.add("u1", "i1", np.array([1, 0, 0, 0], dtype=np.float32))
+    index.add("u2", "i2", np.array([1, 0, 0, 0], dtype=np.float32))
+    assert index.add("u1", "i1", np.array([0, 1, 0, 0], dtype=np.float32)) == a
+    hits = index.search(np.array([0, 1, 0, 0], dtype=np.float32), top_k=5, user_id="u1")
+    assert [hit["item_id"] for hit in hits] == ["i1"]
+
+
+def test_snapshot_round_trip_keeps_ids_unique(tmp_path):
+    index = SharedFaissIndex(4)
+    index.add_many([("u1", "i1"), ("u1", "i2")], np.eye(4, dtype=np.float32)[:2])
+    index.save(str(tmp_path))
+    loaded = SharedFaissIndex.load(str(tmp_path), mmap=False)
+    assert len(loaded) == 2
+    new_id = loaded.add("u1", "i3", np.eye(4, dtype=np.float32)[2])
+    assert new_id not in {loaded.item_to_id[("u1", "i1")], loaded.item_to_id[("u1", "i2")]}
+    loaded.remove("u1", "i1")
+    assert not loaded.needs_compaction(ratio=1.0)
+    assert loaded.needs_compaction(ratio=0.1)
@@ -0,0 +1,44 @@
+# backend/tests/test_index_snapshots.py
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from faiss_utils import SharedFaissIndex  # noqa: E402
+from services.index_snapshots import SnapshotSpec, advance_watermark, apply_changes  # noqa: E402
+from services.invalidation import Invalidation  # noqa: E402
+
+
+def _spec(index) -> SnapshotSpec:
+    return SnapshotSpec(
+        name="test",
+        filter={"is_public": True},
+        group_fn=lambda doc: "mitumba" if doc.get("is_mitumba") else "public",
+        get_index=lambda: index,
+    )
+
+
+async def test_item_leaves_its_old_group_when_is_mitumba_flips(db):
+    index = SharedFaissIndex(4)
+    spec = _spec(index)
+    oid = (await db.wardrobe_items.insert_one(
+        {"is_public": True, "is_mitumba": True, "user_id": "u1", "features": [1.0, 0.0, 0.0, 0.0]}
+    )).inserted_id
+    await apply_changes(db, spec, index, [oid])
+    await db.wardrobe_items.update_one({"_id": oid}, {"$set": {"is_mitumba": False}})
+    await apply_changes(db, spec, index, [oid])
+    assert index.search(np.array([1, 0, 0, 0], dtype=np.float32), top_k=5, user_id="mitumba") == []
+    assert [hit["item_id"] for hit in index.search(np.array([1, 0, 0, 0], dtype=np.float32))] == [str(oid)]
+
+
+def test_watermark_follows_applied_changes():
+    spec = _spec(None)
+    spec.synced_at, spec.resume_token = datetime(2026, 1, 1), {"_data": "build"}
+    advance_watermark(spec, [Invalidation("wardrobe_items", "update", 1, changed_at=datetime(2025, 12, 31))])
+    assert spec.resume_token == {"_data": "build"}
+
+    later = datetime(2026, 1, 1) + timedelta(minutes=5)
+    advance_watermark(spec, [Invalidation("wardrobe_items", "update", 1, changed_at=later)])
+    assert (spec.synced_at, spec.resume_token) == (later, None)
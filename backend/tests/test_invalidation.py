@@ -0,0 +1,26 @@
+# backend/tests/test_invalidation.py
+from services.invalidation import claim_stream_slot, load_token, release_stream_slot, save_token
+
+
+async def test_workers_get_distinct_slots(db):
+    assert await claim_stream_slot(db, "api-1", owner="api-1:100") == "invalidation:api-1:0"
+    assert await claim_stream_slot(db, "api-1", owner="api-1:101") == "invalidation:api-1:1"
+    assert await claim_stream_slot(db, "api-2", owner="api-2:100") == "invalidation:api-2:0"
+    assert await claim_stream_slot(db, "api-1", owner="api-1:100") == "invalidation:api-1:0"
+
+
+async def test_restarted_worker_resumes_the_released_slot(db):
+    name = await claim_stream_slot(db, "api-1", owner="api-1:100")
+    await save_token(db, name, {"_data": "abc"}, owner="api-1:100")
+    await release_stream_slot(db, name, owner="api-1:100")
+
+    assert await claim_stream_slot(db, "api-1", owner="api-1:200") == name
+    assert await load_token(db, name) == {"_data": "abc"}
+
+
+async def test_forgetting_the_token_keeps_the_lease(db):
+    name = await claim_stream_slot(db, "api-1", owner="api-1:100")
+    await save_token(db, name, {"_data": "abc"}, owner="api-1:100")
+    await save_token(db, name, None)
+    assert await load_token(db, name) is None
+    assert await claim_stream_slot(db, "api-1", owner="api-1:200") == "invalidation:api-1:1"
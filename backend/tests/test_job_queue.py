@@ -0,0 +1,135 @@
+# backend/tests/test_job_queue.py
+from datetime import datetime, timedelta
+
+import asyncio
+
+import pytest
+
+from services import job_queue
+from services.job_queue import claim, complete, enqueue, fail, reap_exhausted, run_one
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """Isolated handler registry: {"calls": [...], "failures": [...]}."""
+    monkeypatch.setattr(job_queue, "_handlers", {})
+    monkeypatch.setattr(job_queue, "_failure_handlers", {})
+    seen = {"calls": [], "failures": []}
+
+    async def on_failure(db, payload, error):
+        seen["failures"].append((payload, error))
+
+    @job_queue.register_handler("ok", on_failure=on_failure)
+    async def ok(db, payload):
+        seen["calls"].append(payload)
+
+    @job_queue.register_handler("boom", on_failure=on_failure)
+    async def boom(db, payload):
+        raise RuntimeError("boom")
+
+    return seen
+
+
+async def _expire(db, job_id) -> None:
+    """Pretend the worker holding the job died: its visibility timeout is over."""
+    await db.jobs.update_one({"_id": job_id}, {"$set": {"visible_at": datetime.utcnow() - timedelta(seconds=1)}})
+
+
+async def test_claim_takes_each_job_once(db):
+    await enqueue(db, "ok", {"n": 1})
+    job = await claim(db, "w1")
+    assert job["status"] == "running" and job["attempts"] == 1 and job["worker"] == "w1"
+    assert await claim(db, "w2") is None
+
+
+async def test_complete_only_for_the_claiming_worker(db):
+    await enqueue(db, "ok", {})
+    job = await claim(db, "w1")
+    completed = job_queue._counters["completed"]
+    await complete(db, {**job, "worker": "someone-else"})
+    assert (await db.jobs.find_one({"_id": job["_id"]}))["status"] == "running"
+    assert job_queue._counters["completed"] == completed
+    await complete(db, job)
+    assert (await db.jobs.find_one({"_id": job["_id"]}))["status"] == "done"
+    assert job_queue._counters["completed"] == completed + 1
+
+
+async def test_expired_running_job_is_reclaimed(db):
+    await enqueue(db, "ok", {})
+    job = await claim(db, "w1")
+    await _expire(db, job["_id"])
+    again = await claim(db, "w2")
+    assert again["_id"] == job["_id"] and again["attempts"] == 2 and again["worker"] == "w2"
+
+
+async def test_fail_retries_with_backoff(db, handlers):
+    await enqueue(db, "boom", {}, max_attempts=3)
+    job = await claim(db, "w1")
+    before = datetime.utcnow()
+    await fail(db, job, "nope")
+    stored = await db.jobs.find_one({"_id": job["_id"]})
+    assert stored["status"] == "queued" and stored["last_error"] == "nope"
+    assert stored["visible_at"] >= before + timedelta(seconds=job_queue.RETRY_BACKOFF_SECONDS - 1)
+    assert await claim(db, "w1") is None    # still backing off
+    assert handlers["failures"] == []
+
+
+async def test_fail_on_last_attempt_calls_on_failure(db, handlers):
+    await enqueue(db, "boom", {"item_id": "x"}, max_attempts=1)
+    job = await claim(db, "w1")
+    await fail(db, job, "nope")
+    assert (await db.jobs.find_one({"_id": job["_id"]}))["status"] == "failed"
+    assert handlers["failures"] == [({"item_id": "x"}, "nope")]
+
+
+async def test_exhausted_job_is_not_reclaimed_but_reaped(db, handlers):
+    await enqueue(db, "ok", {"item_id": "x"}, max_attempts=1)
+    job = await claim(db, "w1")
+    await _expire(db, job["_id"])
+
+    assert await claim(db, "w2") is None
+    assert await reap_exhausted(db) == 1
+    stored = await db.jobs.find_one({"_id": job["_id"]})
+    assert stored["status"] == "failed" and stored["attempts"] == 1
+    assert handlers["failures"] == [({"item_id": "x"}, stored["last_error"])]
+    assert await reap_exhausted(db) == 0
+
+
+async def test_reap_leaves_live_jobs_alone(db, handlers):
+    await enqueue(db, "ok", {}, max_attempts=1)
+    await claim(db, "w1")                   # running, visibility not expired
+    assert await reap_exhausted(db) == 0
+
+
+async def test_run_one_runs_and_completes(db, handlers):
+    await enqueue(db, "ok", {"n": 1})
+    assert await run_one(db, "w1") is True
+    assert handlers["calls"] == [{"n": 1}]
+    assert (await db.jobs.find_one({}))["status"] == "done"
+    assert await run_one(db, "w1") is False
+
+
+async def test_heartbeat_keeps_a_slow_job_claimed(db, handlers, monkeypatch):
+    monkeypatch.setattr(job_queue, "HEARTBEAT_SECONDS", 0.01)
+    monkeypatch.setattr(job_queue, "VISIBILITY_TIMEOUT", timedelta(seconds=60))
+    extended = []
+
+    @job_queue.register_handler("slow")
+    async def slow(db, payload):
+        first = (await db.jobs.find_one({}))["visible_at"]
+        await asyncio.sleep(0.05)
+        extended.append((await db.jobs.find_one({}))["visible_at"] > first)
+
+    await enqueue(db, "slow", {})
+    assert await run_one(db, "w1") is True
+    assert extended == [True]
+    assert (await db.jobs.find_one({}))["status"] == "done"
+
+
+async def test_worker_that_lost_the_job_does_not_fail_it(db, handlers):
+    await enqueue(db, "boom", {"item_id": "x"}, max_attempts=1)
+    job = await claim(db, "w1")
+    await db.jobs.update_one({"_id": job["_id"]}, {"$set": {"worker": "w2"}})
+    await fail(db, job, "nope")
+    assert (await db.jobs.find_one({"_id": job["_id"]}))["status"] == "running"
+    assert handlers["failures"] == []
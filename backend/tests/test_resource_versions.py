@@ -0,0 +1,14 @@
+# backend/tests/test_resource_versions.py
+from services.resource_versions import CLOSET, REWARDS, bump_version, get_versions
+
+
+async def test_unknown_user_starts_at_zero(db):
+    assert await get_versions(db, "u1") == {CLOSET: 0, REWARDS: 0}
+
+
+async def test_bumps_only_the_given_scopes(db):
+    await bump_version(db, "u1", CLOSET)
+    await bump_version(db, "u1", CLOSET, REWARDS)
+    assert await get_versions(db, "u1") == {CLOSET: 2, REWARDS: 1}
+    assert await get_versions(db, "u2") == {CLOSET: 0, REWARDS: 0}
+
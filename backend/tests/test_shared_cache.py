@@ -0,0 +1,117 @@
+# backend/tests/test_shared_cache.py
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from services.shared_cache import TieredCache
+
+
+@pytest.fixture
+async def cache():
+    tiered = TieredCache("fakeredis://")
+    yield tiered
+    await tiered.close()
+
+
+class Counter:
+    """compute() that counts its calls."""
+
+    def __init__(self, value, delay: float = 0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+class BrokenRedis:
+    def __getattr__(self, name):
+        async def fail(*args, **kwargs):
+            raise ConnectionError("redis is down")
+        return fail
+
+
+async def test_computes_once_then_hits_locally(cache):
+    ns = cache.namespace("t", ttl=60)
+    compute = Counter({"a": 1})
+    assert await ns.get_or_compute("k", compute) == {"a": 1}
+    assert await ns.get_or_compute("k", compute) == {"a": 1}
+    assert compute.calls == 1
+    assert ns.stats()["local_hit"] == 1
+
+
+async def test_other_process_reads_the_shared_tier(cache):
+    ours, theirs = cache.namespace("t", ttl=60), TieredCache("").namespace("t", ttl=60)
+    theirs.cache.redis = cache.redis      # same Redis, separate process tier
+    await ours.get_or_compute("k", Counter([1, 2]))
+    compute = Counter([9])
+    assert await theirs.get_or_compute("k", compute) == [1, 2]
+    assert compute.calls == 0
+    assert theirs.stats()["shared_hit"] == 1
+
+
+async def test_concurrent_misses_share_one_computation(cache):
+    ns = cache.namespace("t", ttl=60)
+    compute = Counter("v", delay=0.01)
+    results = await asyncio.gather(*(ns.get_or_compute("k", compute) for _ in range(5)))
+    assert results == ["v"] * 5
+    assert compute.calls == 1
+
+
+async def test_none_is_not_cached(cache):
+    ns = cache.namespace("t", ttl=60)
+    compute = Counter(None)
+    assert await ns.get_or_compute("k", compute) is None
+    assert await ns.get_or_compute("k", compute) is None
+    assert compute.calls == 2
+
+
+async def test_errors_propagate_and_are_not_cached(cache):
+    ns = cache.namespace("t", ttl=60)
+
+    async def boom():
+        raise ValueError("nope")
+
+    with pytest.raises(ValueError):
+        await ns.get_or_compute("k", boom)
+    assert await ns.get_or_compute("k", Counter(1)) == 1
+    assert await cache.redis.get("wardrobe:t:k:lock") is None
+
+
+async def test_ttl_for_shortens_some_entries(cache):
+    ns = cache.namespace("t", ttl=600, local_ttl=60)
+    await ns.get_or_compute("short", Counter({"source": "fallback"}), ttl_for=lambda v: 5 if v["source"] == "fallback" else None)
+    await ns.get_or_compute("long", Counter({"source": "api"}), ttl_for=lambda v: 5 if v["source"] == "fallback" else None)
+    assert await cache.redis.ttl("wardrobe:t:short") <= 6
+    assert await cache.redis.ttl("wardrobe:t:long") > 500
+
+
+async def test_datetime_and_objectid_survive(cache):
+    ns = cache.namespace("t", ttl=60)
+    value = {"at": datetime(2026, 1, 2, 3, 4, 5), "id": ObjectId(), "pair": (1, 2)}
+    await ns.set("k", value)
+    ns.clear_local()
+    assert await ns.get("k") == {**value, "pair": [1, 2]}
+
+
+async def test_delete_drops_both_tiers(cache):
+    ns = cache.namespace("t", ttl=60)
+    await ns.set("k", 1)
+    await ns.delete("k")
+    assert await ns.get("k") is None
+
+
+async def test_redis_down_still_computes():
+    cache = TieredCache("")
+    cache.redis = BrokenRedis()
+    ns = cache.namespace("t", ttl=60)
+    compute = Counter(3)
+    assert await ns.get_or_compute("k", compute) == 3
+    assert compute.calls == 1
+    assert await ns.get_or_compute("k", compute) == 3      # process tier still works
+    assert compute.calls == 1
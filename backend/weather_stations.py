@@ -0,0 +1,113 @@
+# backend/weather_stations.py
+"""
+Kenya's 47 county headquarters as weather "stations" (data/kenya_counties.json),
+the grid the weather cache is keyed on, and a monthly climatology per
+climate zone for when live weather isn't available.
+
+Coordinates snap to a WEATHER_GRID_DEGREES grid: every user in the same
+cell shares one cached forecast (fetched for the cell centre, climatology
+from the station nearest to it). With 47 stations a haversine scan is
+cheaper than building a KD-tree, and lookups are memoized.
+"""
+import json
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+# ========== CONFIGURATION ==========
+COUNTIES_PATH = os.getenv("KENYA_COUNTIES_PATH", os.path.join(os.path.dirname(__file__), "data", "kenya_counties.json"))
+WEATHER_GRID_DEGREES = float(os.getenv("WEATHER_GRID_DEGREES", "0.25"))   # ~28 km at the equator
+DEFAULT_STATION = "nairobi"
+EARTH_RADIUS_KM = 6371.0
+
+
+@dataclass(frozen=True)
+class Station:
+    code: int
+    county: str
+    hq: str
+    lat: float
+    lon: float
+    zone: str
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def grid_cell(lat: float, lon: float, size: float = WEATHER_GRID_DEGREES) -> Tuple[int, int]:
+    return math.floor(lat / size), math.floor(lon / size)
+
+
+def cell_center(cell: Tuple[int, int], size: float = WEATHER_GRID_DEGREES) -> Tuple[float, float]:
+    return round((cell[0] + 0.5) * size, 4), round((cell[1] + 0.5) * size, 4)
+
+
+def cell_key(cell: Tuple[int, int]) -> str:
+    return f"{cell[0]}:{cell[1]}"
+
+
+def condition_for(temperature: float, humidity: float, rain_probability: float) -> str:
+    """Same vocabulary as WeatherService (sunny / rainy / cloudy / humid)."""
+    if rain_probability >= 50:
+        return "rainy"
+    if humidity >= 75 and temperature >= 24:
+        return "humid"
+    if rain_probability >= 30:
+        return "cloudy"
+    return "sunny"
+
+
+class StationIndex:
+    def __init__(self, config: Dict[str, Any]):
+        self.zones: Dict[str, Dict[str, List[float]]] = config["climate_zones"]
+        self.stations: List[Station] = [Station(**c) for c in config["counties"]]
+        for station in self.stations:
+            if station.zone not in self.zones:
+                raise ValueError(f"{station.county}: unknown climate zone {station.zone}")
+        # County names and HQ towns both resolve ("Uasin Gishu" and "Eldoret")
+        self.by_name: Dict[str, Station] = {}
+        for station in self.stations:
+            self.by_name[station.county.lower()] = station
+            self.by_name[station.hq.lower()] = station
+        self._nearest = lru_cache(maxsize=8192)(self._scan)
+
+    @classmethod
+    def from_file(cls, path: str = COUNTIES_PATH) -> "StationIndex":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def resolve(self, name: str) -> Optional[Station]:
+        return self.by_name.get(name.strip().lower())
+
+    def _scan(self, lat: float, lon: float) -> Station:
+        return min(self.stations, key=lambda s: haversine_km(lat, lon, s.lat, s.lon))
+
+    def nearest(self, lat: float, lon: float) -> Station:
+        """Nearest county HQ (coordinates rounded to ~100 m so the memo stays small)."""
+        return self._nearest(round(lat, 3), round(lon, 3))
+
+    def cell_station(self, cell: Tuple[int, int]) -> Station:
+        """Station whose climatology stands in for the whole cell."""
+        return self.nearest(*cell_center(cell))
+
+    def climatology(self, station: Station, month: int) -> Dict[str, Any]:
+        """Long-term monthly normals for the station's climate zone (month 1–12)."""
+        zone = self.zones[station.zone]
+        temperature = zone["temperature"][month - 1]
+        humidity = zone["humidity"][month - 1]
+        rain_probability = zone["rain_probability"][month - 1]
+        return {
+            "temperature": temperature,
+            "condition": condition_for(temperature, humidity, rain_probability),
+            "humidity": humidity,
+            "rain_probability": rain_probability,
+        }
+
+
+station_index = StationIndex.from_file()
@@ -27,6 +27,21 @@ const fetchWardrobeItems = async () => {
   return res.data?.items || res.data || [];
 };
 
+const STATUS_POLL_MS = 2000;
+const STATUS_POLL_ATTEMPTS = 60; // ~2 minutes, then the item just shows up on the next refresh
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// 202 uploads are classified by a background job – poll until it's done
+const waitForClassification = async (statusUrl) => {
+  for (let attempt = 0; attempt < STATUS_POLL_ATTEMPTS; attempt += 1) {
+    await sleep(STATUS_POLL_MS);
+    const res = await api.get(statusUrl);
+    if (res.data?.status !== 'pending') return res.data;
+  }
+  return null;
+};
+
 export default function Wardrobe() {
   const queryClient = useQueryClient();
   const [uploadStatus, setUploadStatus] = useState(null);
@@ -55,9 +70,27 @@ export default function Wardrobe() {
         headers: { 'Content-Type': 'multipart/form-data' },
       });
     },
-    onSuccess: () => {
+    onSuccess: async (res) => {
+      queryClient.invalidateQueries({ queryKey: ['wardrobe'] });
+      if (res.status !== 202) {
+        setUploadStatus({ type: 'success', message: res.data?.message || 'Item uploaded and classified!' });
+        return;
+      }
+
+      setUploadStatus({ type: 'info', message: res.data?.message || 'Item uploaded! Classifying in the background...' });
+      try {
+        const item = await waitForClassification(res.data.status_url);
+        if (!item) {
+          setUploadStatus({ type: 'info', message: 'Item uploaded – classification is taking a while, it will appear shortly.' });
+        } else if (item.status === 'failed') {
+          setUploadStatus({ type: 'warning', message: 'Item uploaded, but we could not classify it automatically.' });
+        } else {
+          setUploadStatus({ type: 'success', message: 'Item uploaded and classified successfully!' });
+        }
+      } catch {
+        setUploadStatus({ type: 'info', message: 'Item uploaded – refresh in a moment to see its classification.' });
+      }
       queryClient.invalidateQueries({ queryKey: ['wardrobe'] });
-      setUploadStatus({ type: 'success', message: 'Item uploaded and classified successfully!' });
     },
     onError: (err) => {
       setUploadStatus({
@@ -210,7 +243,8 @@ export default function Wardrobe() {
                 <CardMedia
                   component="img"
                   height="280"
-                  image={item.image_url || item.imageUrl || 'https://via.placeholder.com/300x280?text=No+Image'}
+                  image={item.thumbnails?.['512'] || item.image_url || item.imageUrl || 'https://via.placeholder.com/300x280?text=No+Image'}
+                  loading="lazy"
                   alt={`${item.category} - ${item.color}`}
                   sx={{ objectFit: 'cover' }}
                 />